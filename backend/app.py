@@ -6,7 +6,6 @@ from flask_sqlalchemy import SQLAlchemy
 import sys
 import os
 import json
-import threading
 import time
 from datetime import datetime
 
@@ -16,10 +15,11 @@ from final_agent import FinalAgent
 
 # Import our new modules
 from config.config import get_config
-from config.database import init_db, get_db
+from config.database import init_db, get_db, remove_session
 from models import User, Customer, Bill, Sale, Proxy
 from services.auth_service import auth_service
 from services.customer_service import customer_service
+from services.customer_search_index import customer_search_index
 
 # Import routes
 from routes.auth import auth_bp
@@ -28,6 +28,18 @@ from routes.bills import bills_bp
 from routes.sales import sales_bp
 from routes.reports import reports_bp
 from routes.enhanced_proxy import enhanced_proxy_bp
+from routes.metrics import metrics_bp
+from routes.jobs import jobs_bp
+from utils.db_metrics import db_metrics
+from utils.nplusone import nplusone_detector
+from utils.tracing import request_tracer
+from utils.http_cache import response_compression
+from utils.shared_state import shared_state
+from utils.socketio_queue import socketio_queue_options
+from services.job_service import job_service, job_worker, JobCancelled
+from services.archive_service import archive_service
+from services.bill_import_service import bill_import_service
+import services.job_handlers  # noqa: F401 - register job kinds
 
 # Initialize Flask app
 app = Flask(__name__, 
@@ -61,12 +73,35 @@ CORS(
     app,
     resources={r"/api/*": {"origins": allowed_origins}},
     supports_credentials=True,
-    allow_headers=["Content-Type", "Authorization"],
+    allow_headers=["Content-Type", "Authorization", "Idempotency-Key"],
+    expose_headers=["Idempotent-Replayed"],
     methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
 )
 
 jwt = JWTManager(app)
-socketio = SocketIO(app, cors_allowed_origins=allowed_origins)
+# State every worker process must agree on (batch progress, proxies, rate
+# limits, cache versions); SocketIO emits reach clients of any worker
+shared_state.init_app(app)
+socketio = SocketIO(app, cors_allowed_origins=allowed_origins, **socketio_queue_options(app, shared_state))
+# Durable background jobs; progress is emitted as job_update events
+job_service.init_app(app, socketio)
+archive_service.init_app(app)
+bill_import_service.init_app(app)
+# Customer typeahead index loads in the background on each process's first request
+customer_search_index.init_app(app)
+
+# Services share one session (and pooled connection) per app context;
+# release it when the request or SocketIO event ends
+app.teardown_appcontext(remove_session)
+
+# Per-request SQL counters (X-DB-Stats header in debug mode, /api/metrics)
+db_metrics.init_app(app)
+# Repeated identical SELECTs per request (warns in debug, see NPLUSONE_MODE)
+nplusone_detector.init_app(app)
+# Per-route latency percentiles and slow request traces (/api/metrics/routes, /traces)
+request_tracer.init_app(app)
+# brotli/gzip for large JSON bodies
+response_compression.init_app(app)
 
 @app.after_request
 def apply_cors_headers(response):
@@ -75,15 +110,26 @@ def apply_cors_headers(response):
         response.headers['Access-Control-Allow-Origin'] = origin
         response.headers['Vary'] = 'Origin'
         response.headers['Access-Control-Allow-Credentials'] = 'true'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, Idempotency-Key'
+        response.headers['Access-Control-Expose-Headers'] = 'Idempotent-Replayed'
         response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, PATCH, DELETE, OPTIONS'
     return response
 
 # Initialize database (only when needed)
 # init_db()
 
-# Global variables for batch processing
-batch_status = {
+# Batch processing and proxy state, shared by all worker processes
+BATCH_STATUS_KEY = 'batch:status'
+BATCH_STOP_KEY = 'batch:stop'
+BATCH_LOCK_KEY = 'batch:lock'
+# Lock expiry in case the process running a batch dies
+BATCH_LOCK_TTL = 6 * 3600
+# Each proxy is stored under proxy:<id>; ids come from the proxy:next_id
+# counter, which doubles as the index, so no process rewrites a shared list
+PROXY_KEY_PREFIX = 'proxy:'
+PROXY_ID_KEY = 'proxy:next_id'
+
+IDLE_BATCH_STATUS = {
     'running': False,
     'progress': 0,
     'total': 0,
@@ -92,8 +138,16 @@ batch_status = {
     'start_time': None
 }
 
-# Proxy management
-proxy_list = []
+def get_batch_state():
+    return shared_state.get(BATCH_STATUS_KEY) or dict(IDLE_BATCH_STATUS)
+
+def proxy_key(proxy_id):
+    return f'{PROXY_KEY_PREFIX}{int(proxy_id)}'
+
+def get_proxies():
+    keys = [proxy_key(proxy_id) for proxy_id in range(1, shared_state.get(PROXY_ID_KEY, 0) + 1)]
+    proxies = shared_state.get_many(keys)
+    return [proxies[key] for key in keys if key in proxies]
 
 # Register blueprints
 app.register_blueprint(auth_bp)
@@ -102,6 +156,8 @@ app.register_blueprint(bills_bp)
 app.register_blueprint(sales_bp)
 app.register_blueprint(reports_bp)
 app.register_blueprint(enhanced_proxy_bp)
+app.register_blueprint(metrics_bp)
+app.register_blueprint(jobs_bp)
 
 @app.route('/')
 def index():
@@ -159,7 +215,7 @@ def check_single_contract():
 @app.route('/api/proxy/list', methods=['GET'])
 def get_proxy_list():
     """Get current proxy list"""
-    return jsonify({'proxies': proxy_list})
+    return jsonify({'proxies': get_proxies()})
 
 @app.route('/api/proxy/add', methods=['POST'])
 def add_proxy():
@@ -167,7 +223,7 @@ def add_proxy():
     try:
         data = request.get_json()
         proxy = {
-            'id': len(proxy_list) + 1,
+            'id': None,
             'type': data.get('type', 'http'),
             'host': data.get('host'),
             'port': int(data.get('port')),
@@ -181,7 +237,8 @@ def add_proxy():
         if not proxy['host'] or not proxy['port']:
             return jsonify({'error': 'Host and port are required'}), 400
         
-        proxy_list.append(proxy)
+        proxy['id'] = shared_state.incr(PROXY_ID_KEY)
+        shared_state.set(proxy_key(proxy['id']), proxy)
         return jsonify({'success': True, 'proxy': proxy})
         
     except Exception as e:
@@ -190,15 +247,14 @@ def add_proxy():
 @app.route('/api/proxy/remove/<int:proxy_id>', methods=['DELETE'])
 def remove_proxy(proxy_id):
     """Remove a proxy"""
-    global proxy_list
-    proxy_list = [p for p in proxy_list if p['id'] != proxy_id]
+    shared_state.delete(proxy_key(proxy_id))
     return jsonify({'success': True})
 
 @app.route('/api/proxy/test/<int:proxy_id>', methods=['POST'])
 def test_proxy(proxy_id):
     """Test a specific proxy"""
     try:
-        proxy = next((p for p in proxy_list if p['id'] == proxy_id), None)
+        proxy = shared_state.get(proxy_key(proxy_id))
         if not proxy:
             return jsonify({'error': 'Proxy not found'}), 404
         
@@ -245,11 +301,6 @@ def test_bulk_status():
 @app.route('/api/batch/start', methods=['POST'])
 def start_batch_processing():
     """Start batch processing of contract codes"""
-    global batch_status
-    
-    if batch_status['running']:
-        return jsonify({'error': 'Batch processing already running'}), 400
-    
     try:
         data = request.get_json()
         contract_codes = data.get('contract_codes', [])
@@ -258,25 +309,28 @@ def start_batch_processing():
         if not contract_codes:
             return jsonify({'error': 'Contract codes are required'}), 400
         
+        # Only one batch at a time across all workers
+        if not shared_state.add(BATCH_LOCK_KEY, datetime.now().isoformat(), ttl=BATCH_LOCK_TTL):
+            return jsonify({'error': 'Batch processing already running'}), 400
+        
         # Reset batch status
-        batch_status = {
+        shared_state.delete(BATCH_STOP_KEY)
+        shared_state.set(BATCH_STATUS_KEY, {
             'running': True,
             'progress': 0,
             'total': len(contract_codes),
             'results': [],
             'errors': [],
             'start_time': datetime.now().isoformat()
-        }
+        })
         
-        # Start batch processing in background thread
-        thread = threading.Thread(
-            target=process_batch_contracts,
-            args=(contract_codes, use_proxy)
-        )
-        thread.daemon = True
-        thread.start()
+        # Queue the batch; whichever job worker claims it does the processing
+        job = job_service.enqueue('check_contracts', {'contract_codes': contract_codes, 'use_proxy': use_proxy})
+        if not job['success']:
+            shared_state.delete(BATCH_LOCK_KEY)
+            return jsonify({'error': job['error']}), 500
         
-        return jsonify({'success': True, 'message': 'Batch processing started'})
+        return jsonify({'success': True, 'message': 'Batch processing started', 'job_id': job['job']['id']})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -284,22 +338,29 @@ def start_batch_processing():
 @app.route('/api/batch/status', methods=['GET'])
 def get_batch_status():
     """Get current batch processing status"""
-    return jsonify(batch_status)
+    return jsonify(get_batch_state())
 
 @app.route('/api/batch/stop', methods=['POST'])
 def stop_batch_processing():
     """Stop batch processing"""
-    global batch_status
+    # The worker processing the batch checks the flag before each contract
+    shared_state.set(BATCH_STOP_KEY, True, ttl=BATCH_LOCK_TTL)
+    batch_status = get_batch_state()
     batch_status['running'] = False
+    shared_state.set(BATCH_STATUS_KEY, batch_status)
     return jsonify({'success': True, 'message': 'Batch processing stopped'})
 
-def process_batch_contracts(contract_codes, use_proxy):
-    """Process contracts in batch (runs in background thread)"""
-    global batch_status
+@job_service.handler('check_contracts', max_attempts=1, admin_only=True)
+def process_batch_contracts(context):
+    """Process contracts in batch (runs as a background job)"""
+    contract_codes = context.payload.get('contract_codes', [])
+    use_proxy = context.payload.get('use_proxy', False)
+    batch_status = get_batch_state()
     
     try:
         # Choose agent based on proxy usage
-        if use_proxy and proxy_list:
+        proxy_list = get_proxies() if use_proxy else []
+        if proxy_list:
             # Convert proxy_list to format expected by ProxyAgent
             proxies = [{
                 'type': p['type'],
@@ -317,7 +378,7 @@ def process_batch_contracts(contract_codes, use_proxy):
             agent = FinalAgent()
         
         for i, contract_code in enumerate(contract_codes):
-            if not batch_status['running']:
+            if shared_state.get(BATCH_STOP_KEY):
                 break
             
             try:
@@ -356,6 +417,7 @@ def process_batch_contracts(contract_codes, use_proxy):
                     })
                 
                 batch_status['progress'] = i + 1
+                shared_state.set(BATCH_STATUS_KEY, batch_status)
                 
                 # Add delay between requests
                 time.sleep(1)
@@ -366,26 +428,43 @@ def process_batch_contracts(contract_codes, use_proxy):
                     'error': str(e),
                     'timestamp': datetime.now().isoformat()
                 })
+                shared_state.set(BATCH_STATUS_KEY, batch_status)
+            
+            # Outside the per-contract try, so a cancellation stops the batch
+            context.progress(i + 1, len(contract_codes), contract_code)
         
         batch_status['running'] = False
         batch_status['end_time'] = datetime.now().isoformat()
+        shared_state.set(BATCH_STATUS_KEY, batch_status)
         
         # Emit completion
-        socketio.emit('batch_complete', {
+        summary = {
             'total_processed': batch_status['progress'],
             'successful': len(batch_status['results']),
             'failed': len(batch_status['errors'])
-        })
+        }
+        socketio.emit('batch_complete', summary)
+        return {'success': True, **summary}
         
+    except JobCancelled:
+        batch_status['running'] = False
+        batch_status['end_time'] = datetime.now().isoformat()
+        shared_state.set(BATCH_STATUS_KEY, batch_status)
+        raise
     except Exception as e:
         batch_status['running'] = False
         batch_status['error'] = str(e)
+        shared_state.set(BATCH_STATUS_KEY, batch_status)
         socketio.emit('batch_error', {'error': str(e)})
+        return {'success': False, 'error': str(e)}
+    finally:
+        shared_state.delete(BATCH_LOCK_KEY)
 
 @app.route('/api/export/<format>', methods=['GET'])
 def export_results(format):
     """Export batch results in different formats"""
     try:
+        batch_status = get_batch_state()
         if format == 'json':
             return jsonify({
                 'results': batch_status['results'],
@@ -409,6 +488,10 @@ def export_results(format):
 def not_found(error):
     return jsonify({'error': 'Not found'}), 404
 
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify({'error': f"File too large, maximum is {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)}MB"}), 413
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
@@ -420,4 +503,5 @@ if __name__ == '__main__':
     print("🔐 Authentication: Enabled")
     print("🗄️ Database: PostgreSQL")
     print("👥 Customer Management: Enabled")
+    job_worker.start(app.config['JOB_WORKER_THREADS'], app.config['JOB_POLL_SECONDS'])
     socketio.run(app, debug=False, host='0.0.0.0', port=5001)
\ No newline at end of file
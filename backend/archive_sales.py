@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Move finished sales and bills to the archive tables
+
+Usage:
+    python archive_sales.py                       # older than ARCHIVE_AFTER_DAYS (180)
+    python archive_sales.py --older-than-days 365
+"""
+
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.archive_service import archive_service
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive completed, cancelled and expired sales and bills')
+    parser.add_argument('--older-than-days', type=int, default=int(os.getenv('ARCHIVE_AFTER_DAYS', '180')))
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+    
+    print(f"🔄 Archiving sales and bills finished more than {args.older_than_days} days ago...")
+    result = archive_service.archive(older_than_days=args.older_than_days, chunk_size=args.chunk_size)
+    
+    if not result['success']:
+        print(f"❌ Archiving failed: {result['error']}")
+        sys.exit(1)
+    
+    run = result['run']
+    print(f"✅ {result['message']} ({run['transactions_archived']} transactions) "
+          f"in {run['elapsed_seconds']}s, horizon {run['cutoff']}")
+
+if __name__ == "__main__":
+    main()
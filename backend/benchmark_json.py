@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON serialization of a warehouse bill export
+
+Builds in-memory bills (no database needed) and times to_dict() plus JSON
+encoding of the export payload three ways:
+
+    before    per-field float()/isoformat() in to_dict + Flask's default provider
+    stdlib    raw values from to_dict + FastJSONProvider without orjson
+    orjson    raw values from to_dict + FastJSONProvider with orjson
+
+Usage:
+    python benchmark_json.py                 # 10,000 bills, best of 5
+    python benchmark_json.py --bills 50000 --repeat 3
+"""
+
+import sys
+import os
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from models.bill import Bill, BillStatus
+from utils.json_provider import FastJSONProvider, orjson
+
+def make_bills(count):
+    now = datetime.now(timezone.utc)
+    bills = []
+    for i in range(count):
+        bills.append(Bill(
+            id=i + 1,
+            contract_code=f'PB{i:011d}',
+            customer_name=f'Nguyễn Văn Khách {i}',
+            address=f'{i} Đường Lê Lợi, Quận 1, TP. Hồ Chí Minh',
+            amount=Decimal(150000 + i * 7) + Decimal('0.50'),
+            period='10/2026',
+            due_date=now + timedelta(days=15),
+            bill_date=now - timedelta(days=i % 30),
+            meter_number=f'MN{i:07d}',
+            status=BillStatus.IN_WAREHOUSE,
+            raw_response={'data': {'contractCode': f'PB{i:011d}', 'amount': 150000 + i, 'details': [{'kind': 'water', 'value': i}]}},
+            api_response_time=now,
+            api_success=True,
+            added_to_warehouse_at=now - timedelta(minutes=i),
+            added_by=1,
+            customer_id=i % 500 or None,
+            created_at=now,
+            updated_at=now
+        ))
+    return bills
+
+def legacy_to_dict(bill):
+    """Bill.to_dict() as it was before models returned raw values"""
+    data = bill.to_dict()
+    for key in ('due_date', 'bill_date', 'api_response_time', 'added_to_warehouse_at', 'created_at', 'updated_at'):
+        data[key] = data[key].isoformat() if data[key] else None
+    data['amount'] = float(data['amount']) if data['amount'] else None
+    data['status'] = data['status'].value if data['status'] else None
+    return data
+
+def export_payload(bill_list):
+    return {'success': True, 'bills': bill_list, 'total': len(bill_list), 'format': 'json'}
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), size
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark bill export serialization')
+    parser.add_argument('--bills', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    default_provider = DefaultJSONProvider(app)
+    stdlib_provider = FastJSONProvider(app)
+    stdlib_provider.use_orjson = False
+    fast_provider = FastJSONProvider(app)
+
+    print(f"📦 Building {args.bills:,} bills...")
+    bills = make_bills(args.bills)
+
+    cases = [
+        ('before', lambda: len(default_provider.response(export_payload([legacy_to_dict(b) for b in bills])).data)),
+        ('stdlib', lambda: len(stdlib_provider.response(export_payload([b.to_dict() for b in bills])).data)),
+    ]
+    if orjson is not None:
+        cases.append(('orjson', lambda: len(fast_provider.response(export_payload([b.to_dict() for b in bills])).data)))
+    else:
+        print("⚠️  orjson is not installed; skipping the orjson case")
+
+    with app.app_context():
+        baseline = None
+        for name, func in cases:
+            seconds, size = best_of(args.repeat, func)
+            baseline = baseline or seconds
+            print(f"⏱️  {name:<7} {seconds * 1000:8.1f} ms  {size / 1024 / 1024:6.2f} MB  {baseline / seconds:4.1f}x")
+
+if __name__ == "__main__":
+    main()
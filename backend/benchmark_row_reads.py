@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark the row-tuple read path against ORM hydration for list endpoints
+
+Seeds a scratch database with bills and sales, then times reading and
+serializing them two ways:
+
+    orm    db.query(Model).all() + to_dict()
+    rows   select(*Model.dict_columns()) + Model.row_to_dict()
+
+Usage:
+    python benchmark_row_reads.py                      # in-memory SQLite, 10,000 bills
+    python benchmark_row_reads.py --bills 50000 --repeat 3
+    python benchmark_row_reads.py --database-url postgresql://.../scratch_db
+
+The target database must be a scratch one: all tables are created in it
+and dropped afterwards.
+"""
+
+import sys
+import os
+import argparse
+import time
+from decimal import Decimal
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, desc, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from config.database import Base
+from models import User, Customer, Bill, BillStatus, Sale, SaleStatus, PaymentMethod
+from services.sales_service import sales_service, SALE_SUMMARY_LOAD
+
+def seed(db, bill_count):
+    user = User(username='bench', email='bench@example.com', password_hash='x', role='admin')
+    db.add(user)
+    db.flush()
+    customers = [Customer(name=f'Khách hàng {i}', phone=f'09{i:08d}', created_by=user.id) for i in range(100)]
+    db.add_all(customers)
+    db.flush()
+    sales = [
+        Sale(customer_id=customers[i % 100].id, user_id=user.id, total_bill_amount=Decimal('300000'),
+             profit_percentage=Decimal('5'), profit_amount=Decimal('15000'), customer_payment=Decimal('285000'),
+             payment_method=PaymentMethod.BANK_TRANSFER, status=SaleStatus.PENDING_PAYMENT)
+        for i in range(bill_count // 3)
+    ]
+    db.add_all(sales)
+    db.flush()
+    db.bulk_save_objects([
+        Bill(contract_code=f'PB{i:011d}', customer_name=f'Nguyễn Văn {i}', address=f'{i} Lê Lợi, Quận 1',
+             amount=Decimal(100000 + i), period='10/2026', meter_number=f'MN{i:07d}',
+             status=BillStatus.IN_WAREHOUSE if i % 2 else BillStatus.PENDING_PAYMENT,
+             raw_response='{"data": {"amount": %d}}' % (100000 + i), api_success=True,
+             sale_id=None if i % 2 else sales[(i // 2) % len(sales)].id)
+        for i in range(bill_count)
+    ])
+    db.commit()
+    return len(sales)
+
+def best_of(repeat, Session, func):
+    timings = []
+    for _ in range(repeat):
+        db = Session()
+        try:
+            started = time.perf_counter()
+            count = len(func(db))
+            timings.append(time.perf_counter() - started)
+        finally:
+            db.close()
+    return min(timings), count
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ORM vs Core row reads')
+    parser.add_argument('--bills', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url', default='sqlite://', help='Scratch database (default: in-memory SQLite)')
+    args = parser.parse_args()
+
+    if args.database_url.startswith('sqlite'):
+        engine = create_engine(args.database_url, poolclass=StaticPool, connect_args={'check_same_thread': False})
+    else:
+        engine = create_engine(args.database_url)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    print(f"📦 Seeding {args.bills:,} bills...")
+    db = Session()
+    sale_count = seed(db, args.bills)
+    db.close()
+
+    cases = [
+        ('bills', 'orm', lambda db: [bill.to_dict() for bill in db.query(Bill).order_by(desc(Bill.id)).all()]),
+        ('bills', 'rows', lambda db: [Bill.row_to_dict(row) for row in db.execute(
+            select(*Bill.dict_columns()).order_by(desc(Bill.id))).all()]),
+        ('sales', 'orm', lambda db: [sale.to_dict(detail=False) for sale in db.query(Sale).options(
+            *SALE_SUMMARY_LOAD).order_by(desc(Sale.id)).all()]),
+        ('sales', 'rows', lambda db: sales_service._sale_dicts(db, db.execute(
+            select(*Sale.dict_columns()).order_by(desc(Sale.id))).all())),
+    ]
+
+    try:
+        results = {}
+        for name, path, func in cases:
+            seconds, count = best_of(args.repeat, Session, func)
+            results[(name, path)] = seconds
+            speedup = f"{results[(name, 'orm')] / seconds:4.1f}x" if path == 'rows' else ''
+            print(f"⏱️  {name:<6} {path:<5} {count:>7,} rows  {seconds * 1000:8.1f} ms  "
+                  f"{seconds / count * 1e6:6.1f} µs/row  {speedup}")
+    finally:
+        Base.metadata.drop_all(engine)
+
+    print(f"✅ Done ({sale_count:,} sales with their bills)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Find (and optionally merge) duplicate customers
+
+Usage:
+    python dedup_customers.py                          # print the merge report
+    python dedup_customers.py --output report.json     # also save it as JSON
+    python dedup_customers.py --merge                  # merge every cluster
+"""
+
+import sys
+import os
+import json
+import argparse
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.customer_dedup_service import customer_dedup_service
+
+def main():
+    parser = argparse.ArgumentParser(description='Detect duplicate customers with blocking keys')
+    parser.add_argument('--threshold', type=float, default=0.6, help='Minimum pair score (0-1)')
+    parser.add_argument('--output', help='Write the merge report to this JSON file')
+    parser.add_argument('--merge', action='store_true', help='Merge each cluster into its primary customer')
+    args = parser.parse_args()
+    
+    print("🔄 Building duplicate customer report...")
+    report = customer_dedup_service.find_duplicates(threshold=args.threshold)
+    
+    if not report['success']:
+        print(f"❌ Dedup failed: {report['error']}")
+        sys.exit(1)
+    
+    for cluster in report['clusters'][:50]:
+        names = ', '.join(f"#{c['id']} {c['name']} ({c['phone']})" for c in cluster['customers'])
+        best = cluster['pairs'][0]
+        print(f"  - keep #{cluster['primary_id']}: {names} [score {best['score']}, {'+'.join(best['reasons'])}]")
+    if len(report['clusters']) > 50:
+        print(f"  ... and {len(report['clusters']) - 50} more")
+    
+    print(f"✅ Scanned {report['customers_scanned']} customers, scored {report['pairs_scored']} pairs "
+          f"in {report['elapsed_seconds']}s, found {len(report['clusters'])} clusters")
+    if report['skipped_blocks']:
+        print(f"⚠️ Skipped {report['skipped_blocks']} oversized blocks")
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"📄 Report written to {args.output}")
+    
+    if args.merge and report['clusters']:
+        print("🔄 Merging clusters...")
+        result = customer_dedup_service.merge_clusters(report['clusters'])
+        for error in result['errors']:
+            print(f"  ❌ Cluster #{error['primary_id']}: {error['error']}")
+        print(f"✅ Merged {result['customers_merged']} customers, moved {result['bills_moved']} bills "
+              f"and {result['sales_moved']} sales")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+List customers whose phone numbers are the same number in different formats
+
+Usage:
+    python find_duplicate_phones.py
+"""
+
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.customer_service import customer_service
+
+def main():
+    parser = argparse.ArgumentParser(description='Find duplicate customer phone numbers')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+    
+    print("🔄 Scanning customer phone numbers...")
+    result = customer_service.find_phone_duplicates(chunk_size=args.chunk_size)
+    
+    if not result['success']:
+        print(f"❌ Scan failed: {result['error']}")
+        sys.exit(1)
+    
+    for cluster in result['clusters']:
+        print(f"  {cluster['phone_normalized']}:")
+        for customer in cluster['customers']:
+            state = "active" if customer['is_active'] else "inactive"
+            print(f"    - #{customer['id']} {customer['name']} ({customer['phone']}, {state}, {customer['total_bills']} bills)")
+    
+    print(f"✅ Scanned {result['scanned']} customers, found {result['count']} duplicate clusters")
+
+if __name__ == "__main__":
+    main()
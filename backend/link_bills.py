@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Link unassigned bills to customers by normalized name and address
+
+Usage:
+    python link_bills.py          # only bills added since the last run
+    python link_bills.py --full   # rescan every unassigned bill
+"""
+
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.bill_link_service import bill_link_service
+
+def main():
+    parser = argparse.ArgumentParser(description='Auto-link bills to customers')
+    parser.add_argument('--full', action='store_true', help='Ignore the watermark of the previous run')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+    
+    print("🔄 Linking bills to customers...")
+    result = bill_link_service.link_bills(full=args.full, chunk_size=args.chunk_size)
+    
+    if not result['success']:
+        print(f"❌ Linking failed: {result['error']}")
+        sys.exit(1)
+    
+    run = result['run']
+    print(f"✅ {result['message']} in {run['elapsed_seconds']}s "
+          f"({run['bills_per_second'] or 0:,.0f} bills/s, watermark {run['last_bill_id']})")
+
+if __name__ == "__main__":
+    main()
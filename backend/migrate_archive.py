@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Migration script for the archive tables (hot/cold archival of finished sales and bills)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config.database import engine
+from models.archive import ArchiveRun, sales_archive, bills_archive, customer_transactions_archive
+
+def migrate_archive():
+    """Create sales_archive, bills_archive, customer_transactions_archive and archive_runs"""
+    print("🔄 Starting migration: Create archive tables...")
+    for table in (sales_archive, bills_archive, customer_transactions_archive, ArchiveRun.__table__):
+        table.create(bind=engine, checkfirst=True)
+        print(f"✅ {table.name} is in place")
+
+if __name__ == "__main__":
+    migrate_archive()
+    print("🎉 Migration completed!")
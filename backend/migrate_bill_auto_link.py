@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Migration script for bill auto-linking: normalized match keys and run history
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config.database import get_db, engine
+from sqlalchemy import select, text, update
+from models.customer import Customer
+from models.bill_link_run import BillLinkRun
+from utils.normalization import normalize_name
+
+CHUNK_SIZE = 5000
+
+def migrate_bill_auto_link():
+    """Add match_name/match_address to customers and bills, backfill customers"""
+    db = None
+    try:
+        db = next(get_db())
+        
+        print("🔄 Starting migration: Add normalized match keys...")
+        for table in ('customers', 'bills'):
+            db.execute(text(f"""
+                ALTER TABLE {table}
+                ADD COLUMN IF NOT EXISTS match_name VARCHAR(100),
+                ADD COLUMN IF NOT EXISTS match_address TEXT
+            """))
+            db.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_match_name ON {table} (match_name)"))
+        db.commit()
+        
+        BillLinkRun.__table__.create(bind=engine, checkfirst=True)
+        print("✅ Columns, indexes and bill_link_runs table are in place")
+        
+        print("🔄 Backfilling customer match keys...")
+        filled = 0
+        last_id = 0
+        while True:
+            rows = db.execute(
+                select(Customer.id, Customer.name, Customer.address)
+                .where(Customer.id > last_id).order_by(Customer.id).limit(CHUNK_SIZE)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            
+            db.execute(update(Customer), [
+                {
+                    'id': row.id,
+                    'match_name': normalize_name(row.name) or None,
+                    'match_address': normalize_name(row.address) or None
+                }
+                for row in rows
+            ])
+            db.commit()
+            filled += len(rows)
+        
+        print(f"✅ Backfilled {filled} customers; bills get their keys on the first link_bills.py run")
+        
+    except Exception as e:
+        print(f"❌ Error during migration: {e}")
+        if db:
+            db.rollback()
+        raise
+    finally:
+        if db:
+            db.close()
+
+if __name__ == "__main__":
+    migrate_bill_auto_link()
+    print("🎉 Migration completed!")
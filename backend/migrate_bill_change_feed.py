@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Migration script for the bill change feed (GET /api/bills/changes)
+
+Adds bills.change_xid, the trigger that stamps it on every insert/update
+and its index. Existing rows keep an empty change_xid: clients load the
+warehouse once in full and then follow the feed. Requires PostgreSQL 13+.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config.database import engine
+from sqlalchemy import text
+from models.bill import BILL_CHANGE_TRIGGER_DDL
+
+def migrate_bill_change_feed():
+    """Add bills.change_xid with its trigger and index"""
+    print("🔄 Starting migration: Add bills.change_xid...")
+
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE bills ADD COLUMN IF NOT EXISTS change_xid BIGINT"))
+        for statement in BILL_CHANGE_TRIGGER_DDL:
+            conn.execute(text(statement))
+    print("✅ Column and bills_change_xid trigger are in place")
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # Index builds can outlast the application statement timeout
+        conn.execute(text("SET statement_timeout = 0"))
+        conn.execute(text("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_bills_change_xid
+            ON bills (change_xid)
+        """))
+
+    print("✅ ix_bills_change_xid is in place")
+
+if __name__ == "__main__":
+    migrate_bill_change_feed()
+    print("🎉 Migration completed!")
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Migration script to add denormalized total_bills/total_amount to customers
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config.database import get_db
+from sqlalchemy import text, update
+from models.customer import Customer
+from services.customer_service import customer_service
+
+def migrate_customer_aggregates():
+    """Add aggregate columns, index the foreign keys they sum over and backfill"""
+    db = None
+    try:
+        db = next(get_db())
+        
+        print("🔄 Starting migration: Add customer aggregate columns...")
+        
+        db.execute(text("""
+            ALTER TABLE customers
+            ADD COLUMN IF NOT EXISTS total_bills INTEGER NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS total_amount NUMERIC(15, 2) NOT NULL DEFAULT 0
+        """))
+        db.execute(text("CREATE INDEX IF NOT EXISTS ix_bills_customer_id ON bills (customer_id)"))
+        db.execute(text("CREATE INDEX IF NOT EXISTS ix_sales_customer_id ON sales (customer_id)"))
+        db.commit()
+        
+        print("✅ Columns and indexes are in place")
+        print("🔄 Backfilling totals from bills and sales...")
+        
+        result = db.execute(
+            update(Customer).values(**customer_service._totals_values()),
+            execution_options={'synchronize_session': False}
+        )
+        db.commit()
+        
+        print(f"✅ Backfilled totals for {result.rowcount} customers")
+        
+    except Exception as e:
+        print(f"❌ Error during migration: {e}")
+        if db:
+            db.rollback()
+        raise
+    finally:
+        if db:
+            db.close()
+
+if __name__ == "__main__":
+    migrate_customer_aggregates()
+    print("🎉 Migration completed!")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Migration script to add customers.phone_normalized (E.164) with a unique index
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config.database import get_db, engine
+from sqlalchemy import select, text, update
+from models.customer import Customer
+from utils.normalization import phone_e164
+
+CHUNK_SIZE = 5000
+
+def migrate_customer_phone_normalized():
+    """Add the column, backfill it in chunks and build the unique index"""
+    db = None
+    try:
+        db = next(get_db())
+        
+        print("🔄 Starting migration: Add customers.phone_normalized...")
+        db.execute(text("ALTER TABLE customers ADD COLUMN IF NOT EXISTS phone_normalized VARCHAR(20)"))
+        db.commit()
+        
+        print("🔄 Backfilling normalized phone numbers...")
+        taken = set(db.execute(
+            select(Customer.phone_normalized).where(Customer.phone_normalized.isnot(None))
+        ).scalars())
+        
+        filled = 0
+        duplicates = 0
+        last_id = 0
+        while True:
+            rows = db.execute(
+                select(Customer.id, Customer.phone)
+                .where(Customer.id > last_id, Customer.phone_normalized.is_(None))
+                .order_by(Customer.id).limit(CHUNK_SIZE)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            
+            values = []
+            for row in rows:
+                normalized = phone_e164(row.phone)
+                if not normalized:
+                    continue
+                if normalized in taken:
+                    # Oldest customer keeps the number; later ones are left for find_duplicate_phones.py
+                    duplicates += 1
+                    continue
+                taken.add(normalized)
+                values.append({'id': row.id, 'phone_normalized': normalized})
+            
+            if values:
+                db.execute(update(Customer), values)
+                db.commit()
+                filled += len(values)
+        
+        print(f"✅ Backfilled {filled} customers ({duplicates} duplicates left empty)")
+        
+    except Exception as e:
+        print(f"❌ Error during migration: {e}")
+        if db:
+            db.rollback()
+        raise
+    finally:
+        if db:
+            db.close()
+    
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # Index builds can outlast the application statement timeout
+        conn.execute(text("SET statement_timeout = 0"))
+        conn.execute(text("""
+            CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_customers_phone_normalized
+            ON customers (phone_normalized)
+        """))
+    
+    print("✅ ix_customers_phone_normalized is in place")
+    if duplicates:
+        print("⚠️ Run find_duplicate_phones.py to review the remaining duplicates")
+
+if __name__ == "__main__":
+    migrate_customer_phone_normalized()
+    print("🎉 Migration completed!")
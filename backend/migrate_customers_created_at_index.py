@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Migration script to index customers.created_at for monthly growth statistics
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config.database import engine
+from sqlalchemy import text
+
+def migrate_customers_created_at_index():
+    """Add ix_customers_created_at to the customers table"""
+    print("🔄 Starting migration: Index customers.created_at...")
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # Index builds can outlast the application statement timeout
+        conn.execute(text("SET statement_timeout = 0"))
+        conn.execute(text("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_customers_created_at
+            ON customers (created_at)
+        """))
+
+    print("✅ ix_customers_created_at is in place")
+
+if __name__ == "__main__":
+    migrate_customers_created_at_index()
+    print("🎉 Migration completed!")
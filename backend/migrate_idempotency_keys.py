@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+Migration script for the idempotency_keys table (stored responses for Idempotency-Key retries)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config.database import engine
+from models.idempotency_key import IdempotencyKey
+
+def migrate_idempotency_keys():
+    """Create the idempotency_keys table and its expiry index"""
+    print("🔄 Starting migration: Create idempotency_keys table...")
+    IdempotencyKey.__table__.create(bind=engine, checkfirst=True)
+    print("✅ idempotency_keys table is in place")
+
+if __name__ == "__main__":
+    migrate_idempotency_keys()
+    print("🎉 Migration completed!")
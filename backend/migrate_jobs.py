@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+Migration script for the jobs table (durable background job queue)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config.database import engine
+from models.job import Job
+
+def migrate_jobs():
+    """Create the jobs table, its status enum and the claim index"""
+    print("🔄 Starting migration: Create jobs table...")
+    Job.__table__.create(bind=engine, checkfirst=True)
+    print("✅ jobs table is in place")
+
+if __name__ == "__main__":
+    migrate_jobs()
+    print("🎉 Migration completed!")
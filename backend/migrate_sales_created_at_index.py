@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Migration script to index sales.created_at for date-range statistics
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config.database import engine
+from sqlalchemy import text
+
+def migrate_sales_created_at_index():
+    """Add ix_sales_created_at to the sales table"""
+    print("🔄 Starting migration: Index sales.created_at...")
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # Index builds can outlast the application statement timeout
+        conn.execute(text("SET statement_timeout = 0"))
+        conn.execute(text("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_sales_created_at
+            ON sales (created_at)
+        """))
+
+    print("✅ ix_sales_created_at is in place")
+
+if __name__ == "__main__":
+    migrate_sales_created_at_index()
+    print("🎉 Migration completed!")
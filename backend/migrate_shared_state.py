@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+Migration script for the shared_state table (state shared by API worker processes)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config.database import engine
+from models.shared_state import SharedStateEntry
+
+def migrate_shared_state():
+    """Create the shared_state table and its expiry index"""
+    print("🔄 Starting migration: Create shared_state table...")
+    SharedStateEntry.__table__.create(bind=engine, checkfirst=True)
+    print("✅ shared_state table is in place")
+
+if __name__ == "__main__":
+    migrate_shared_state()
+    print("🎉 Migration completed!")
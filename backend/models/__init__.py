@@ -4,6 +4,11 @@ from .bill import Bill, BillStatus
 from .sale import Sale, SaleStatus, PaymentMethod
 from .proxy import Proxy, ProxyType, ProxyStatus
 from .customer_transaction import CustomerTransaction, TransactionType, TransactionStatus
+from .bill_link_run import BillLinkRun
+from .shared_state import SharedStateEntry
+from .job import Job, JobStatus
+from .idempotency_key import IdempotencyKey
+from .archive import ArchiveRun, sales_archive, bills_archive, customer_transactions_archive
 
 # Export all models
 __all__ = [
@@ -19,5 +24,14 @@ __all__ = [
     'ProxyStatus',
     'CustomerTransaction',
     'TransactionType',
-    'TransactionStatus'
+    'TransactionStatus',
+    'BillLinkRun',
+    'SharedStateEntry',
+    'Job',
+    'JobStatus',
+    'IdempotencyKey',
+    'ArchiveRun',
+    'sales_archive',
+    'bills_archive',
+    'customer_transactions_archive'
 ]
@@ -0,0 +1,66 @@
+from sqlalchemy import Column, Integer, DateTime, Numeric, Index, Table
+from sqlalchemy.sql import func
+from config.database import Base
+from models.bill import Bill
+from models.sale import Sale
+from models.customer_transaction import CustomerTransaction
+
+def archive_table(source: Table, name: str, *indexed: str) -> Table:
+    """Cold copy of ``source`` for rows moved out by ``ArchiveService``
+
+    Same columns and types, but no foreign keys, unique constraints or
+    defaults: rows are copied as they were, and an archived bill's contract
+    code may be added to the warehouse again. ``archived_at`` records the
+    move; ``indexed`` columns get an index each.
+    """
+    columns = [
+        Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable, autoincrement=False)
+        for column in source.columns
+    ]
+    indexes = [Index(f'ix_{name}_{column}', column) for column in indexed]
+    return Table(
+        name, Base.metadata,
+        *columns,
+        Column('archived_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+        *indexes
+    )
+
+# Archived rows keep their ids, so reads can union them with the hot tables
+sales_archive = archive_table(Sale.__table__, 'sales_archive', 'customer_id', 'created_at')
+bills_archive = archive_table(Bill.__table__, 'bills_archive', 'sale_id', 'customer_id', 'created_at', 'contract_code')
+customer_transactions_archive = archive_table(CustomerTransaction.__table__, 'customer_transactions_archive', 'sale_id')
+
+class ArchiveRun(Base):
+    """One run of the hot/cold archiver
+
+    ``cutoff`` is the horizon: every archived row was created before it, so
+    a read whose date range starts at or after the latest cutoff never needs
+    the archive tables.
+    """
+
+    __tablename__ = 'archive_runs'
+
+    id = Column(Integer, primary_key=True, index=True)
+    cutoff = Column(DateTime(timezone=True), nullable=False)
+    sales_archived = Column(Integer, nullable=False, default=0)
+    bills_archived = Column(Integer, nullable=False, default=0)
+    transactions_archived = Column(Integer, nullable=False, default=0)
+    elapsed_seconds = Column(Numeric(10, 3), nullable=True)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': self.id,
+            'cutoff': self.cutoff.isoformat() if self.cutoff else None,
+            'sales_archived': self.sales_archived,
+            'bills_archived': self.bills_archived,
+            'transactions_archived': self.transactions_archived,
+            'elapsed_seconds': float(self.elapsed_seconds) if self.elapsed_seconds else 0.0,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f"<ArchiveRun(id={self.id}, cutoff={self.cutoff}, sales={self.sales_archived}, bills={self.bills_archived})>"
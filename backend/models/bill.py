@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Numeric, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Boolean, ForeignKey, Numeric, Enum, DDL, event
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from config.database import Base
+from utils.tracing import traced_serialization
 from enum import Enum as PyEnum
 
 class BillStatus(PyEnum):
@@ -40,7 +41,10 @@ class Bill(Base):
     warehouse_notes = Column(Text, nullable=True)
     
     # Customer information
-    customer_id = Column(Integer, ForeignKey('customers.id'), nullable=True)
+    customer_id = Column(Integer, ForeignKey('customers.id'), nullable=True, index=True)
+    # Normalized customer_name/address, filled by BillLinkService when linking
+    match_name = Column(String(100), nullable=True, index=True)
+    match_address = Column(Text, nullable=True)
     
     # Sale information
     sale_id = Column(Integer, ForeignKey('sales.id'), nullable=True)
@@ -49,35 +53,80 @@ class Bill(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    # Transaction id of the last insert/update, set by the bills_change_xid
+    # trigger; drives the change feed (BillService.get_bill_changes)
+    change_xid = Column(BigInteger, nullable=True, index=True)
+    
     # Relationships
     added_by_user = relationship("User")
     customer = relationship("Customer")
     sale = relationship("Sale", back_populates="bills")
     
-    def to_dict(self):
-        """Convert to dictionary"""
-        return {
-            'id': self.id,
-            'contract_code': self.contract_code,
-            'customer_name': self.customer_name,
-            'address': self.address,
-            'amount': float(self.amount) if self.amount else None,
-            'period': self.period,
-            'due_date': self.due_date.isoformat() if self.due_date else None,
-            'bill_date': self.bill_date.isoformat() if self.bill_date else None,
-            'meter_number': self.meter_number,
-            'status': self.status.value if hasattr(self.status, 'value') else str(self.status) if self.status else None,
-            'raw_response': self.raw_response,
-            'api_response_time': self.api_response_time.isoformat() if self.api_response_time else None,
-            'api_success': self.api_success,
-            'added_to_warehouse_at': self.added_to_warehouse_at.isoformat() if self.added_to_warehouse_at else None,
-            'added_by': self.added_by,
-            'warehouse_notes': self.warehouse_notes,
-            'customer_id': self.customer_id,
-            'sale_id': self.sale_id,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    # Columns read by to_dict(); list endpoints select exactly these (see row_to_dict)
+    DICT_COLUMNS = (
+        'id', 'contract_code', 'customer_name', 'address', 'amount', 'period', 'due_date',
+        'bill_date', 'meter_number', 'status', 'raw_response', 'api_response_time', 'api_success',
+        'added_to_warehouse_at', 'added_by', 'warehouse_notes', 'customer_id', 'sale_id',
+        'created_at', 'updated_at'
+    )
+    
+    @classmethod
+    def dict_columns(cls, include_raw: bool = True, source=None):
+        """Column attributes for a Core ``select()`` whose rows feed ``row_to_dict``
+        
+        ``source`` selects them from an alias instead (see ArchiveService).
+        """
+        source = source if source is not None else cls
+        return [getattr(source, name) for name in cls.DICT_COLUMNS if include_raw or name != 'raw_response']
+    
+    @traced_serialization
+    def to_dict(self, include_raw: bool = True):
+        """Convert to dictionary
+        
+        ``include_raw=False`` drops the stored FPT API payload, which is by far
+        the largest field, when the bill is embedded in list responses. Values
+        are returned as stored (Decimal, datetime, enum members) and encoded
+        by the app's JSON provider (``utils.json_provider``).
+        """
+        return self._from_values({name: getattr(self, name) for name in self.DICT_COLUMNS}, include_raw)
+    
+    @staticmethod
+    @traced_serialization
+    def row_to_dict(row, include_raw: bool = True):
+        """Same dictionary as to_dict() from a Core row of ``dict_columns()``
+        
+        Lets read-only list endpoints skip ORM instance construction and
+        identity-map bookkeeping entirely.
+        """
+        return Bill._from_values(row._asdict(), include_raw)
+    
+    @staticmethod
+    def _from_values(data, include_raw: bool):
+        data['amount'] = data['amount'] or None
+        if not include_raw:
+            data.pop('raw_response', None)
+        return data
     
     def __repr__(self):
         return f"<Bill(id={self.id}, contract_code='{self.contract_code}', amount={self.amount}, status='{self.status}')>"
+
+# Stamps bills.change_xid on every insert and update, whoever issues it
+# (services, scripts, raw SQL). Requires PostgreSQL 13+ for pg_current_xact_id().
+BILL_CHANGE_TRIGGER_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION bills_set_change_xid() RETURNS trigger AS $$
+    BEGIN
+        NEW.change_xid := pg_current_xact_id()::text::bigint;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS bills_change_xid ON bills",
+    """
+    CREATE TRIGGER bills_change_xid BEFORE INSERT OR UPDATE ON bills
+    FOR EACH ROW EXECUTE FUNCTION bills_set_change_xid()
+    """,
+)
+
+for _statement in BILL_CHANGE_TRIGGER_DDL:
+    event.listen(Bill.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, DateTime, Boolean, Numeric
+from sqlalchemy.sql import func
+from config.database import Base
+
+class BillLinkRun(Base):
+    """One run of the bill-to-customer auto-linker
+
+    ``last_bill_id`` is the watermark: the next incremental run only looks
+    at bills created after it.
+    """
+    
+    __tablename__ = 'bill_link_runs'
+    
+    id = Column(Integer, primary_key=True, index=True)
+    full_scan = Column(Boolean, default=False)
+    last_bill_id = Column(Integer, nullable=False, default=0)
+    bills_scanned = Column(Integer, nullable=False, default=0)
+    bills_linked = Column(Integer, nullable=False, default=0)
+    customers_updated = Column(Integer, nullable=False, default=0)
+    elapsed_seconds = Column(Numeric(10, 3), nullable=True)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        elapsed = float(self.elapsed_seconds) if self.elapsed_seconds else 0.0
+        return {
+            'id': self.id,
+            'full_scan': self.full_scan,
+            'last_bill_id': self.last_bill_id,
+            'bills_scanned': self.bills_scanned,
+            'bills_linked': self.bills_linked,
+            'customers_updated': self.customers_updated,
+            'elapsed_seconds': elapsed,
+            'bills_per_second': round(self.bills_scanned / elapsed, 1) if elapsed else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+    
+    def __repr__(self):
+        return f"<BillLinkRun(id={self.id}, last_bill_id={self.last_bill_id}, linked={self.bills_linked})>"
@@ -2,6 +2,7 @@ from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Foreign
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from config.database import Base
+from utils.tracing import traced_serialization
 from enum import Enum as PyEnum
 
 class CustomerType(PyEnum):
@@ -23,6 +24,9 @@ class Customer(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False, index=True)
     phone = Column(String(20), unique=True, index=True, nullable=False)
+    # E.164 form of phone ('+84901234567'), set by CustomerService on every write
+    # so that differently formatted numbers dedup through one unique index
+    phone_normalized = Column(String(20), unique=True, index=True, nullable=True)
     zalo = Column(String(50), nullable=True)
     email = Column(String(100), nullable=True)
     bank_account = Column(String(50), nullable=True)
@@ -30,6 +34,10 @@ class Customer(Base):
     address = Column(Text, nullable=True)
     notes = Column(Text, nullable=True)
     
+    # Unaccented lowercase name/address, used to auto-link bills (see BillLinkService)
+    match_name = Column(String(100), nullable=True, index=True)
+    match_address = Column(Text, nullable=True)
+    
     # New fields for frontend compatibility
     customer_type = Column(Enum(CustomerType, name='customer_type_enum'), default=CustomerType.INDIVIDUAL)
     company_name = Column(String(200), nullable=True)
@@ -39,8 +47,13 @@ class Customer(Base):
     # Legacy field (keep for backward compatibility)
     is_active = Column(Boolean, default=True)
     
+    # Denormalized aggregates, kept in sync by CustomerService.refresh_customer_totals
+    # whenever bills or sales are linked, relinked or cancelled
+    total_bills = Column(Integer, nullable=False, default=0, server_default='0')
+    total_amount = Column(Numeric(15, 2), nullable=False, default=0, server_default='0')
+    
     created_by = Column(Integer, ForeignKey('users.id'), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
@@ -48,59 +61,88 @@ class Customer(Base):
     sales = relationship("Sale", back_populates="customer")
     bills = relationship("Bill", back_populates="customer")
     
+    # Columns read by to_dict() / to_summary_dict(); list endpoints select exactly these
+    DICT_COLUMNS = (
+        'id', 'name', 'phone', 'zalo', 'email', 'bank_account', 'bank_name', 'address', 'notes',
+        'customer_type', 'company_name', 'tax_code', 'status', 'is_active', 'total_bills',
+        'total_amount', 'created_by', 'created_at', 'updated_at'
+    )
+    SUMMARY_COLUMNS = ('id', 'name', 'phone', 'zalo', 'email', 'bank_account', 'bank_name', 'address')
+    
+    @classmethod
+    def dict_columns(cls):
+        """Column attributes for a Core ``select()`` whose rows feed ``row_to_dict``"""
+        return [getattr(cls, name) for name in cls.DICT_COLUMNS]
+    
+    @classmethod
+    def summary_columns(cls):
+        """Column attributes whose Core rows map one-to-one onto to_summary_dict()"""
+        return [getattr(cls, name) for name in cls.SUMMARY_COLUMNS]
+    
+    @traced_serialization
     def to_dict(self):
         """Convert to dictionary with calculated fields"""
-        # Tính từ bills trực tiếp liên kết với customer
-        direct_bills_count = len(self.bills) if self.bills else 0
-        direct_bills_amount = sum(float(bill.amount) for bill in self.bills) if self.bills else 0.0
-        
-        # Tính từ sales (giao dịch bán)
-        sales_count = len(self.sales) if self.sales else 0
-        sales_amount = sum(float(sale.total_bill_amount) for sale in self.sales) if self.sales else 0.0
-        
-        # Tổng hợp - bills trực tiếp + sales
-        total_bills = direct_bills_count + sales_count
-        total_amount = direct_bills_amount + sales_amount
+        return self._from_values({name: getattr(self, name) for name in self.DICT_COLUMNS})
+    
+    @staticmethod
+    @traced_serialization
+    def row_to_dict(row):
+        """Same dictionary as to_dict() from a Core row of ``dict_columns()``"""
+        return Customer._from_values(row._asdict())
+    
+    @staticmethod
+    def _from_values(values):
+        # Tổng hợp - bills trực tiếp + sales, đọc từ cột tổng hợp (không load bills/sales)
+        total_bills = values['total_bills'] or 0
+        total_amount = values['total_amount'] or 0.0
         
         # Map legacy is_active to new status
-        if hasattr(self, 'status') and self.status:
-            status = self.status.value if hasattr(self.status, 'value') else str(self.status)
+        if values['status']:
+            status = values['status']
         else:
             # Fallback to legacy is_active
-            status = CustomerStatus.ACTIVE.value if self.is_active else CustomerStatus.INACTIVE.value
+            status = CustomerStatus.ACTIVE if values['is_active'] else CustomerStatus.INACTIVE
         
         # Map legacy fields to new structure
-        customer_type = self.customer_type.value if hasattr(self.customer_type, 'value') else str(self.customer_type) if self.customer_type else CustomerType.INDIVIDUAL.value
+        customer_type = values['customer_type'] or CustomerType.INDIVIDUAL
         
         return {
-            'id': self.id,
-            'name': self.name,
-            'phone': self.phone,
-            'zalo': self.zalo,
-            'email': self.email,
-            'bank_account': self.bank_account,
-            'bank_name': self.bank_name,
-            'address': self.address,
-            'notes': self.notes,
+            'id': values['id'],
+            'name': values['name'],
+            'phone': values['phone'],
+            'zalo': values['zalo'],
+            'email': values['email'],
+            'bank_account': values['bank_account'],
+            'bank_name': values['bank_name'],
+            'address': values['address'],
+            'notes': values['notes'],
             
             # New fields for frontend
             'customerType': customer_type,
-            'companyName': self.company_name,
-            'taxCode': self.tax_code,
+            'companyName': values['company_name'],
+            'taxCode': values['tax_code'],
             'status': status,
             'totalBills': total_bills,
             'totalAmount': total_amount,
             
             # Legacy fields (keep for backward compatibility)
-            'is_active': self.is_active,
-            'created_by': self.created_by,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'is_active': values['is_active'],
+            'created_by': values['created_by'],
+            'created_at': values['created_at'],
+            'updated_at': values['updated_at'],
             
             # Frontend expects these field names
-            'createdAt': self.created_at.isoformat() if self.created_at else None,
-            'updatedAt': self.updated_at.isoformat() if self.updated_at else None,
+            'createdAt': values['created_at'],
+            'updatedAt': values['updated_at'],
         }
-    
+
+    def to_summary_dict(self):
+        """Convert to a slim dictionary without calculated totals
+
+        Used when a customer is embedded in another record (sales, reports),
+        so that serializing it never touches the bills/sales relationships.
+        """
+        return {name: getattr(self, name) for name in self.SUMMARY_COLUMNS}
+
     def __repr__(self):
         return f"<Customer(id={self.id}, name='{self.name}', phone='{self.phone}')>"
@@ -2,6 +2,7 @@ from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Foreign
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from config.database import Base
+from utils.tracing import traced_serialization
 from enum import Enum as PyEnum
 
 class TransactionType(PyEnum):
@@ -48,25 +49,37 @@ class CustomerTransaction(Base):
     # Relationships
     sale = relationship("Sale", back_populates="customer_transactions")
     
+    # Columns read by to_dict(); the sales export selects exactly these (see row_to_dict)
+    DICT_COLUMNS = (
+        'id', 'sale_id', 'transaction_type', 'amount', 'payment_method', 'bank_name', 'bank_account',
+        'reference_number', 'status', 'notes', 'admin_notes', 'created_at', 'updated_at', 'processed_at'
+    )
+    
+    @classmethod
+    def dict_columns(cls, source=None):
+        """Column attributes for a Core ``select()`` whose rows feed ``row_to_dict``
+        
+        ``source`` selects them from an alias instead (see ArchiveService).
+        """
+        source = source if source is not None else cls
+        return [getattr(source, name) for name in cls.DICT_COLUMNS]
+    
+    @traced_serialization
     def to_dict(self):
         """Convert to dictionary"""
-        return {
-            'id': self.id,
-            'sale_id': self.sale_id,
-            'transaction_type': self.transaction_type.value if hasattr(self.transaction_type, 'value') else str(self.transaction_type),
-            'amount': float(self.amount) if self.amount else None,
-            'payment_method': self.payment_method,
-            'bank_name': self.bank_name,
-            'bank_account': self.bank_account,
-            'reference_number': self.reference_number,
-            'status': self.status.value if hasattr(self.status, 'value') else str(self.status),
-            'notes': self.notes,
-            'admin_notes': self.admin_notes,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'processed_at': self.processed_at.isoformat() if self.processed_at else None,
-            # Không include sale để tránh recursion
-        }
+        return self._from_values({name: getattr(self, name) for name in self.DICT_COLUMNS})
+    
+    @staticmethod
+    @traced_serialization
+    def row_to_dict(row):
+        """Same dictionary as to_dict() from a Core row of ``dict_columns()``"""
+        return CustomerTransaction._from_values(row._asdict())
+    
+    @staticmethod
+    def _from_values(data):
+        # Không include sale để tránh recursion
+        data['amount'] = data['amount'] or None
+        return data
     
     def __repr__(self):
         return f"<CustomerTransaction(id={self.id}, type={self.transaction_type}, amount={self.amount}, status={self.status})>"
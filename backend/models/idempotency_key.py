@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, PrimaryKeyConstraint
+from config.database import Base
+
+class IdempotencyKey(Base):
+    """Stored response of a write request sent with an ``Idempotency-Key`` header
+
+    Keys are scoped per user. ``status_code`` is NULL while the first request
+    is still running; afterwards retries with the same key get the stored
+    response back until ``expires_at`` (see ``utils.idempotency``).
+    """
+
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        PrimaryKeyConstraint('scope', 'key'),
+    )
+
+    scope = Column(String(100), nullable=False)
+    key = Column(String(255), nullable=False)
+    # SHA-256 of method, path and body: a key may not be reused for another request
+    request_hash = Column(String(64), nullable=False)
+
+    status_code = Column(Integer, nullable=True)
+    content_type = Column(String(100), nullable=True)
+    response_body = Column(Text, nullable=True)
+
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey(scope='{self.scope}', key='{self.key}', status_code={self.status_code})>"
@@ -0,0 +1,73 @@
+import json
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Enum, ForeignKey, Index
+from sqlalchemy.sql import func
+from config.database import Base
+from enum import Enum as PyEnum
+
+class JobStatus(PyEnum):
+    """Background job status enumeration"""
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
+
+class Job(Base):
+    """Durable background job, claimed by workers with FOR UPDATE SKIP LOCKED
+
+    ``payload`` and ``result`` hold JSON. A job is retried with backoff
+    until ``max_attempts``; ``run_at`` is when it may next be claimed.
+    """
+
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # The claim query: next PENDING job by run_at
+        Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False, index=True)
+    status = Column(Enum(JobStatus, name='job_status_enum'), nullable=False, default=JobStatus.PENDING)
+    payload = Column(Text, nullable=True)
+
+    # Progress reported by the handler
+    progress = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=True)
+    message = Column(String(255), nullable=True)
+
+    # Outcome
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+
+    # Scheduling and retries
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+
+    # Worker holding the job and its last sign of life
+    locked_by = Column(String(100), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_by = Column(Integer, ForeignKey('users.id'), nullable=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Columns returned by to_dict (the result can be large; it has its own endpoint)
+    DICT_COLUMNS = (
+        'id', 'kind', 'status', 'progress', 'total', 'message', 'error', 'attempts',
+        'max_attempts', 'run_at', 'cancel_requested', 'created_by', 'created_at',
+        'started_at', 'finished_at'
+    )
+
+    def to_dict(self, include_payload: bool = True):
+        """Convert to dictionary"""
+        data = {name: getattr(self, name) for name in self.DICT_COLUMNS}
+        data['has_result'] = self.result is not None
+        if include_payload:
+            data['payload'] = json.loads(self.payload) if self.payload else None
+        return data
+
+    def __repr__(self):
+        return f"<Job(id={self.id}, kind='{self.kind}', status='{self.status}')>"
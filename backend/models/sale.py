@@ -2,6 +2,7 @@ from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Foreign
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from config.database import Base
+from utils.tracing import traced_serialization
 from enum import Enum as PyEnum
 
 class SaleStatus(PyEnum):
@@ -26,7 +27,7 @@ class Sale(Base):
     __tablename__ = 'sales'
     
     id = Column(Integer, primary_key=True, index=True)
-    customer_id = Column(Integer, ForeignKey('customers.id'), nullable=False)
+    customer_id = Column(Integer, ForeignKey('customers.id'), nullable=False, index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     
     # Sale details
@@ -48,7 +49,7 @@ class Sale(Base):
     customer_notes = Column(Text, nullable=True)
     
     # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
     
@@ -68,31 +69,65 @@ class Sale(Base):
             self.profit_amount = (total_amount_float * profit_percentage_float) / 100
             self.customer_payment = total_amount_float - self.profit_amount
     
-    def to_dict(self):
-        """Convert to dictionary"""
-        return {
-            'id': self.id,
-            'customer_id': self.customer_id,
-            'user_id': self.user_id,
-            'total_bill_amount': float(self.total_bill_amount) if self.total_bill_amount else None,
-            'profit_percentage': float(self.profit_percentage) if self.profit_percentage else None,
-            'profit_amount': float(self.profit_amount) if self.profit_amount else None,
-            'customer_payment': float(self.customer_payment) if self.customer_payment else None,
-            'payment_method': self.payment_method.value if hasattr(self.payment_method, 'value') else str(self.payment_method) if self.payment_method else None,
-            'payment_status': self.payment_status,
-            'payment_date': self.payment_date.isoformat() if self.payment_date else None,
-            'status': self.status.value if hasattr(self.status, 'value') else str(self.status) if self.status else None,
-            'notes': self.notes,
-            'customer_notes': self.customer_notes,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
-            # Include related data
-            'customer': self.customer.to_dict() if self.customer else None,
-            'user': self.user.to_dict() if self.user else None,
-            'bills': [bill.to_dict() for bill in self.bills] if self.bills else [],
-            'customer_transactions': [ct.to_dict() for ct in self.customer_transactions] if self.customer_transactions else []
-        }
+    # Columns read by to_dict(); list endpoints select exactly these (see row_to_dict)
+    DICT_COLUMNS = (
+        'id', 'customer_id', 'user_id', 'total_bill_amount', 'profit_percentage', 'profit_amount',
+        'customer_payment', 'payment_method', 'payment_status', 'payment_date', 'status', 'notes',
+        'customer_notes', 'created_at', 'updated_at', 'completed_at'
+    )
+    
+    @classmethod
+    def dict_columns(cls, source=None):
+        """Column attributes for a Core ``select()`` whose rows feed ``row_to_dict``
+        
+        ``source`` selects them from an alias instead (see ArchiveService).
+        """
+        source = source if source is not None else cls
+        return [getattr(source, name) for name in cls.DICT_COLUMNS]
+    
+    @traced_serialization
+    def to_dict(self, detail: bool = True):
+        """Convert to dictionary
+
+        Related records are serialized one level deep only: customer and user
+        are embedded as summaries. ``detail=False`` is the list-page shape,
+        which omits the raw FPT payload of bills and the transaction history.
+        Callers should eager-load the relationships they serialize (see
+        ``SALE_SUMMARY_LOAD`` / ``SALE_DETAIL_LOAD`` in the sales service).
+        """
+        transactions = None
+        if detail:
+            transactions = [ct.to_dict() for ct in self.customer_transactions] if self.customer_transactions else []
+        return self._from_values(
+            {name: getattr(self, name) for name in self.DICT_COLUMNS},
+            self.customer.to_summary_dict() if self.customer else None,
+            self.user.to_summary_dict() if self.user else None,
+            [bill.to_dict(include_raw=detail) for bill in self.bills] if self.bills else [],
+            transactions
+        )
+    
+    @staticmethod
+    @traced_serialization
+    def row_to_dict(row, customer, user, bills, transactions=None):
+        """Same dictionary as to_dict() from a Core row of ``dict_columns()``
+        
+        Related records are passed in already serialized; ``transactions`` is
+        None for the list-page shape (``detail=False``).
+        """
+        return Sale._from_values(row._asdict(), customer, user, bills, transactions)
+    
+    @staticmethod
+    def _from_values(data, customer, user, bills, transactions):
+        for name in ('total_bill_amount', 'profit_percentage', 'profit_amount', 'customer_payment'):
+            data[name] = data[name] or None
+        # Include related data
+        data['customer'] = customer
+        data['user'] = user
+        data['bills'] = bills
+        data['bills_count'] = len(bills)
+        if transactions is not None:
+            data['customer_transactions'] = transactions
+        return data
     
     def __repr__(self):
         return f"<Sale(id={self.id}, customer_id={self.customer_id}, total_amount={self.total_bill_amount}, profit={self.profit_amount})>"
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Text, DateTime
+from config.database import Base
+
+class SharedStateEntry(Base):
+    """One key of the cross-process shared state (see ``utils.shared_state``)
+
+    ``value`` holds JSON; counters are stored as JSON integers. Rows whose
+    ``expires_at`` has passed are treated as absent and purged lazily.
+    """
+
+    __tablename__ = 'shared_state'
+
+    key = Column(String(255), primary_key=True)
+    value = Column(Text, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
+    def __repr__(self):
+        return f"<SharedStateEntry(key='{self.key}', expires_at={self.expires_at})>"
@@ -25,6 +25,9 @@ class User(Base):
     sales = relationship("Sale", back_populates="user")
     customers = relationship("Customer", back_populates="created_by_user")
     
+    # Fields of to_summary_dict(), also selected by the sales list row read path
+    SUMMARY_COLUMNS = ('id', 'username', 'full_name', 'role')
+    
     def set_password(self, password: str):
         """Hash and set password"""
         salt = bcrypt.gensalt()
@@ -49,5 +52,14 @@ class User(Base):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
     
+    def to_summary_dict(self):
+        """Convert to a slim dictionary for embedding in other records"""
+        return {name: getattr(self, name) for name in self.SUMMARY_COLUMNS}
+    
+    @classmethod
+    def summary_columns(cls):
+        """Column attributes whose Core rows map one-to-one onto to_summary_dict()"""
+        return [getattr(cls, name) for name in cls.SUMMARY_COLUMNS]
+    
     def __repr__(self):
         return f"<User(id={self.id}, username='{self.username}', role='{self.role}')>"
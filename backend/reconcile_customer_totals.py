@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Check customers.total_bills/total_amount against bills and sales
+
+Usage:
+    python reconcile_customer_totals.py            # report and repair drift
+    python reconcile_customer_totals.py --dry-run  # report only
+"""
+
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.customer_service import customer_service
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconcile customer aggregate columns')
+    parser.add_argument('--dry-run', action='store_true', help='Only report drifted customers')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+    
+    print("🔄 Reconciling customer totals...")
+    result = customer_service.reconcile_customer_totals(
+        fix=not args.dry_run,
+        chunk_size=args.chunk_size
+    )
+    
+    if not result['success']:
+        print(f"❌ Reconciliation failed: {result['error']}")
+        sys.exit(1)
+    
+    for customer in result['customers'][:50]:
+        print(f"  - Customer {customer['id']}: bills {customer['total_bills']} -> {customer['expected_bills']}, "
+              f"amount {customer['total_amount']:,.0f} -> {customer['expected_amount']:,.0f}")
+    if result['drifted'] > 50:
+        print(f"  ... and {result['drifted'] - 50} more")
+    
+    action = "repaired" if result['fixed'] else "found"
+    print(f"✅ Checked {result['checked']} customers, {action} {result['drifted']} with drifted totals")
+
+if __name__ == "__main__":
+    main()
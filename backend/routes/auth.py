@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from services.auth_service import auth_service
+from utils.rate_limit import rate_limit
 from functools import wraps
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
@@ -43,6 +44,7 @@ def register():
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('10 per minute;100 per hour')
 def login():
     """User login"""
     try:
@@ -1,11 +1,19 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+import os
+from flask import Blueprint, request, jsonify, send_file
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from services.bill_service import bill_service
+from services.bill_import_service import bill_import_service
+from services.job_service import job_service
+from services.bill_link_service import bill_link_service
+from routes.auth import admin_required
+from utils.http_cache import conditional_get
+from utils.idempotency import idempotent
 
 bills_bp = Blueprint('bills', __name__, url_prefix='/api/bills')
 
 @bills_bp.route('/warehouse', methods=['GET'])
 @jwt_required()
+@conditional_get('bills')
 def get_warehouse_bills():
     """Get bills in warehouse with filtering and pagination"""
     try:
@@ -44,6 +52,25 @@ def get_warehouse_bills():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@bills_bp.route('/changes', methods=['GET'])
+@jwt_required()
+@conditional_get('bills')
+def get_bill_changes():
+    """Bills inserted or modified since a change token (incremental warehouse sync)"""
+    try:
+        since = request.args.get('since')
+        limit = min(max(request.args.get('limit', 500, type=int), 1), 2000)
+        
+        result = bill_service.get_bill_changes(since, limit)
+        
+        if result['success']:
+            return jsonify(result)
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bills_bp.route('/warehouse/<int:bill_id>', methods=['GET'])
 @jwt_required()
 def get_warehouse_bill(bill_id):
@@ -61,6 +88,7 @@ def get_warehouse_bill(bill_id):
 
 @bills_bp.route('/all', methods=['GET'])
 @jwt_required()
+@conditional_get('bills')
 def get_all_bills():
     """Get all bills with all statuses"""
     try:
@@ -86,6 +114,7 @@ def get_all_bills():
 
 @bills_bp.route('/warehouse', methods=['POST'])
 @jwt_required()
+@idempotent
 def add_bill_to_warehouse():
     """Add bill to warehouse"""
     try:
@@ -196,6 +225,7 @@ def find_bill_combinations():
 
 @bills_bp.route('/warehouse/statistics', methods=['GET'])
 @jwt_required()
+@conditional_get('bills')
 def get_warehouse_statistics():
     """Get warehouse statistics"""
     try:
@@ -211,6 +241,7 @@ def get_warehouse_statistics():
 
 @bills_bp.route('/warehouse/export', methods=['GET'])
 @jwt_required()
+@conditional_get('bills')
 def export_warehouse_bills():
     """Export warehouse bills"""
     try:
@@ -228,6 +259,7 @@ def export_warehouse_bills():
 
 @bills_bp.route('/warehouse/bulk-add', methods=['POST'])
 @jwt_required()
+@idempotent
 def bulk_add_bills():
     """Add multiple bills to warehouse"""
     try:
@@ -282,6 +314,67 @@ def bulk_add_bills():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@bills_bp.route('/warehouse/import', methods=['POST'])
+@jwt_required()
+def import_bills():
+    """Queue an import of bills from an uploaded CSV/XLSX file
+    
+    multipart/form-data: file, update_existing ("true" to update bills still
+    in the warehouse instead of rejecting their rows). Follow the returned
+    job at /api/jobs/<id>; rejected rows are at /warehouse/import/<id>/errors.
+    """
+    # Outside the try: an upload over MAX_CONTENT_LENGTH raises 413 here
+    file = request.files.get('file')
+    
+    try:
+        if file is None or not file.filename:
+            return jsonify({'error': 'file is required'}), 400
+        
+        saved = bill_import_service.save_upload(file)
+        if not saved['success']:
+            return jsonify(saved), 400
+        
+        result = job_service.enqueue(
+            'import_bills',
+            {
+                'upload': saved['upload'],
+                'filename': saved['filename'],
+                'update_existing': request.form.get('update_existing', 'false').lower() == 'true'
+            },
+            user_id=int(get_jwt_identity())
+        )
+        
+        if result['success']:
+            return jsonify({**result, 'total_rows': saved['total_rows']}), 202
+        else:
+            bill_import_service.discard_upload(saved['upload'])
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bills_bp.route('/warehouse/import/<int:job_id>/errors', methods=['GET'])
+@jwt_required()
+def download_import_errors(job_id):
+    """Rows rejected by a bill import, as CSV (row number, reason, original columns)"""
+    try:
+        owner = None if get_jwt().get('role') == 'admin' else int(get_jwt_identity())
+        result = job_service.get_job(job_id, owner)
+        if not result['success'] or result['job']['kind'] != 'import_bills':
+            return jsonify({'error': 'Import not found'}), 404
+        
+        path = bill_import_service.error_path(job_id)
+        if not os.path.exists(path):
+            return jsonify({'error': 'No rejected rows for this import'}), 404
+        
+        return send_file(
+            path, mimetype='text/csv', as_attachment=True,
+            download_name=f'bill-import-{job_id}-errors.csv'
+        )
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bills_bp.route('/warehouse/bulk-status', methods=['PUT'])
 @jwt_required()
 def bulk_update_bill_status():
@@ -340,6 +433,7 @@ def bulk_update_bill_status():
 
 @bills_bp.route('/customer/<int:customer_id>', methods=['GET'])
 @jwt_required()
+@conditional_get('bills')
 def get_customer_bills(customer_id):
     """Get all bills for a specific customer"""
     try:
@@ -353,4 +447,38 @@ def get_customer_bills(customer_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@bills_bp.route('/auto-link', methods=['POST'])
+@jwt_required()
+@admin_required
+def auto_link_bills():
+    """Link unassigned bills to customers by normalized name/address (admin only)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        result = bill_link_service.link_bills(full=bool(data.get('full', False)))
+        
+        if result['success']:
+            return jsonify(result)
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
+@bills_bp.route('/auto-link/runs', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_auto_link_runs():
+    """Recent auto-link runs with throughput metrics (admin only)"""
+    try:
+        limit = min(request.args.get('limit', 20, type=int), 100)
+        
+        result = bill_link_service.get_link_runs(limit)
+        
+        if result['success']:
+            return jsonify(result)
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,11 +1,14 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from services.customer_service import customer_service
+from services.customer_search_index import customer_search_index
+from utils.http_cache import conditional_get
 
 customers_bp = Blueprint('customers', __name__, url_prefix='/api/customers')
 
 @customers_bp.route('/', methods=['GET'])
 @jwt_required()
+@conditional_get('customers')
 def get_customers():
     """Get all customers with pagination and filtering"""
     try:
@@ -37,6 +40,7 @@ def get_customers():
 
 @customers_bp.route('/<int:customer_id>', methods=['GET'])
 @jwt_required()
+@conditional_get('customers')
 def get_customer(customer_id):
     """Get customer by ID"""
     try:
@@ -148,12 +152,35 @@ def search_customers():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@customers_bp.route('/typeahead', methods=['GET'])
+@jwt_required()
+def typeahead_customers():
+    """Prefix lookup by name, phone or zalo for autocomplete inputs"""
+    try:
+        query = request.args.get('q', '')
+        limit = min(request.args.get('limit', 10, type=int), 50)
+        
+        customers = customer_search_index.search(query, limit=limit) if query.strip() else []
+        
+        return jsonify({
+            'success': True,
+            'customers': customers,
+            'count': len(customers)
+        })
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @customers_bp.route('/statistics', methods=['GET'])
 @jwt_required()
+@conditional_get('customers')
 def get_customer_statistics():
     """Get customer statistics"""
     try:
-        result = customer_service.get_customer_statistics()
+        start_month = request.args.get('start_month', None)
+        end_month = request.args.get('end_month', None)
+        
+        result = customer_service.get_customer_statistics(start_month, end_month)
         
         if result['success']:
             return jsonify(result)
@@ -165,26 +192,16 @@ def get_customer_statistics():
 
 @customers_bp.route('/export', methods=['GET'])
 @jwt_required()
+@conditional_get('customers')
 def export_customers():
     """Export customers to CSV/Excel"""
     try:
-        # Get all customers for export
-        result = customer_service.get_all_customers(page=1, per_page=10000)
+        result = customer_service.export_customers()
         
         if not result['success']:
             return jsonify(result), 400
         
-        # Format for export
-        customers = result['customers']
-        
-        # For now, return JSON. In production, you'd generate CSV/Excel
-        return jsonify({
-            'success': True,
-            'customers': customers,
-            'total': len(customers),
-            'format': 'json',
-            'message': 'Export completed. In production, this would return CSV/Excel file.'
-        })
+        return jsonify(result)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
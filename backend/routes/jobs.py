@@ -0,0 +1,107 @@
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from services.job_service import job_service
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+def _is_admin() -> bool:
+    return get_jwt().get('role') == 'admin'
+
+def _owner_filter():
+    """Admins see every job, other users only their own"""
+    return None if _is_admin() else int(get_jwt_identity())
+
+@jobs_bp.route('', methods=['GET'])
+@jwt_required()
+def get_jobs():
+    """Recent background jobs, newest first"""
+    try:
+        status = request.args.get('status')
+        kind = request.args.get('kind')
+        limit = min(request.args.get('limit', 50, type=int), 200)
+        
+        result = job_service.get_jobs(_owner_filter(), status, kind, limit)
+        
+        if result['success']:
+            return jsonify(result)
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('', methods=['POST'])
+@jwt_required()
+def enqueue_job():
+    """Queue a background job: {"kind": "export_bills", "payload": {...}}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        if not data.get('kind'):
+            return jsonify({'error': 'kind is required'}), 400
+        if not isinstance(data.get('payload', {}), dict):
+            return jsonify({'error': 'payload must be an object'}), 400
+        
+        result = job_service.enqueue(
+            data['kind'], data.get('payload'), user_id=int(get_jwt_identity()), admin=_is_admin()
+        )
+        
+        if result['success']:
+            return jsonify(result), 202
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/kinds', methods=['GET'])
+@jwt_required()
+def get_job_kinds():
+    """Job kinds the current user may queue"""
+    return jsonify({'success': True, 'kinds': job_service.kinds(_is_admin())})
+
+@jobs_bp.route('/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Job status and progress"""
+    try:
+        result = job_service.get_job(job_id, _owner_filter())
+        
+        if result['success']:
+            return jsonify(result)
+        else:
+            return jsonify(result), 404
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/<int:job_id>/result', methods=['GET'])
+@jwt_required()
+def get_job_result(job_id):
+    """Stored result of a finished job, e.g. the export data"""
+    try:
+        result = job_service.get_job_result(job_id, _owner_filter())
+        
+        if not result['success']:
+            return jsonify(result), 404
+        
+        # Already JSON; sent as stored
+        return current_app.response_class(result['result'], mimetype='application/json')
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/<int:job_id>/cancel', methods=['POST'])
+@jwt_required()
+def cancel_job(job_id):
+    """Cancel a queued job, or ask a running one to stop"""
+    try:
+        result = job_service.cancel_job(job_id, _owner_filter())
+        
+        if result['success']:
+            return jsonify(result)
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
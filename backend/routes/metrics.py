@@ -0,0 +1,56 @@
+from flask import Blueprint, Response, jsonify, request
+from flask_jwt_extended import jwt_required
+from routes.auth import admin_required
+from utils.db_metrics import db_metrics
+from utils.tracing import request_tracer
+
+metrics_bp = Blueprint('metrics', __name__, url_prefix='/api/metrics')
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+@metrics_bp.route('', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_metrics():
+    """Database and per-route latency metrics in Prometheus text format (admin only)"""
+    try:
+        body = db_metrics.render() + request_tracer.render()
+        return Response(body, content_type=PROMETHEUS_CONTENT_TYPE)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/routes', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_route_metrics():
+    """Per-route p50/p95/p99 latency and where the time goes (admin only)"""
+    try:
+        routes = request_tracer.route_stats()
+        
+        return jsonify({
+            'success': True,
+            'routes': routes,
+            'count': len(routes)
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/traces', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_slow_traces():
+    """Most recent slow request traces with their spans (admin only)"""
+    try:
+        limit = min(request.args.get('limit', 20, type=int), 50)
+        traces = request_tracer.slow_traces(limit)
+        
+        return jsonify({
+            'success': True,
+            'traces': traces,
+            'count': len(traces)
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -2,11 +2,13 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from services.reports_service import reports_service
 from datetime import datetime, timedelta
+from utils.http_cache import conditional_get
 
 reports_bp = Blueprint('reports', __name__, url_prefix='/api/reports')
 
 @reports_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
+@conditional_get('bills', 'sales', 'customers', 'users', 'customer_transactions')
 def get_dashboard_summary():
     """Get dashboard summary statistics"""
     try:
@@ -22,6 +24,7 @@ def get_dashboard_summary():
 
 @reports_bp.route('/sales-analytics', methods=['GET'])
 @jwt_required()
+@conditional_get('bills', 'sales', 'customers', 'users', 'customer_transactions')
 def get_sales_analytics():
     """Get sales analytics"""
     try:
@@ -40,6 +43,7 @@ def get_sales_analytics():
 
 @reports_bp.route('/customer-analytics', methods=['GET'])
 @jwt_required()
+@conditional_get('bills', 'sales', 'customers', 'users', 'customer_transactions')
 def get_customer_analytics():
     """Get customer analytics"""
     try:
@@ -58,6 +62,7 @@ def get_customer_analytics():
 
 @reports_bp.route('/warehouse-analytics', methods=['GET'])
 @jwt_required()
+@conditional_get('bills', 'sales', 'customers', 'users', 'customer_transactions')
 def get_warehouse_analytics():
     """Get warehouse analytics"""
     try:
@@ -73,6 +78,7 @@ def get_warehouse_analytics():
 
 @reports_bp.route('/comprehensive', methods=['GET'])
 @jwt_required()
+@conditional_get('bills', 'sales', 'customers', 'users', 'customer_transactions')
 def get_comprehensive_report():
     """Get comprehensive report with all analytics"""
     try:
@@ -100,16 +106,7 @@ def export_reports():
         start_date = request.args.get('start_date', None)
         end_date = request.args.get('end_date', None)
         
-        if report_type == 'comprehensive':
-            result = reports_service.export_comprehensive_report(format_type, start_date, end_date)
-        elif report_type == 'sales':
-            result = reports_service.get_sales_analytics(start_date, end_date)
-        elif report_type == 'customers':
-            result = reports_service.get_customer_analytics(start_date, end_date)
-        elif report_type == 'warehouse':
-            result = reports_service.get_warehouse_analytics()
-        else:
-            return jsonify({'error': f'Unknown report type: {report_type}'}), 400
+        result = reports_service.export_report(report_type, format_type, start_date, end_date)
         
         if result['success']:
             return jsonify(result)
@@ -148,6 +145,7 @@ def get_real_time_stats():
 
 @reports_bp.route('/trends', methods=['GET'])
 @jwt_required()
+@conditional_get('bills', 'sales', 'customers', 'users', 'customer_transactions')
 def get_trend_analysis():
     """Get trend analysis for various metrics"""
     try:
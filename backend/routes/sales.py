@@ -1,11 +1,28 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from services.sales_service import sales_service
+from utils.http_cache import conditional_get
+from utils.idempotency import idempotent
 
 sales_bp = Blueprint('sales', __name__, url_prefix='/api/sales')
 
+MAX_BULK_SALES = 500  # Limit for set-based bulk lifecycle operations
+
+def _bulk_sale_ids(data):
+    """Validate the sale_ids array of a bulk request, returning (ids, error response)"""
+    sale_ids = (data or {}).get('sale_ids')
+    if not sale_ids or not isinstance(sale_ids, list):
+        return None, (jsonify({'error': 'sale_ids array is required'}), 400)
+    if len(sale_ids) > MAX_BULK_SALES:
+        return None, (jsonify({'error': f'Maximum {MAX_BULK_SALES} sales per bulk operation'}), 400)
+    try:
+        return [int(sale_id) for sale_id in sale_ids], None
+    except (TypeError, ValueError):
+        return None, (jsonify({'error': 'sale_ids must be integers'}), 400)
+
 @sales_bp.route('/', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_sale():
     """Create a new sale transaction"""
     try:
@@ -58,6 +75,7 @@ def get_sale(sale_id):
 
 @sales_bp.route('/', methods=['GET'])
 @jwt_required()
+@conditional_get('sales', 'customers', 'users', 'bills')
 def get_all_sales():
     """Get all sales with filtering and pagination"""
     try:
@@ -192,6 +210,7 @@ def get_sales_statistics():
 
 @sales_bp.route('/export', methods=['GET'])
 @jwt_required()
+@conditional_get('sales', 'customers', 'users', 'bills', 'customer_transactions')
 def export_sales():
     """Export sales data"""
     try:
@@ -295,6 +314,96 @@ def bulk_update_sales_status():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@sales_bp.route('/bulk/confirm-payment', methods=['POST'])
+@jwt_required()
+def bulk_confirm_payment():
+    """Confirm customer payment for many sales in one transaction"""
+    try:
+        sale_ids, error = _bulk_sale_ids(request.get_json())
+        if error:
+            return error
+        
+        result = sales_service.bulk_confirm_payment(sale_ids)
+        
+        if result['success']:
+            return jsonify(result)
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@sales_bp.route('/bulk/complete', methods=['POST'])
+@jwt_required()
+def bulk_complete_sales():
+    """Complete many paid sales in one transaction"""
+    try:
+        sale_ids, error = _bulk_sale_ids(request.get_json())
+        if error:
+            return error
+        
+        result = sales_service.bulk_complete_sales(sale_ids)
+        
+        if result['success']:
+            return jsonify(result)
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@sales_bp.route('/bulk/cancel', methods=['POST'])
+@jwt_required()
+def bulk_cancel_sales():
+    """Cancel many sales in one transaction"""
+    try:
+        data = request.get_json()
+        sale_ids, error = _bulk_sale_ids(data)
+        if error:
+            return error
+        
+        result = sales_service.bulk_cancel_sales(sale_ids, data.get('reason'))
+        
+        if result['success']:
+            return jsonify(result)
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@sales_bp.route('/bulk/reconcile', methods=['POST'])
+@jwt_required()
+def reconcile_bank_statement():
+    """Match a bank statement CSV against pending sales
+    
+    Accepts a multipart ``file`` upload or a JSON body with ``csv``. Matches
+    are only previewed unless ``confirm`` is true.
+    """
+    try:
+        if 'file' in request.files:
+            csv_content = request.files['file'].read().decode('utf-8-sig')
+            confirm = request.form.get('confirm', 'false').lower() == 'true'
+        else:
+            data = request.get_json() or {}
+            csv_content = data.get('csv', '')
+            confirm = bool(data.get('confirm', False))
+        
+        if not csv_content:
+            return jsonify({'error': 'Bank statement CSV is required'}), 400
+        
+        result = sales_service.reconcile_bank_statement(csv_content, confirm=confirm)
+        
+        if result['success']:
+            return jsonify(result)
+        else:
+            return jsonify(result), 400
+            
+    except UnicodeDecodeError:
+        return jsonify({'error': 'Bank statement must be UTF-8 encoded'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @sales_bp.route('/customer/<int:customer_id>', methods=['GET'])
 @jwt_required()
 def get_customer_sales(customer_id):
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Run background job workers outside the API process
+
+Usage:
+    python run_job_worker.py               # JOB_WORKER_THREADS threads
+    python run_job_worker.py --threads 4
+
+Start the API with JOB_WORKER_THREADS=0 to leave all jobs to these workers.
+"""
+
+import sys
+import os
+import argparse
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app
+from services.job_service import job_worker
+
+def main():
+    parser = argparse.ArgumentParser(description='Run background job workers')
+    parser.add_argument('--threads', type=int, default=max(app.config['JOB_WORKER_THREADS'], 1))
+    parser.add_argument('--poll-seconds', type=float, default=app.config['JOB_POLL_SECONDS'])
+    args = parser.parse_args()
+    
+    print(f"⚙️ Starting {args.threads} job worker thread(s)...")
+    job_worker.start(args.threads, args.poll_seconds)
+    
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("🛑 Stopping job workers (running jobs finish first)...")
+        job_worker.stop()
+
+if __name__ == "__main__":
+    main()
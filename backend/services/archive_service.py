@@ -0,0 +1,204 @@
+from typing import Any, Callable, Dict, Iterable, Optional
+from datetime import datetime, timedelta, timezone
+import time
+from sqlalchemy import delete, func, insert, literal_column, select, union_all
+from sqlalchemy.orm import aliased
+from models.archive import ArchiveRun, sales_archive, bills_archive, customer_transactions_archive
+from models.bill import Bill, BillStatus
+from models.sale import Sale, SaleStatus
+from models.customer_transaction import CustomerTransaction
+from config.database import engine, get_session, close_session
+from utils.table_versions import table_versions
+from utils.nplusone import nplusone_detector
+
+class ArchiveService:
+    """Hot/cold archival of finished sales and bills
+
+    Sales that are COMPLETED or CANCELLED and bills that are COMPLETED,
+    CANCELLED or EXPIRED are moved, once older than ``older_than_days``,
+    from ``sales``/``bills`` to ``sales_archive``/``bills_archive`` in
+    id-ordered chunks, one transaction per chunk. A sale moves together with
+    its bills and customer transactions, so no foreign key is left dangling.
+
+    Reads go through ``sales()``, ``bills()`` and ``transactions()``: they
+    return the model itself when the hot table is enough, or the model
+    aliased onto ``hot UNION ALL archive`` when the requested date range
+    (or status) can reach archived rows. Every archived row was created
+    before the latest run's cutoff, the horizon.
+    """
+
+    SALE_STATUSES = (SaleStatus.COMPLETED, SaleStatus.CANCELLED)
+    BILL_STATUSES = (BillStatus.COMPLETED, BillStatus.CANCELLED, BillStatus.EXPIRED)
+    DEFAULT_OLDER_THAN_DAYS = 180
+
+    # Other processes (the CLI, other workers without a shared state backend)
+    # re-read the horizon at least this often; by default a run waits as long
+    # before moving rows, so readers always union before rows disappear
+    HORIZON_REFRESH_SECONDS = 10
+
+    def __init__(self):
+        self.older_than_days = self.DEFAULT_OLDER_THAN_DAYS
+        self.settle_seconds = self.HORIZON_REFRESH_SECONDS
+        self._horizon = (None, 0.0, None)  # (archive_runs version, read at, horizon)
+
+    def init_app(self, app) -> None:
+        app.config.setdefault('ARCHIVE_AFTER_DAYS', self.DEFAULT_OLDER_THAN_DAYS)
+        app.config.setdefault('ARCHIVE_SETTLE_SECONDS', self.HORIZON_REFRESH_SECONDS)
+        self.older_than_days = app.config['ARCHIVE_AFTER_DAYS']
+        self.settle_seconds = app.config['ARCHIVE_SETTLE_SECONDS']
+
+    # Reads
+
+    def horizon(self) -> Optional[datetime]:
+        """Cutoff of the latest run (None before the first one)"""
+        version = table_versions.get(['archive_runs'])
+        cached_version, read_at, value = self._horizon
+        if version != cached_version or time.monotonic() - read_at > self.HORIZON_REFRESH_SECONDS:
+            with engine.connect() as conn:
+                value = _aware(conn.scalar(select(func.max(ArchiveRun.cutoff))))
+            self._horizon = (version, time.monotonic(), value)
+        return value
+
+    def reaches_archive(self, since: Optional[datetime] = None, statuses: Iterable = None,
+                        archived_statuses: Iterable = ()) -> bool:
+        """Whether rows created at or after ``since`` with one of ``statuses`` may be archived"""
+        if statuses is not None:
+            archived = {_status_value(status) for status in archived_statuses}
+            if not archived.intersection(_status_value(status) for status in statuses):
+                return False
+        horizon = self.horizon()
+        return horizon is not None and (since is None or _aware(since) < horizon)
+
+    def sales(self, since: Optional[datetime] = None, status=None):
+        """``Sale``, or ``Sale`` over sales + sales_archive when the range needs it"""
+        statuses = None if status is None else [status]
+        if not self.reaches_archive(since, statuses, self.SALE_STATUSES):
+            return Sale
+        return self._union(Sale, sales_archive)
+
+    def bills(self, since: Optional[datetime] = None):
+        """``Bill``, or ``Bill`` over bills + bills_archive when the range needs it
+
+        Not for warehouse reads: IN_WAREHOUSE bills are never archived.
+        """
+        if not self.reaches_archive(since):
+            return Bill
+        return self._union(Bill, bills_archive)
+
+    def transactions(self, include_archive: bool):
+        """``CustomerTransaction``, over the archive too when ``include_archive``"""
+        if not include_archive:
+            return CustomerTransaction
+        return self._union(CustomerTransaction, customer_transactions_archive)
+
+    def _union(self, model, archive):
+        table = model.__table__
+        names = [column.name for column in table.columns]
+        combined = union_all(
+            select(table),
+            select(*[archive.c[name] for name in names])
+        ).subquery(table.name)
+        return aliased(model, combined, adapt_on_names=True)
+
+    # Archiving
+
+    @nplusone_detector.allow()  # one SELECT per chunk
+    def archive(self, older_than_days: int = None, chunk_size: int = 1000,
+                progress: Callable[[int, Optional[int], Optional[str]], None] = None) -> Dict[str, Any]:
+        """Move finished sales and bills older than ``older_than_days`` to the archive tables"""
+        older_than_days = older_than_days or self.older_than_days
+        db = get_session()
+        try:
+            started = time.perf_counter()
+            cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+
+            # Publish the new horizon before moving anything
+            run = ArchiveRun(cutoff=cutoff)
+            db.add(run)
+            db.commit()
+            if self.settle_seconds:
+                time.sleep(self.settle_seconds)
+
+            finished_at = func.coalesce(Sale.completed_at, Sale.updated_at, Sale.created_at)
+            sale_filter = (Sale.status.in_(self.SALE_STATUSES), Sale.created_at < cutoff, finished_at < cutoff)
+            bill_filter = (
+                Bill.sale_id.is_(None), Bill.status.in_(self.BILL_STATUSES), Bill.created_at < cutoff,
+                func.coalesce(Bill.updated_at, Bill.created_at) < cutoff
+            )
+            total = db.scalar(select(func.count(Sale.id)).where(*sale_filter)) + \
+                db.scalar(select(func.count(Bill.id)).where(*bill_filter))
+
+            done = 0
+            while True:
+                sale_ids = db.scalars(
+                    select(Sale.id).where(*sale_filter).order_by(Sale.id).limit(chunk_size)
+                    .with_for_update(skip_locked=True)
+                ).all()
+                if not sale_ids:
+                    break
+                run.transactions_archived += self._move(
+                    db, CustomerTransaction, customer_transactions_archive, CustomerTransaction.sale_id.in_(sale_ids)
+                )
+                run.bills_archived += self._move(db, Bill, bills_archive, Bill.sale_id.in_(sale_ids))
+                run.sales_archived += self._move(db, Sale, sales_archive, Sale.id.in_(sale_ids))
+                db.commit()
+                done += len(sale_ids)
+                if progress:
+                    progress(done, total, 'Archiving sales')
+
+            while True:
+                bill_ids = db.scalars(
+                    select(Bill.id).where(*bill_filter).order_by(Bill.id).limit(chunk_size)
+                    .with_for_update(skip_locked=True)
+                ).all()
+                if not bill_ids:
+                    break
+                run.bills_archived += self._move(db, Bill, bills_archive, Bill.id.in_(bill_ids))
+                db.commit()
+                done += len(bill_ids)
+                if progress:
+                    progress(done, total, 'Archiving bills')
+
+            run.elapsed_seconds = round(time.perf_counter() - started, 3)
+            run.finished_at = datetime.utcnow()
+            db.commit()
+
+            return {
+                'success': True,
+                'run': run.to_dict(),
+                'message': f'{run.sales_archived} sales and {run.bills_archived} bills archived'
+            }
+
+        except Exception as e:
+            db.rollback()
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            close_session(db)
+
+    def _move(self, db, model, archive, condition) -> int:
+        """Copy matching rows into ``archive`` and delete them, in the caller's transaction"""
+        columns = [column.name for column in model.__table__.columns]
+        db.execute(
+            insert(archive).from_select(
+                columns + ['archived_at'],
+                select(*[model.__table__.c[name] for name in columns], literal_column('CURRENT_TIMESTAMP')).where(condition)
+            )
+        )
+        return db.execute(
+            delete(model).where(condition), execution_options={'synchronize_session': False}
+        ).rowcount
+
+def _aware(value: Optional[datetime]) -> Optional[datetime]:
+    """Treat naive datetimes (SQLite, date-only query parameters) as UTC"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def _status_value(status) -> str:
+    return status.value if hasattr(status, 'value') else str(status)
+
+# Create global instance
+archive_service = ArchiveService()
@@ -4,7 +4,7 @@ from flask_jwt_extended import create_access_token, create_refresh_token, decode
 from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy.orm import Session
 from models.user import User
-from config.database import get_db
+from config.database import get_session, close_session
 import jwt
 
 class AuthService:
@@ -15,8 +15,8 @@ class AuthService:
     
     def create_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new user"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             # Check if user already exists
             existing_user = db.query(User).filter(
@@ -56,12 +56,12 @@ class AuthService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def authenticate_user(self, username: str, password: str) -> Dict[str, Any]:
         """Authenticate user and return JWT tokens"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             # Find user by username or email
             user = db.query(User).filter(
@@ -115,16 +115,16 @@ class AuthService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def refresh_token(self, refresh_token: str) -> Dict[str, Any]:
         """Refresh access token using refresh token"""
+        db = get_session()
         try:
             # Decode refresh token
             decoded = decode_token(refresh_token)
             user_id = decoded['sub']
             
-            db = next(get_db())
             user = db.query(User).filter(User.id == user_id).first()
             
             if not user or not user.is_active:
@@ -154,22 +154,22 @@ class AuthService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def get_user_by_id(self, user_id: int) -> Optional[User]:
         """Get user by ID"""
+        db = get_session()
         try:
-            db = next(get_db())
             return db.query(User).filter(User.id == user_id).first()
         except Exception:
             return None
         finally:
-            db.close()
+            close_session(db)
     
     def update_user_profile(self, user_id: int, profile_data: Dict[str, Any]) -> Dict[str, Any]:
         """Update user profile"""
+        db = get_session()
         try:
-            db = next(get_db())
             user = db.query(User).filter(User.id == user_id).first()
             
             if not user:
@@ -200,12 +200,12 @@ class AuthService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def change_password(self, user_id: int, current_password: str, new_password: str) -> Dict[str, Any]:
         """Change user password"""
+        db = get_session()
         try:
-            db = next(get_db())
             user = db.query(User).filter(User.id == user_id).first()
             
             if not user:
@@ -238,7 +238,7 @@ class AuthService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
 
 # Create global instance
 auth_service = AuthService()
@@ -0,0 +1,402 @@
+import csv
+import io
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import Integer, column, func, literal, select, table, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from config.database import engine
+from models.bill import Bill, BillStatus
+from utils.nplusone import nplusone_detector
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+_UPLOAD_NAME = re.compile(r'^[0-9a-f]{32}\.(csv|xlsx)$')
+_AMOUNT = Bill.__table__.c.amount.type
+
+class BillImportService:
+    """Bulk import of warehouse bills from CSV/XLSX uploads
+
+    ``save_upload`` stores the file under ``UPLOAD_FOLDER/imports`` after
+    checking its header; an ``import_bills`` background job then reads it
+    one row at a time (the csv module, openpyxl in read-only mode), checks
+    each row like a bill added through the API and writes valid rows in
+    chunks of ``CHUNK_SIZE``, one transaction per chunk. On PostgreSQL a
+    chunk is COPYed into a temporary table and inserted from there, other
+    databases get a multi-row INSERT; both use ON CONFLICT on contract_code,
+    so existing bills are skipped (or updated while still IN_WAREHOUSE).
+
+    Rejected rows never stop the import: they are written, with their row
+    number and the reason, to an error CSV kept next to the uploads. A
+    chunk the database refuses is rolled back and all its rows are rejected
+    with the database error; later chunks still load.
+    """
+
+    EXTENSIONS = ('.csv', '.xlsx')
+    REQUIRED_COLUMNS = ('contract_code', 'customer_name', 'amount')
+    OPTIONAL_COLUMNS = ('address', 'period', 'due_date', 'bill_date', 'meter_number', 'warehouse_notes')
+    DATE_COLUMNS = ('due_date', 'bill_date')
+    DATE_FORMATS = ('%d/%m/%Y', '%d-%m-%Y', '%d/%m/%Y %H:%M:%S')
+    CHUNK_SIZE = 1000
+    # Rejected rows also returned in the job result, so small mistakes show without downloading the file
+    SAMPLE_ERRORS = 20
+
+    def __init__(self):
+        self.folder = os.path.abspath(os.path.join('uploads', 'imports'))
+
+    def init_app(self, app) -> None:
+        folder = app.config.setdefault('UPLOAD_FOLDER', 'uploads')
+        self.folder = os.path.join(app.root_path, folder, 'imports')
+
+    # Files
+
+    def save_upload(self, file) -> Dict[str, Any]:
+        """Store an uploaded ``FileStorage`` and check that it has the required columns"""
+        extension = os.path.splitext(file.filename or '')[1].lower()
+        if extension not in self.EXTENSIONS:
+            return {
+                'success': False,
+                'error': f"Unsupported file type, expected one of: {', '.join(self.EXTENSIONS)}"
+            }
+        if extension == '.xlsx' and openpyxl is None:
+            return {
+                'success': False,
+                'error': 'XLSX import requires openpyxl, upload a CSV file instead'
+            }
+
+        upload = uuid.uuid4().hex + extension
+        path = self.upload_path(upload)
+        os.makedirs(self.folder, exist_ok=True)
+        file.save(path)
+
+        try:
+            with self._open(path) as (header, _rows, total):
+                self._column_indexes(header)
+        except Exception as e:
+            self.discard_upload(upload)
+            return {
+                'success': False,
+                'error': f'Cannot read {file.filename}: {e}'
+            }
+
+        return {
+            'success': True,
+            'upload': upload,
+            'filename': file.filename,
+            'total_rows': total
+        }
+
+    def upload_path(self, upload: str) -> str:
+        """Path of a stored upload; only names made by ``save_upload`` are accepted"""
+        if not isinstance(upload, str) or not _UPLOAD_NAME.match(upload):
+            raise ValueError('Invalid upload name')
+        return os.path.join(self.folder, upload)
+
+    def error_path(self, job_id: int) -> str:
+        """Error CSV of the import run by job ``job_id``"""
+        return os.path.join(self.folder, f'errors-{int(job_id)}.csv')
+
+    def discard_upload(self, upload: str) -> None:
+        try:
+            os.remove(self.upload_path(upload))
+        except (OSError, ValueError):
+            pass
+
+    def purge_files(self, older_than_days: int) -> int:
+        """Delete uploads and error files older than ``older_than_days``"""
+        if not os.path.isdir(self.folder):
+            return 0
+        cutoff = time.time() - older_than_days * 86400
+        purged = 0
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                purged += 1
+        return purged
+
+    # Import
+
+    @nplusone_detector.allow()  # the same statements per chunk
+    def import_file(self, upload: str, user_id: int, job_id: int, update_existing: bool = False,
+                    chunk_size: int = None,
+                    progress: Callable[[int, Optional[int], Optional[str]], None] = None) -> Dict[str, Any]:
+        """Load a stored upload into the warehouse; the upload is deleted afterwards"""
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        errors = _ErrorFile(self.error_path(job_id))
+        try:
+            path = self.upload_path(upload)
+            with self._open(path) as (header, rows, total):
+                indexes = self._column_indexes(header)
+                errors.header = header
+
+                seen: Set[str] = set()
+                chunk: List[Tuple[int, tuple, Dict[str, Any]]] = []
+                rejected: List[Tuple[int, tuple, str]] = []
+                done = imported = 0
+
+                def flush():
+                    nonlocal imported
+                    reason = 'Bill with this contract code is no longer in the warehouse' if update_existing \
+                        else 'Bill with this contract code already exists'
+                    try:
+                        written = self._write_chunk([values for _, _, values in chunk], user_id,
+                                                    update_existing) if chunk else set()
+                    except SQLAlchemyError as e:
+                        print(f"Warning: Failed to import a chunk of {len(chunk)} bills: {e}")
+                        written = set()
+                        reason = f'Database error: {str(getattr(e, "orig", None) or e).splitlines()[0]}'
+                    imported += len(written)
+                    rejected.extend((number, row, reason) for number, row, values in chunk
+                                    if values['contract_code'] not in written)
+                    for number, row, error in sorted(rejected, key=lambda item: item[0]):
+                        errors.add(number, row, error)
+                    chunk.clear()
+                    rejected.clear()
+
+                for number, row in rows:
+                    values, error = self._validate_row(row, indexes)
+                    if error is None and values['contract_code'] in seen:
+                        error = 'Duplicate contract code in this file'
+                    if error is not None:
+                        rejected.append((number, row, error))
+                    else:
+                        seen.add(values['contract_code'])
+                        chunk.append((number, row, values))
+                        if len(chunk) >= chunk_size:
+                            flush()
+                    done += 1
+                    if progress and done % 100 == 0:
+                        progress(done, total, 'Importing bills')
+
+                flush()
+                if progress:
+                    progress(done, done, 'Importing bills')
+
+            return {
+                'success': True,
+                'total_rows': done,
+                'imported': imported,
+                'failed': errors.count,
+                'has_error_file': errors.count > 0,
+                'errors': errors.sample,
+                'message': f'{imported} bills imported, {errors.count} rows rejected'
+            }
+
+        except ValueError as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            errors.close()
+            self.discard_upload(upload)
+
+    def _write_chunk(self, rows: List[Dict[str, Any]], user_id: int, update_existing: bool) -> Set[str]:
+        """Insert one chunk in its own transaction; the contract codes actually written"""
+        columns = list(self.REQUIRED_COLUMNS + self.OPTIONAL_COLUMNS)
+        fixed = {
+            'status': literal(BillStatus.IN_WAREHOUSE, Bill.status.type),
+            'api_success': literal(False),
+            'added_to_warehouse_at': literal(datetime.utcnow(), Bill.added_to_warehouse_at.type),
+            'added_by': literal(user_id, Integer)
+        }
+
+        with engine.begin() as conn:
+            if conn.dialect.name == 'postgresql':
+                stage = table('bill_import_stage', *[column(name) for name in columns])
+                conn.execute(text(
+                    f"CREATE TEMP TABLE bill_import_stage ON COMMIT DROP AS "
+                    f"SELECT {', '.join(columns)} FROM bills WITH NO DATA"
+                ))
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows([row[name] for name in columns] for row in rows)
+                buffer.seek(0)
+                cursor = conn.connection.cursor()
+                try:
+                    cursor.copy_expert(
+                        f"COPY bill_import_stage ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+                    )
+                finally:
+                    cursor.close()
+                statement = postgresql.insert(Bill).from_select(
+                    columns + list(fixed), select(*[stage.c[name] for name in columns], *fixed.values())
+                )
+            else:
+                statement = sqlite.insert(Bill).values([
+                    {**row, 'status': BillStatus.IN_WAREHOUSE, 'api_success': False,
+                     'added_to_warehouse_at': datetime.utcnow(), 'added_by': user_id}
+                    for row in rows
+                ])
+
+            if update_existing:
+                statement = statement.on_conflict_do_update(
+                    index_elements=[Bill.contract_code],
+                    set_={
+                        **{name: statement.excluded[name] for name in columns if name != 'contract_code'},
+                        'updated_at': func.now()
+                    },
+                    where=Bill.status == BillStatus.IN_WAREHOUSE
+                )
+            else:
+                statement = statement.on_conflict_do_nothing(index_elements=[Bill.contract_code])
+            return set(conn.scalars(statement.returning(Bill.contract_code)))
+
+    # Parsing
+
+    @contextmanager
+    def _open(self, path: str) -> Iterator[Tuple[list, Iterator[Tuple[int, tuple]], Optional[int]]]:
+        """(header, (row number, values) iterator, data row count) of a CSV/XLSX file
+
+        Row numbers are the ones a spreadsheet shows: the header is row 1.
+        Blank rows are skipped.
+        """
+        if path.endswith('.xlsx'):
+            if openpyxl is None:
+                raise ValueError('XLSX import requires openpyxl')
+            workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+            try:
+                sheet = workbook.active
+                rows = sheet.iter_rows(values_only=True)
+                total = sheet.max_row - 1 if sheet.max_row else None
+                yield list(next(rows, ())), _numbered(rows), total
+            finally:
+                workbook.close()
+            return
+
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            # Spreadsheets saved with a Vietnamese locale separate columns with ';'
+            sample = f.read(64 * 1024)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+            f.seek(0)
+            total = max(sum(1 for _ in csv.reader(f, dialect)) - 1, 0)
+            f.seek(0)
+            rows = csv.reader(f, dialect)
+            yield next(rows, []), _numbered(rows), total
+
+    def _column_indexes(self, header: list) -> Dict[str, int]:
+        """Position of each known column; header names are matched case-insensitively"""
+        indexes = {}
+        for position, name in enumerate(header):
+            key = re.sub(r'[\s\-]+', '_', str(name or '').strip().lower())
+            if key in self.REQUIRED_COLUMNS + self.OPTIONAL_COLUMNS:
+                indexes.setdefault(key, position)
+        missing = [name for name in self.REQUIRED_COLUMNS if name not in indexes]
+        if missing:
+            raise ValueError(f"Missing required columns: {', '.join(missing)}")
+        return indexes
+
+    def _validate_row(self, row: tuple, indexes: Dict[str, int]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Row values ready to insert, or the reason the row is rejected"""
+        values = {}
+        for name in self.REQUIRED_COLUMNS + self.OPTIONAL_COLUMNS:
+            position = indexes.get(name)
+            value = row[position] if position is not None and position < len(row) else None
+            if isinstance(value, str):
+                value = value.strip() or None
+            values[name] = value
+
+        for name in self.REQUIRED_COLUMNS:
+            if values[name] is None:
+                return None, f'{name} is required'
+
+        try:
+            amount = _parse_amount(values['amount'])
+            if not amount.is_finite():
+                return None, 'Invalid amount format'
+            # NUMERIC(15, 2): anything that would not fit fails the whole chunk's INSERT
+            amount = amount.quantize(Decimal(1).scaleb(-_AMOUNT.scale))
+            if amount <= 0:
+                return None, 'Amount must be positive'
+            if amount >= Decimal(10) ** (_AMOUNT.precision - _AMOUNT.scale):
+                return None, 'Amount is too large'
+            values['amount'] = amount
+        except (InvalidOperation, ValueError):
+            return None, 'Invalid amount format'
+
+        for name in self.DATE_COLUMNS:
+            try:
+                values[name] = self._parse_date(values[name])
+            except ValueError:
+                return None, f'Invalid {name}, expected DD/MM/YYYY or YYYY-MM-DD'
+
+        for name in ('contract_code', 'customer_name', 'address', 'period', 'meter_number', 'warehouse_notes'):
+            if values[name] is not None and not isinstance(values[name], str):
+                # Spreadsheet cells: keep 0012345 style codes as typed, 12345.0 as 12345
+                value = values[name]
+                values[name] = str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+            length = getattr(Bill.__table__.c[name].type, 'length', None)
+            if length and values[name] is not None and len(values[name]) > length:
+                return None, f'{name} is longer than {length} characters'
+
+        return values, None
+
+    def _parse_date(self, value) -> Optional[datetime]:
+        if value is None or isinstance(value, datetime):
+            return value
+        value = str(value)
+        for date_format in self.DATE_FORMATS:
+            try:
+                return datetime.strptime(value, date_format)
+            except ValueError:
+                pass
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def _numbered(rows) -> Iterator[Tuple[int, tuple]]:
+    for number, row in enumerate(rows, start=2):
+        if any(cell not in (None, '') for cell in row):
+            yield number, tuple(row)
+
+def _parse_amount(value) -> Decimal:
+    """Amount in VND; thousands separators ("1,250,000" or "1.250.000") are ignored"""
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    value = re.sub(r'[\s,]', '', str(value))
+    if re.fullmatch(r'[1-9]\d{0,2}(\.\d{3})+', value):
+        value = value.replace('.', '')
+    return Decimal(value)
+
+class _ErrorFile:
+    """Rejected rows, written to a CSV as they come: row number, reason, then the row as read"""
+
+    def __init__(self, path: str, sample_size: int = BillImportService.SAMPLE_ERRORS):
+        self.path = path
+        self.header: list = []
+        self.count = 0
+        self.sample: List[Dict[str, Any]] = []
+        self._sample_size = sample_size
+        self._file = None
+        self._writer = None
+
+    def add(self, number: int, row: tuple, error: str) -> None:
+        if self._file is None:
+            self._file = open(self.path, 'w', newline='', encoding='utf-8-sig')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(['row', 'error'] + [str(name or '') for name in self.header])
+        self._writer.writerow([number, error] + [_cell(value) for value in row])
+        self.count += 1
+        if len(self.sample) < self._sample_size:
+            self.sample.append({'row': number, 'error': error})
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+def _cell(value) -> str:
+    if value is None:
+        return ''
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+# Create global instance
+bill_import_service = BillImportService()
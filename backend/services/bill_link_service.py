@@ -0,0 +1,171 @@
+from typing import Dict, Any
+from datetime import datetime
+import time
+from sqlalchemy import and_, or_, func, select, update, desc, bindparam
+from models.bill import Bill
+from models.customer import Customer
+from models.bill_link_run import BillLinkRun
+from config.database import get_session, close_session
+from services.customer_service import customer_service
+from utils.normalization import normalize_name
+from utils.nplusone import nplusone_detector
+
+class BillLinkService:
+    """Service linking unassigned bills to customers by normalized name/address
+
+    A bill is linked when its normalized customer_name and address match
+    exactly one active customer, or when its name matches exactly one active
+    customer and one side has no address to disagree on. Bills that are part
+    of a sale are left alone; they already reach the customer through it.
+    """
+
+    # Store a bill's normalized keys, skipping bills whose keys are unchanged
+    # so a rescan does not rewrite (and bloat) every unassigned bill
+    _store_match_keys = update(Bill.__table__).where(
+        Bill.__table__.c.id == bindparam('bill_id'),
+        or_(
+            Bill.__table__.c.match_name.is_distinct_from(bindparam('new_match_name')),
+            Bill.__table__.c.match_address.is_distinct_from(bindparam('new_match_address'))
+        )
+    ).values(match_name=bindparam('new_match_name'), match_address=bindparam('new_match_address'))
+
+    def _candidates(self):
+        """Customers that can be matched unambiguously, by name+address and by name"""
+        active = Customer.is_active == True
+        by_name_and_address = select(
+            Customer.match_name,
+            Customer.match_address,
+            func.min(Customer.id).label('id')
+        ).where(
+            active, Customer.match_name.isnot(None), Customer.match_address.isnot(None)
+        ).group_by(Customer.match_name, Customer.match_address).having(func.count(Customer.id) == 1).subquery()
+
+        by_name = select(
+            Customer.match_name,
+            func.min(Customer.match_address).label('match_address'),
+            func.min(Customer.id).label('id')
+        ).where(
+            active, Customer.match_name.isnot(None)
+        ).group_by(Customer.match_name).having(func.count(Customer.id) == 1).subquery()
+
+        return [
+            (by_name_and_address, Bill.match_address == by_name_and_address.c.match_address),
+            (by_name, or_(Bill.match_address.is_(None), by_name.c.match_address.is_(None))),
+        ]
+
+    @nplusone_detector.allow()  # one SELECT per chunk
+    def link_bills(self, full: bool = False, chunk_size: int = 5000) -> Dict[str, Any]:
+        """Link unassigned bills to customers in id-ordered chunks
+
+        By default only bills newer than the previous run's watermark are
+        scanned; ``full=True`` rescans every unassigned bill, e.g. after
+        customers were imported. Each chunk stores the bills' normalized
+        keys and is then linked with one set-based UPDATE per match rule.
+        """
+        db = get_session()
+        try:
+            started = time.perf_counter()
+            started_at = datetime.utcnow()
+
+            watermark = 0
+            if not full:
+                watermark = db.query(func.max(BillLinkRun.last_bill_id)).scalar() or 0
+
+            candidates = self._candidates()
+            unassigned = and_(Bill.customer_id.is_(None), Bill.sale_id.is_(None))
+
+            last_id = watermark
+            scanned = 0
+            linked = 0
+            customers_updated = set()
+            while True:
+                rows = db.execute(
+                    select(Bill.id, Bill.customer_name, Bill.address)
+                    .where(Bill.id > last_id, unassigned)
+                    .order_by(Bill.id).limit(chunk_size)
+                ).all()
+                if not rows:
+                    break
+
+                first_id, last_id = rows[0].id, rows[-1].id
+                scanned += len(rows)
+
+                db.execute(self._store_match_keys, [
+                    {
+                        'bill_id': row.id,
+                        'new_match_name': normalize_name(row.customer_name) or None,
+                        'new_match_address': normalize_name(row.address) or None
+                    }
+                    for row in rows
+                ])
+
+                chunk_customers = set()
+                for candidate, address_rule in candidates:
+                    result = db.execute(
+                        update(Bill).where(
+                            Bill.id.between(first_id, last_id),
+                            unassigned,
+                            Bill.match_name == candidate.c.match_name,
+                            address_rule
+                        ).values(customer_id=candidate.c.id).returning(Bill.customer_id),
+                        execution_options={'synchronize_session': False}
+                    )
+                    customer_ids = result.scalars().all()
+                    linked += len(customer_ids)
+                    chunk_customers.update(customer_ids)
+
+                customer_service.refresh_customer_totals(db, chunk_customers)
+                db.commit()
+                customers_updated.update(chunk_customers)
+
+            elapsed = time.perf_counter() - started
+            run = BillLinkRun(
+                full_scan=full,
+                last_bill_id=max(last_id, watermark),
+                bills_scanned=scanned,
+                bills_linked=linked,
+                customers_updated=len(customers_updated),
+                elapsed_seconds=round(elapsed, 3),
+                started_at=started_at,
+                finished_at=datetime.utcnow()
+            )
+            db.add(run)
+            db.commit()
+
+            return {
+                'success': True,
+                'run': run.to_dict(),
+                'message': f'Linked {linked} of {scanned} bills to {len(customers_updated)} customers'
+            }
+
+        except Exception as e:
+            if db:
+                db.rollback()
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            close_session(db)
+
+    def get_link_runs(self, limit: int = 20) -> Dict[str, Any]:
+        """Recent linker runs with their throughput"""
+        db = get_session()
+        try:
+            runs = db.query(BillLinkRun).order_by(desc(BillLinkRun.id)).limit(limit).all()
+
+            return {
+                'success': True,
+                'runs': [run.to_dict() for run in runs]
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            close_session(db)
+
+# Create global instance
+bill_link_service = BillLinkService()
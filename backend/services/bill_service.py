@@ -1,9 +1,12 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, func, desc
+from sqlalchemy import BigInteger, Text, or_, and_, func, desc, select, cast, update
 from models.bill import Bill, BillStatus
 from models.user import User
-from config.database import get_db
+from config.database import get_session, close_session, workload, WORKLOAD_ANALYTICS
+from services.customer_service import customer_service
+from services.archive_service import archive_service
+from models.archive import bills_archive
 from datetime import datetime, timedelta
 import json
 
@@ -12,49 +15,49 @@ class BillService:
     
     def get_warehouse_bills(self, page=1, per_page=20, search=None, min_amount=None, max_amount=None, status=None, customer_name=None):
         """Get bills in warehouse with pagination and filters"""
-        db = None
+        db = get_session()
         try:
-            db = next(get_db())
             
             # Debug: Log the query we're about to execute
             print(f"DEBUG: Querying bills with status IN_WAREHOUSE")
             print(f"DEBUG: BillStatus.IN_WAREHOUSE = {BillStatus.IN_WAREHOUSE}")
             
-            # Build query - Use string comparison to avoid enum issues
-            query = db.query(Bill).filter(Bill.status == 'IN_WAREHOUSE')
+            # Build filters - Use string comparison to avoid enum issues
+            conditions = [Bill.status == 'IN_WAREHOUSE']
             
             # Apply filters
             if search:
-                search_filter = or_(
+                conditions.append(or_(
                     Bill.contract_code.ilike(f'%{search}%'),
                     Bill.customer_name.ilike(f'%{search}%'),
                     Bill.address.ilike(f'%{search}%')
-                )
-                query = query.filter(search_filter)
+                ))
             
             if min_amount is not None:
-                query = query.filter(Bill.amount >= min_amount)
+                conditions.append(Bill.amount >= min_amount)
             
             if max_amount is not None:
-                query = query.filter(Bill.amount <= max_amount)
+                conditions.append(Bill.amount <= max_amount)
             
             if status:
-                query = query.filter(Bill.status == status)
+                conditions.append(Bill.status == status)
             
             if customer_name:
-                query = query.filter(Bill.customer_name.ilike(f'%{customer_name}%'))
+                conditions.append(Bill.customer_name.ilike(f'%{customer_name}%'))
             
             # Get total count
-            total = query.count()
+            total = db.scalar(select(func.count(Bill.id)).where(*conditions))
             print(f"DEBUG: Found {total} bills")
             
-            # Apply pagination and ordering
-            bills = query.order_by(desc(Bill.added_to_warehouse_at)).offset(
-                (page - 1) * per_page
-            ).limit(per_page).all()
+            # Read plain rows (no ORM instances) with pagination and ordering
+            rows = db.execute(
+                select(*Bill.dict_columns()).where(*conditions)
+                .order_by(desc(Bill.added_to_warehouse_at))
+                .offset((page - 1) * per_page).limit(per_page)
+            ).all()
             
             # Convert to dict
-            bill_list = [bill.to_dict() for bill in bills]
+            bill_list = [Bill.row_to_dict(row) for row in rows]
             
             return {
                 'success': True,
@@ -76,28 +79,28 @@ class BillService:
                 'error': str(e)
             }
         finally:
-            if db:
-                db.close()
+            close_session(db)
 
     def get_all_bills(self, page=1, limit=50, all_statuses=True):
         """Get all bills with all statuses"""
-        db = None
+        db = get_session()
         try:
-            db = next(get_db())
             
-            # Query all bills regardless of status
-            query = db.query(Bill)
+            # Every status, so archived bills too
+            bills = archive_service.bills()
             
-            # Get total count
-            total = query.count()
+            # Count all bills regardless of status
+            total = db.scalar(select(func.count(bills.id)))
             
-            # Apply pagination and ordering
-            bills = query.order_by(desc(Bill.added_to_warehouse_at)).offset(
-                (page - 1) * limit
-            ).limit(limit).all()
+            # Read plain rows (no ORM instances) with pagination and ordering
+            rows = db.execute(
+                select(*Bill.dict_columns(source=bills))
+                .order_by(desc(bills.added_to_warehouse_at))
+                .offset((page - 1) * limit).limit(limit)
+            ).all()
             
             # Convert to dict
-            bill_list = [bill.to_dict() for bill in bills]
+            bill_list = [Bill.row_to_dict(row) for row in rows]
             
             return {
                 'success': True,
@@ -117,19 +120,107 @@ class BillService:
                 'error': str(e)
             }
         finally:
-            if db:
-                db.close()
+            close_session(db)
+    
+    def _parse_change_token(self, token: str) -> Tuple[int, int, int]:
+        """(floor, next_floor, after_id) from a change feed token
+        
+        A plain ``<xid>`` token starts a new round from that transaction id;
+        ``<floor>.<next_floor>.<after_id>`` continues a round that was cut
+        off by the page size.
+        """
+        try:
+            parts = [int(part) for part in token.split('.')]
+        except ValueError:
+            parts = []
+        if len(parts) == 1:
+            return parts[0], None, 0
+        if len(parts) == 3:
+            return parts[0], parts[1], parts[2]
+        raise ValueError('Invalid change token')
+    
+    def get_bill_changes(self, since: str = None, limit: int = 500) -> Dict[str, Any]:
+        """Bills inserted or modified since ``since``, for incremental sync
+        
+        Every bill row carries the id of the last transaction that wrote it
+        (``change_xid``) and tokens are transaction id watermarks: the oldest
+        transaction still running when a round started. A round returns every
+        row written by that transaction or a later one, so a slow transaction
+        that commits after a newer one is never skipped; rows may be sent
+        twice, and clients apply changes as upserts by id. Bills that left
+        the warehouse (sold, cancelled, expired) come back with their new
+        status so clients can drop them. Without ``since`` only the current
+        token is returned; take it before loading the full warehouse.
+        """
+        db = get_session()
+        try:
+            snapshot_xmin = db.scalar(select(
+                cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger)
+            ))
+            if not since:
+                return {
+                    'success': True,
+                    'changes': [],
+                    'token': str(snapshot_xmin),
+                    'has_more': False
+                }
+            
+            try:
+                floor, next_floor, after_id = self._parse_change_token(since)
+            except ValueError as e:
+                return {
+                    'success': False,
+                    'error': str(e)
+                }
+            if next_floor is None:
+                next_floor = snapshot_xmin
+            
+            rows = db.execute(
+                select(*Bill.dict_columns())
+                .where(Bill.change_xid >= floor, Bill.id > after_id)
+                .order_by(Bill.id).limit(limit + 1)
+            ).all()
+            
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            token = f'{floor}.{next_floor}.{rows[-1].id}' if has_more else str(next_floor)
+            
+            return {
+                'success': True,
+                'changes': [Bill.row_to_dict(row) for row in rows],
+                'token': token,
+                'has_more': has_more
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            close_session(db)
     
     def get_bill_by_id(self, bill_id: int) -> Dict[str, Any]:
         """Get bill by ID"""
+        db = get_session()
         try:
-            db = next(get_db())
             bill = db.query(Bill).filter(Bill.id == bill_id).first()
             
             if not bill:
+                # Finished bills may have been moved to the archive
+                row = None
+                if archive_service.horizon() is not None:
+                    row = db.execute(
+                        select(*Bill.dict_columns(source=bills_archive.c)).where(bills_archive.c.id == bill_id)
+                    ).first()
+                if row is None:
+                    return {
+                        'success': False,
+                        'error': 'Bill not found'
+                    }
                 return {
-                    'success': False,
-                    'error': 'Bill not found'
+                    'success': True,
+                    'bill': Bill.row_to_dict(row)
                 }
             
             return {
@@ -143,12 +234,12 @@ class BillService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def add_bill_to_warehouse(self, bill_data: Dict[str, Any], user_id: int) -> Dict[str, Any]:
         """Add bill to warehouse"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             # Check if bill already exists
             existing_bill = db.query(Bill).filter(
@@ -196,12 +287,12 @@ class BillService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def update_bill(self, bill_id: int, bill_data: Dict[str, Any]) -> Dict[str, Any]:
         """Update bill information"""
+        db = get_session()
         try:
-            db = next(get_db())
             bill = db.query(Bill).filter(Bill.id == bill_id).first()
             
             if not bill:
@@ -221,6 +312,8 @@ class BillService:
                     setattr(bill, field, bill_data[field])
             
             bill.updated_at = datetime.utcnow()
+            if 'amount' in bill_data:
+                customer_service.refresh_customer_totals(db, [bill.customer_id])
             db.commit()
             
             return {
@@ -236,12 +329,12 @@ class BillService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def remove_bill_from_warehouse(self, bill_id: int) -> Dict[str, Any]:
         """Remove bill from warehouse (soft delete)"""
+        db = get_session()
         try:
-            db = next(get_db())
             bill = db.query(Bill).filter(Bill.id == bill_id).first()
             
             if not bill:
@@ -260,6 +353,7 @@ class BillService:
             # Soft delete by changing status
             bill.status = BillStatus.CANCELLED
             bill.updated_at = datetime.utcnow()
+            customer_service.refresh_customer_totals(db, [bill.customer_id])
             db.commit()
             
             return {
@@ -274,12 +368,12 @@ class BillService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def find_bill_combinations(self, target_amount: float, tolerance: float = 0.1) -> Dict[str, Any]:
         """Find bill combinations that sum to target amount"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             # Get available bills
             available_bills = db.query(Bill).filter(
@@ -338,7 +432,7 @@ class BillService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def _find_combinations_dp(self, amounts: List[float], target: float, tolerance: float) -> List[List[float]]:
         """Dynamic programming approach to find bill combinations"""
@@ -390,10 +484,11 @@ class BillService:
             # Current bill is not used
             return self._backtrack_combination(dp, amounts, i - 1, j)
     
+    @workload(WORKLOAD_ANALYTICS)
     def get_warehouse_statistics(self) -> Dict[str, Any]:
         """Get warehouse statistics"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             # Total bills in warehouse
             total_bills = db.query(Bill).filter(
@@ -462,12 +557,12 @@ class BillService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def update_bill_status(self, bill_id: int, new_status: str) -> Dict[str, Any]:
         """Update bill status"""
+        db = get_session()
         try:
-            db = next(get_db())
             bill = db.query(Bill).filter(Bill.id == bill_id).first()
             
             if not bill:
@@ -496,6 +591,7 @@ class BillService:
             elif new_status == 'COMPLETED':
                 bill.completed_at = datetime.utcnow()
             
+            customer_service.refresh_customer_totals(db, [bill.customer_id])
             db.commit()
             
             return {
@@ -511,19 +607,72 @@ class BillService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
 
+    def expire_overdue_bills(self, chunk_size: int = 5000,
+                             progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """Mark warehouse bills past their due date as EXPIRED, in id-ordered chunks
+        
+        Each chunk is its own transaction, so a long sweep never holds many
+        row locks; ``progress(done, total)`` is called after every chunk.
+        """
+        db = get_session()
+        try:
+            overdue = and_(Bill.status == BillStatus.IN_WAREHOUSE, Bill.due_date < func.now())
+            total = db.scalar(select(func.count(Bill.id)).where(overdue))
+            
+            expired = 0
+            last_id = 0
+            while True:
+                ids = db.scalars(
+                    select(Bill.id).where(Bill.id > last_id, overdue).order_by(Bill.id).limit(chunk_size)
+                ).all()
+                if not ids:
+                    break
+                last_id = ids[-1]
+                
+                customer_ids = db.execute(
+                    update(Bill).where(Bill.id.in_(ids), overdue)
+                    .values(status=BillStatus.EXPIRED, updated_at=datetime.utcnow())
+                    .returning(Bill.customer_id),
+                    execution_options={'synchronize_session': False}
+                ).scalars().all()
+                expired += len(customer_ids)
+                customer_service.refresh_customer_totals(db, customer_ids)
+                db.commit()
+                
+                if progress:
+                    progress(expired, total)
+            
+            return {
+                'success': True,
+                'bills_expired': expired,
+                'message': f'{expired} overdue bills marked as EXPIRED'
+            }
+            
+        except Exception as e:
+            db.rollback()
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            close_session(db)
+
+    @workload(WORKLOAD_ANALYTICS)
     def export_warehouse_bills(self, format: str = 'json') -> Dict[str, Any]:
         """Export warehouse bills"""
+        db = get_session()
         try:
-            db = next(get_db())
             
-            # Get all warehouse bills
-            bills = db.query(Bill).filter(
-                Bill.status == BillStatus.IN_WAREHOUSE
-            ).order_by(desc(Bill.added_to_warehouse_at)).all()
+            # Get all warehouse bills as plain rows
+            rows = db.execute(
+                select(*Bill.dict_columns())
+                .where(Bill.status == BillStatus.IN_WAREHOUSE)
+                .order_by(desc(Bill.added_to_warehouse_at))
+            ).all()
             
-            bill_list = [bill.to_dict() for bill in bills]
+            bill_list = [Bill.row_to_dict(row) for row in rows]
             
             if format == 'json':
                 return {
@@ -544,19 +693,24 @@ class BillService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
 
     def get_bills_by_customer(self, customer_id: int) -> Dict[str, Any]:
         """Get all bills for a specific customer"""
+        db = get_session()
         try:
-            db = next(get_db())
             
-            # Get bills by customer ID
-            bills = db.query(Bill).filter(Bill.customer_id == customer_id).order_by(
-                desc(Bill.created_at)
+            # The customer's whole history, archived bills included
+            bills = archive_service.bills()
+            
+            # Get bills by customer ID as plain rows
+            rows = db.execute(
+                select(*Bill.dict_columns(source=bills))
+                .where(bills.customer_id == customer_id)
+                .order_by(desc(bills.created_at))
             ).all()
             
-            bill_list = [bill.to_dict() for bill in bills]
+            bill_list = [Bill.row_to_dict(row) for row in rows]
             
             return {
                 'success': True,
@@ -570,7 +724,7 @@ class BillService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
 
 
 
@@ -0,0 +1,303 @@
+from typing import List, Dict, Any, Optional, Iterable
+from itertools import combinations
+from datetime import datetime
+import re
+import time
+from sqlalchemy import select, update
+from models.customer import Customer, CustomerStatus
+from models.bill import Bill
+from models.sale import Sale
+from models.archive import sales_archive, bills_archive
+from config.database import get_session, close_session
+from services.customer_service import customer_service
+from services.customer_search_index import customer_search_index
+from utils.normalization import name_tokens, normalize_name, phone_e164
+from utils.nplusone import nplusone_detector
+
+_NON_DIGITS = re.compile(r'\D')
+
+class CustomerDedupService:
+    """Offline detection and merging of duplicate customers
+
+    Instead of comparing every pair of customers, each customer is put into
+    a few blocks keyed by normalized phone/zalo, bank account, email and
+    unaccented name tokens, and only customers sharing a block are scored. Pairs above the threshold
+    are grouped into clusters, each with a suggested primary record.
+    """
+
+    # Blocks larger than this carry no signal (e.g. a very common name) and
+    # would bring back the quadratic blow-up, so they are skipped
+    MAX_BLOCK_SIZE = 50
+
+    # Score contributed by each matching attribute; name similarity is scaled
+    WEIGHTS = {
+        'phone': 0.6,
+        'bank_account': 0.5,
+        'email': 0.3,
+        'name': 0.4,
+        'address': 0.2,
+    }
+
+    @nplusone_detector.allow()  # one SELECT per chunk
+    def _load_customers(self, db, chunk_size: int = 10000) -> List[Dict[str, Any]]:
+        customers = []
+        last_id = 0
+        while True:
+            rows = db.execute(
+                select(
+                    Customer.id, Customer.name, Customer.phone, Customer.zalo, Customer.email,
+                    Customer.bank_account, Customer.address, Customer.total_bills
+                ).where(
+                    Customer.id > last_id,
+                    Customer.is_active == True
+                ).order_by(Customer.id).limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            customers.extend(self._prepare(row) for row in rows)
+        return customers
+
+    def _prepare(self, row) -> Dict[str, Any]:
+        """Precompute the normalized attributes used for blocking and scoring"""
+        tokens = name_tokens(row.name)
+        bank_account = _NON_DIGITS.sub('', row.bank_account or '')
+        return {
+            'id': row.id,
+            'name': row.name,
+            'phone': row.phone,
+            'total_bills': row.total_bills or 0,
+            'tokens': frozenset(tokens),
+            'name_key': ' '.join(tokens),
+            'name_ends': f'{tokens[0]} {tokens[-1]}' if len(tokens) > 1 else None,
+            'phones': {p for p in (phone_e164(row.phone), phone_e164(row.zalo)) if p},
+            'bank_account': bank_account if len(bank_account) >= 6 else None,
+            'email': (row.email or '').strip().lower() or None,
+            'address': normalize_name(row.address) or None,
+        }
+
+    def _blocking_keys(self, customer: Dict[str, Any], name_with_address: bool) -> Iterable[str]:
+        for phone in customer['phones']:
+            yield 'p:' + phone
+        if customer['bank_account']:
+            yield 'b:' + customer['bank_account']
+        if customer['email']:
+            yield 'm:' + customer['email']
+
+        if name_with_address:
+            # A name match alone cannot reach the threshold, and pairs that also
+            # share a phone, bank account or email already meet in those blocks,
+            # so name blocks only need to pair customers at the same address
+            if not customer['address']:
+                return
+            suffix = '|' + customer['address']
+        else:
+            suffix = ''
+        if customer['name_key']:
+            yield 'n:' + customer['name_key'] + suffix
+        if customer['name_ends']:
+            yield 'e:' + customer['name_ends'] + suffix
+
+    def _score(self, a: Dict[str, Any], b: Dict[str, Any]):
+        score = 0.0
+        reasons = []
+        if a['phones'] & b['phones']:
+            score += self.WEIGHTS['phone']
+            reasons.append('phone')
+        if a['bank_account'] and a['bank_account'] == b['bank_account']:
+            score += self.WEIGHTS['bank_account']
+            reasons.append('bank_account')
+        if a['email'] and a['email'] == b['email']:
+            score += self.WEIGHTS['email']
+            reasons.append('email')
+        if a['tokens'] and b['tokens']:
+            similarity = len(a['tokens'] & b['tokens']) / len(a['tokens'] | b['tokens'])
+            if similarity >= 0.5:
+                score += self.WEIGHTS['name'] * similarity
+                reasons.append('name' if similarity == 1 else 'similar_name')
+        if a['address'] and a['address'] == b['address']:
+            score += self.WEIGHTS['address']
+            reasons.append('address')
+        return min(score, 1.0), reasons
+
+    def find_duplicates(self, threshold: float = 0.6,
+                        customers: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Build the merge report: scored candidate pairs grouped into clusters
+
+        ``customers`` lets callers pass pre-loaded rows (see ``_prepare``);
+        by default all active customers are read in keyset chunks.
+        """
+        db = None
+        try:
+            started = time.perf_counter()
+            if customers is None:
+                db = get_session()
+                customers = self._load_customers(db)
+            by_id = {customer['id']: customer for customer in customers}
+
+            name_with_address = threshold > self.WEIGHTS['name']
+            blocks: Dict[str, List[int]] = {}
+            for customer in customers:
+                for key in self._blocking_keys(customer, name_with_address):
+                    blocks.setdefault(key, []).append(customer['id'])
+
+            candidate_pairs = set()
+            skipped_blocks = 0
+            for ids in blocks.values():
+                if len(ids) < 2:
+                    continue
+                if len(ids) > self.MAX_BLOCK_SIZE:
+                    skipped_blocks += 1
+                    continue
+                candidate_pairs.update(combinations(ids, 2))
+
+            # Union-find over matched pairs to form clusters
+            parent = {}
+
+            def find(customer_id):
+                parent.setdefault(customer_id, customer_id)
+                while parent[customer_id] != customer_id:
+                    parent[customer_id] = parent[parent[customer_id]]
+                    customer_id = parent[customer_id]
+                return customer_id
+
+            matches = []
+            for a_id, b_id in candidate_pairs:
+                score, reasons = self._score(by_id[a_id], by_id[b_id])
+                if score >= threshold:
+                    matches.append({'ids': sorted((a_id, b_id)), 'score': round(score, 2), 'reasons': reasons})
+                    parent[find(a_id)] = find(b_id)
+
+            grouped: Dict[int, List[int]] = {}
+            for customer_id in parent:
+                grouped.setdefault(find(customer_id), []).append(customer_id)
+            pairs_by_root: Dict[int, List[Dict[str, Any]]] = {}
+            for match in matches:
+                pairs_by_root.setdefault(find(match['ids'][0]), []).append(match)
+
+            clusters = []
+            for root, ids in grouped.items():
+                members = [by_id[customer_id] for customer_id in ids]
+                # Keep the record with the most history; ties go to the oldest
+                members.sort(key=lambda c: (-c['total_bills'], c['id']))
+                clusters.append({
+                    'primary_id': members[0]['id'],
+                    'duplicate_ids': [c['id'] for c in members[1:]],
+                    'customers': [
+                        {'id': c['id'], 'name': c['name'], 'phone': c['phone'], 'total_bills': c['total_bills']}
+                        for c in members
+                    ],
+                    'pairs': sorted(pairs_by_root[root], key=lambda m: -m['score'])
+                })
+            clusters.sort(key=lambda cluster: cluster['primary_id'])
+
+            return {
+                'success': True,
+                'customers_scanned': len(customers),
+                'blocks': len(blocks),
+                'skipped_blocks': skipped_blocks,
+                'pairs_scored': len(candidate_pairs),
+                'pairs_matched': len(matches),
+                'clusters': clusters,
+                'elapsed_seconds': round(time.perf_counter() - started, 3)
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            close_session(db)
+
+    def merge_customers(self, primary_id: int, duplicate_ids: List[int]) -> Dict[str, Any]:
+        """Relink bills and sales of duplicates to the primary customer and deactivate them"""
+        duplicate_ids = [customer_id for customer_id in set(duplicate_ids) if customer_id != primary_id]
+        if not duplicate_ids:
+            return {
+                'success': False,
+                'error': 'No duplicate customers to merge'
+            }
+
+        db = get_session()
+        try:
+
+            customers = db.query(Customer).filter(
+                Customer.id.in_([primary_id] + duplicate_ids)
+            ).order_by(Customer.id).with_for_update().all()
+            if len(customers) != len(duplicate_ids) + 1:
+                return {
+                    'success': False,
+                    'error': 'Some customers were not found'
+                }
+
+            bills_moved = db.execute(
+                update(Bill).where(Bill.customer_id.in_(duplicate_ids)).values(customer_id=primary_id),
+                execution_options={'synchronize_session': False}
+            ).rowcount
+            sales_moved = db.execute(
+                update(Sale).where(Sale.customer_id.in_(duplicate_ids)).values(customer_id=primary_id),
+                execution_options={'synchronize_session': False}
+            ).rowcount
+            # Archived history follows the customer too
+            for archive in (bills_archive, sales_archive):
+                db.execute(
+                    update(archive).where(archive.c.customer_id.in_(duplicate_ids)).values(customer_id=primary_id)
+                )
+
+            merged_at = datetime.utcnow()
+            for customer in customers:
+                if customer.id == primary_id:
+                    continue
+                customer.is_active = False
+                customer.status = CustomerStatus.INACTIVE
+                note = f"Merged into customer #{primary_id} on {merged_at:%Y-%m-%d}"
+                customer.notes = f"{customer.notes}\n{note}" if customer.notes else note
+                customer.updated_at = merged_at
+
+            customer_service.refresh_customer_totals(db, [primary_id] + duplicate_ids)
+            db.commit()
+
+            customer_search_index.remove(duplicate_ids)
+
+            return {
+                'success': True,
+                'primary_id': primary_id,
+                'merged_ids': sorted(duplicate_ids),
+                'bills_moved': bills_moved,
+                'sales_moved': sales_moved
+            }
+
+        except Exception as e:
+            if db:
+                db.rollback()
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            close_session(db)
+
+    @nplusone_detector.allow()  # the same merge per cluster
+    def merge_clusters(self, clusters: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge every cluster of a report, one transaction per cluster"""
+        merged = []
+        errors = []
+        for cluster in clusters:
+            result = self.merge_customers(cluster['primary_id'], cluster['duplicate_ids'])
+            if result['success']:
+                merged.append(result)
+            else:
+                errors.append({'primary_id': cluster['primary_id'], 'error': result['error']})
+
+        return {
+            'success': not errors,
+            'merged': merged,
+            'errors': errors,
+            'customers_merged': sum(len(result['merged_ids']) for result in merged),
+            'bills_moved': sum(result['bills_moved'] for result in merged),
+            'sales_moved': sum(result['sales_moved'] for result in merged)
+        }
+
+# Create global instance
+customer_dedup_service = CustomerDedupService()
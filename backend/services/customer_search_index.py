@@ -0,0 +1,262 @@
+import bisect
+import threading
+import time
+from typing import Dict, List, Tuple, Any, Optional, Iterable
+from models.customer import Customer
+from config.database import get_session, close_session
+from utils.normalization import name_tokens, phone_digits, normalize_zalo
+from utils.table_versions import table_versions
+
+class CustomerSearchIndex:
+    """In-process prefix index backing the customer typeahead
+
+    Keeps two sorted key lists: unaccented name tokens, and phone/zalo digits.
+    A lookup is a binary search to the first key with the typed prefix
+    followed by a short forward scan, so it never touches the database and
+    stays in the sub-millisecond range for 100k customers. The index is
+    loaded once from the customers table and kept current by
+    CustomerService on every customer write. Writes made by other processes
+    show up through the customers table version (``utils.table_versions``):
+    when it moved by more than this process's own writes, the index is
+    rebuilt in the background while lookups keep being served.
+    """
+
+    # Upper bound on keys walked per lookup, so one-letter prefixes stay cheap
+    MAX_SCAN = 2000
+    # How often lookups check the customers table version
+    VERSION_CHECK_SECONDS = 1.0
+    # Other processes' writes include the customer totals refresh of every
+    # sale, so rebuilds are spaced at least this far apart
+    RELOAD_MIN_SECONDS = 10.0
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Serializes the first load only; the index lock is never held while reading customers
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        self._records: Dict[int, Dict[str, Any]] = {}
+        self._tokens_by_id: Dict[int, Tuple[List[str], List[str]]] = {}
+        self._name_keys: List[Tuple[str, int]] = []
+        self._number_keys: List[Tuple[str, int]] = []
+        # (customers table version, own bumps of it) the index reflects;
+        # None when loaded from given rows
+        self._version: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self._loaded_at = 0.0
+        self._reloading = False
+
+    @staticmethod
+    def _keys_for(name: str, phone: str, zalo: str) -> Tuple[List[str], List[str]]:
+        names = sorted(set(name_tokens(name)))
+        numbers = set()
+        for value in (phone_digits(phone), normalize_zalo(zalo)):
+            if value:
+                numbers.add(value)
+                # Also match numbers typed without the leading 0
+                if value.startswith('0') and value[1:].isdigit():
+                    numbers.add(value[1:])
+        return names, sorted(numbers)
+
+    def load(self) -> int:
+        """(Re)build the whole index from active customers, returning its size"""
+        # Read before the rows, so a write during the load triggers another one
+        version = self._table_version()
+        db = get_session()
+        try:
+            rows = db.query(
+                Customer.id, Customer.name, Customer.phone, Customer.zalo
+            ).filter(Customer.is_active == True).all()
+        finally:
+            close_session(db)
+        count = self.load_rows(rows)
+        with self._lock:
+            self._version = version
+            self._loaded_at = time.monotonic()
+        return count
+
+    @staticmethod
+    def _table_version() -> Tuple[int, int]:
+        return table_versions.get(['customers'])[0], table_versions.local_bumps('customers')
+
+    def load_rows(self, rows: Iterable[Tuple[int, str, str, Optional[str]]]) -> int:
+        """Replace the index contents with ``(id, name, phone, zalo)`` rows"""
+        records = {}
+        tokens_by_id = {}
+        name_keys = []
+        number_keys = []
+        for customer_id, name, phone, zalo in rows:
+            names, numbers = self._keys_for(name, phone, zalo)
+            records[customer_id] = {'id': customer_id, 'name': name, 'phone': phone}
+            tokens_by_id[customer_id] = (names, numbers)
+            name_keys.extend((token, customer_id) for token in names)
+            number_keys.extend((number, customer_id) for number in numbers)
+        name_keys.sort()
+        number_keys.sort()
+
+        with self._lock:
+            self._records = records
+            self._tokens_by_id = tokens_by_id
+            self._name_keys = name_keys
+            self._number_keys = number_keys
+            self._loaded = True
+        return len(records)
+
+    def init_app(self, app) -> None:
+        """Warm up with the first request each process serves
+
+        Started from a request rather than at import, so WSGI servers that
+        fork workers after loading the app warm up every worker.
+        """
+        app.config.setdefault('SEARCH_INDEX_WARM_UP', True)
+        if not app.config['SEARCH_INDEX_WARM_UP']:
+            return
+
+        @app.before_request
+        def warm_up_customer_search_index():
+            if not self._loaded:
+                self.warm_up()
+
+    def ensure_loaded(self) -> None:
+        """Load the index on first use
+
+        Concurrent first lookups wait for one load; the rows are read
+        without the index lock and swapped in by ``load_rows``, so writers
+        (``upsert``, ``remove``) are not held up meanwhile.
+        """
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                self.load()
+
+    def warm_up(self) -> None:
+        """Load the index in the background so the first keystroke is not slow"""
+        if self._loaded or self._load_lock.locked():
+            return
+        thread = threading.Thread(target=self._warm_up, daemon=True)
+        thread.start()
+
+    def _warm_up(self) -> None:
+        try:
+            self.ensure_loaded()
+        except Exception as e:
+            print(f"Warning: Failed to load customer search index: {e}")
+
+    def _check_version(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if (self._version is None or self._reloading or now - self._checked_at < self.VERSION_CHECK_SECONDS
+                    or now - self._loaded_at < self.RELOAD_MIN_SECONDS):
+                return
+            self._checked_at = now
+        try:
+            version, own_bumps = self._table_version()
+        except Exception as e:
+            print(f"Warning: Failed to check customers table version: {e}")
+            return
+        with self._lock:
+            if self._version is None or self._reloading:
+                return
+            loaded_version, loaded_own_bumps = self._version
+            # Own writes were already applied by upsert/remove
+            if version - loaded_version == own_bumps - loaded_own_bumps:
+                return
+            self._reloading = True
+        thread = threading.Thread(target=self._reload, daemon=True)
+        thread.start()
+
+    def _reload(self) -> None:
+        try:
+            self.load()
+        except Exception as e:
+            print(f"Warning: Failed to reload customer search index: {e}")
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def upsert(self, customer: Customer) -> None:
+        """Add or refresh one customer after it was written"""
+        with self._lock:
+            if not self._loaded:
+                return
+            self._remove_keys(customer.id)
+            if not customer.is_active:
+                return
+            names, numbers = self._keys_for(customer.name, customer.phone, customer.zalo)
+            self._records[customer.id] = {'id': customer.id, 'name': customer.name, 'phone': customer.phone}
+            self._tokens_by_id[customer.id] = (names, numbers)
+            for token in names:
+                bisect.insort(self._name_keys, (token, customer.id))
+            for number in numbers:
+                bisect.insort(self._number_keys, (number, customer.id))
+
+    def remove(self, customer_ids: Iterable[int]) -> None:
+        """Drop customers that were deactivated or merged away"""
+        with self._lock:
+            if not self._loaded:
+                return
+            for customer_id in customer_ids:
+                self._remove_keys(customer_id)
+
+    def _remove_keys(self, customer_id: int) -> None:
+        tokens = self._tokens_by_id.pop(customer_id, None)
+        self._records.pop(customer_id, None)
+        if not tokens:
+            return
+        names, numbers = tokens
+        for keys, values in ((self._name_keys, names), (self._number_keys, numbers)):
+            for value in values:
+                position = bisect.bisect_left(keys, (value, customer_id))
+                if position < len(keys) and keys[position] == (value, customer_id):
+                    del keys[position]
+
+    def _scan(self, keys: List[Tuple[str, int]], prefix: str):
+        position = bisect.bisect_left(keys, (prefix,))
+        end = min(len(keys), position + self.MAX_SCAN)
+        while position < end and keys[position][0].startswith(prefix):
+            yield keys[position][1]
+            position += 1
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Return up to ``limit`` slim ``{id, name, phone}`` records matching the prefix"""
+        self.ensure_loaded()
+        self._check_version()
+        query = (query or '').strip()
+        compact = query.replace(' ', '').replace('-', '').replace('.', '').lstrip('+')
+
+        with self._lock:
+            results = []
+            seen = set()
+
+            if compact.isdigit():
+                digits = phone_digits(compact)
+                if query.startswith('+84'):
+                    # A partial international number is too short for phone_digits
+                    digits = '0' + compact[2:]
+                candidates = self._scan(self._number_keys, digits)
+                required = []
+            else:
+                tokens = name_tokens(query)
+                if not tokens:
+                    return []
+                # Drive the scan with the most selective (longest) token and
+                # require every other token to prefix some name token too
+                tokens.sort(key=len, reverse=True)
+                candidates = self._scan(self._name_keys, tokens[0])
+                required = tokens[1:]
+
+            for customer_id in candidates:
+                if customer_id in seen:
+                    continue
+                seen.add(customer_id)
+                if required:
+                    names = self._tokens_by_id[customer_id][0]
+                    if not all(any(name.startswith(token) for name in names) for token in required):
+                        continue
+                results.append(dict(self._records[customer_id]))
+                if len(results) >= limit:
+                    break
+            return results
+
+# Create global instance
+customer_search_index = CustomerSearchIndex()
@@ -1,47 +1,70 @@
-from typing import List, Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Iterable
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from sqlalchemy import DateTime, or_, and_, func, select, update, cast, column, literal_column
 from models.customer import Customer
 from models.user import User
-from config.database import get_db
+from models.bill import Bill, BillStatus
+from models.sale import Sale, SaleStatus
+from models.archive import sales_archive, bills_archive
+from config.database import get_session, close_session, workload, WORKLOAD_ANALYTICS
+from services.customer_search_index import customer_search_index
+from utils.normalization import normalize_name, phone_e164
+from utils.table_versions import table_versions
+from utils.nplusone import nplusone_detector
 from datetime import datetime
 
 class CustomerService:
     """Service for customer management operations"""
     
+    # Longest month range get_customer_statistics will generate
+    MAX_STATISTICS_MONTHS = 120
+    # Month ranges kept per process; the least recently used is dropped first
+    STATISTICS_CACHE_SIZE = 32
+    
+    def __init__(self):
+        # Keyed by the customers table version, so entries from before a write are never hit
+        self._statistics_cache: 'OrderedDict[Any, Dict[str, Any]]' = OrderedDict()
+        self._statistics_lock = threading.Lock()
+    
+    @property
+    def _data_version(self) -> int:
+        return table_versions.get(['customers'])[0]
+    
     def get_all_customers(self, 
                          page: int = 1, 
                          per_page: int = 20,
                          search: str = None,
                          is_active: bool = None) -> Dict[str, Any]:
         """Get all customers with pagination and filtering"""
+        db = get_session()
         try:
-            db = next(get_db())
-            
-            # Build query
-            query = db.query(Customer)
             
-            # Apply filters
+            # Build filters
+            conditions = []
             if search:
-                search_filter = or_(
+                conditions.append(or_(
                     Customer.name.ilike(f'%{search}%'),
                     Customer.phone.ilike(f'%{search}%'),
                     Customer.zalo.ilike(f'%{search}%'),
                     Customer.email.ilike(f'%{search}%')
-                )
-                query = query.filter(search_filter)
+                ))
             
             if is_active is not None:
-                query = query.filter(Customer.is_active == is_active)
+                conditions.append(Customer.is_active == is_active)
             
             # Get total count
-            total = query.count()
+            total = db.scalar(select(func.count(Customer.id)).where(*conditions))
             
-            # Apply pagination
-            customers = query.offset((page - 1) * per_page).limit(per_page).all()
+            # Read plain rows (no ORM instances) with pagination
+            rows = db.execute(
+                select(*Customer.dict_columns()).where(*conditions)
+                .offset((page - 1) * per_page).limit(per_page)
+            ).all()
             
             # Convert to dict
-            customer_list = [customer.to_dict() for customer in customers]
+            customer_list = [Customer.row_to_dict(row) for row in rows]
             
             return {
                 'success': True,
@@ -60,12 +83,12 @@ class CustomerService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def get_customer_by_id(self, customer_id: int) -> Dict[str, Any]:
         """Get customer by ID"""
+        db = get_session()
         try:
-            db = next(get_db())
             customer = db.query(Customer).filter(Customer.id == customer_id).first()
             
             if not customer:
@@ -85,17 +108,22 @@ class CustomerService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def create_customer(self, customer_data: Dict[str, Any], user_id: int) -> Dict[str, Any]:
         """Create a new customer"""
+        db = get_session()
         try:
-            db = next(get_db())
             
-            # Check if phone already exists
-            existing_customer = db.query(Customer).filter(
-                Customer.phone == customer_data['phone']
-            ).first()
+            # Check if phone already exists, in any formatting
+            phone_normalized = phone_e164(customer_data['phone'])
+            if not phone_normalized:
+                return {
+                    'success': False,
+                    'error': 'Invalid phone number'
+                }
+            
+            existing_customer = self._find_by_phone(db, customer_data['phone'], phone_normalized)
             
             if existing_customer:
                 return {
@@ -107,11 +135,14 @@ class CustomerService:
             customer = Customer(
                 name=customer_data['name'],
                 phone=customer_data['phone'],
+                phone_normalized=phone_normalized,
                 zalo=customer_data.get('zalo'),
                 email=customer_data.get('email'),
                 bank_account=customer_data.get('bank_account'),
                 bank_name=customer_data.get('bank_name'),
                 address=customer_data.get('address'),
+                match_name=normalize_name(customer_data['name']) or None,
+                match_address=normalize_name(customer_data.get('address')) or None,
                 notes=customer_data.get('notes'),
                 customer_type=customer_data.get('customerType', 'individual'),
                 company_name=customer_data.get('companyName'),
@@ -123,6 +154,7 @@ class CustomerService:
             db.add(customer)
             db.commit()
             db.refresh(customer)
+            customer_search_index.upsert(customer)
             
             return {
                 'success': True,
@@ -137,12 +169,12 @@ class CustomerService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def update_customer(self, customer_id: int, customer_data: Dict[str, Any]) -> Dict[str, Any]:
         """Update customer information"""
+        db = get_session()
         try:
-            db = next(get_db())
             customer = db.query(Customer).filter(Customer.id == customer_id).first()
             
             if not customer:
@@ -153,18 +185,22 @@ class CustomerService:
             
             # Check if phone is being changed and if it already exists
             if 'phone' in customer_data and customer_data['phone'] != customer.phone:
-                existing_customer = db.query(Customer).filter(
-                    and_(
-                        Customer.phone == customer_data['phone'],
-                        Customer.id != customer_id
-                    )
-                ).first()
+                phone_normalized = phone_e164(customer_data['phone'])
+                if not phone_normalized:
+                    return {
+                        'success': False,
+                        'error': 'Invalid phone number'
+                    }
+                
+                existing_customer = self._find_by_phone(db, customer_data['phone'], phone_normalized, exclude_id=customer_id)
                 
                 if existing_customer:
                     return {
                         'success': False,
                         'error': 'Phone number already exists'
                     }
+                
+                customer.phone_normalized = phone_normalized
             
             # Update fields
             allowed_fields = [
@@ -177,8 +213,12 @@ class CustomerService:
                 if field in customer_data:
                     setattr(customer, field, customer_data[field])
             
+            customer.match_name = normalize_name(customer.name) or None
+            customer.match_address = normalize_name(customer.address) or None
+            
             customer.updated_at = datetime.utcnow()
             db.commit()
+            customer_search_index.upsert(customer)
             
             return {
                 'success': True,
@@ -193,12 +233,24 @@ class CustomerService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
+    
+    def _find_by_phone(self, db: Session, phone: str, phone_normalized: str, exclude_id: int = None) -> Optional[Customer]:
+        """Single indexed lookup for a customer already using this phone number"""
+        query = db.query(Customer).filter(
+            or_(
+                Customer.phone_normalized == phone_normalized,
+                Customer.phone == phone
+            )
+        )
+        if exclude_id is not None:
+            query = query.filter(Customer.id != exclude_id)
+        return query.first()
     
     def delete_customer(self, customer_id: int) -> Dict[str, Any]:
         """Delete customer (soft delete by setting is_active to False)"""
+        db = get_session()
         try:
-            db = next(get_db())
             customer = db.query(Customer).filter(Customer.id == customer_id).first()
             
             if not customer:
@@ -208,7 +260,8 @@ class CustomerService:
                 }
             
             # Check if customer has any sales
-            if customer.sales:
+            has_sales = db.query(Sale.id).filter(Sale.customer_id == customer_id).first()
+            if has_sales:
                 return {
                     'success': False,
                     'error': 'Cannot delete customer with existing sales'
@@ -218,6 +271,7 @@ class CustomerService:
             customer.is_active = False
             customer.updated_at = datetime.utcnow()
             db.commit()
+            customer_search_index.remove([customer_id])
             
             return {
                 'success': True,
@@ -231,12 +285,12 @@ class CustomerService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def search_customers(self, search_term: str) -> Dict[str, Any]:
         """Search customers by name, phone, or email"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             # Build search query
             search_filter = or_(
@@ -264,40 +318,104 @@ class CustomerService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
+    
+    @workload(WORKLOAD_ANALYTICS)
+    def export_customers(self) -> Dict[str, Any]:
+        """Export customers (JSON for now)"""
+        result = self.get_all_customers(page=1, per_page=10000)
+        if not result['success']:
+            return result
+        
+        customers = result['customers']
+        return {
+            'success': True,
+            'customers': customers,
+            'total': len(customers),
+            'format': 'json',
+            'message': 'Export completed. In production, this would return CSV/Excel file.'
+        }
     
-    def get_customer_statistics(self) -> Dict[str, Any]:
-        """Get customer statistics"""
+    def _month_range(self, start_month: Optional[str], end_month: Optional[str]):
+        """Parse 'YYYY-MM' bounds; defaults to the last 12 calendar months"""
+        if end_month:
+            end = datetime.strptime(end_month, '%Y-%m')
+        else:
+            today = datetime.utcnow()
+            end = datetime(today.year, today.month, 1)
+        if start_month:
+            start = datetime.strptime(start_month, '%Y-%m')
+        else:
+            start = datetime(end.year - 1, end.month, 1) if end.month == 12 else datetime(end.year - 1, end.month + 1, 1)
+        
+        months = (end.year - start.year) * 12 + end.month - start.month + 1
+        if months < 1:
+            raise ValueError('start_month must not be after end_month')
+        if months > self.MAX_STATISTICS_MONTHS:
+            raise ValueError(f'Range is limited to {self.MAX_STATISTICS_MONTHS} months')
+        return start, end
+    
+    def get_customer_statistics(self, start_month: str = None, end_month: str = None) -> Dict[str, Any]:
+        """Get customer statistics with monthly growth over a calendar-month range
+        
+        Growth is one GROUP BY date_trunc('month') over the range, joined to a
+        generated month series so empty months report 0. Results are cached
+        until the next customer write.
+        """
+        try:
+            start, end = self._month_range(start_month, end_month)
+        except ValueError as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        
+        version = self._data_version
+        cache_key = (version, start, end)
+        with self._statistics_lock:
+            cached = self._statistics_cache.get(cache_key)
+            if cached is not None:
+                self._statistics_cache.move_to_end(cache_key)
+                return cached
+        
+        db = get_session()
         try:
-            db = next(get_db())
-            
-            # Total customers
-            total_customers = db.query(Customer).count()
-            active_customers = db.query(Customer).filter(Customer.is_active == True).count()
-            
-            # Customers by month (last 12 months)
-            from sqlalchemy import extract, func
-            from datetime import datetime, timedelta
             
-            monthly_stats = []
-            for i in range(12):
-                month_date = datetime.utcnow() - timedelta(days=30*i)
-                month = month_date.month
-                year = month_date.year
-                
-                count = db.query(Customer).filter(
-                    and_(
-                        extract('month', Customer.created_at) == month,
-                        extract('year', Customer.created_at) == year
-                    )
-                ).count()
-                
-                monthly_stats.append({
-                    'month': month_date.strftime('%Y-%m'),
-                    'count': count
-                })
+            # Total and active customers in one pass
+            total_customers, active_customers = db.query(
+                func.count(Customer.id),
+                func.count(Customer.id).filter(Customer.is_active == True)
+            ).one()
+            
+            # Customers by calendar month
+            month_start = cast(start, DateTime(timezone=True))
+            month_end = cast(end, DateTime(timezone=True))
+            one_month = literal_column("interval '1 month'")
+            created_month = func.date_trunc('month', Customer.created_at, type_=DateTime(timezone=True))
+            
+            counts = db.query(
+                created_month.label('month'),
+                func.count(Customer.id).label('count')
+            ).filter(
+                Customer.created_at >= month_start,
+                Customer.created_at < month_end + one_month
+            ).group_by(created_month).subquery()
+            
+            series = func.generate_series(month_start, month_end, one_month).table_valued(
+                column('month', DateTime(timezone=True))
+            ).render_derived()
+            
+            rows = db.query(
+                series.c.month,
+                func.coalesce(counts.c.count, 0)
+            ).outerjoin(counts, counts.c.month == series.c.month).order_by(series.c.month).all()
+            
+            monthly_stats = [
+                {'month': month.strftime('%Y-%m'), 'count': count}
+                for month, count in rows
+            ]
             
-            return {
+            result = {
                 'success': True,
                 'statistics': {
                     'total_customers': total_customers,
@@ -306,6 +424,182 @@ class CustomerService:
                     'monthly_growth': monthly_stats
                 }
             }
+            if version == self._data_version:
+                with self._statistics_lock:
+                    if any(key[0] != version for key in self._statistics_cache):
+                        # Another process wrote customers since these were cached
+                        self._statistics_cache.clear()
+                    self._statistics_cache[cache_key] = result
+                    while len(self._statistics_cache) > self.STATISTICS_CACHE_SIZE:
+                        self._statistics_cache.popitem(last=False)
+            return result
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            close_session(db)
+
+    def _totals_values(self) -> Dict[str, Any]:
+        """Correlated subqueries computing total_bills/total_amount per customer
+        
+        Counts bills linked directly to the customer plus the customer's sales,
+        ignoring cancelled ones, in the hot tables and in the archive. This is
+        the single definition shared by write-time maintenance and
+        reconciliation.
+        """
+        counts, amounts = [], []
+        for bills, sales in ((Bill, Sale), (bills_archive.c, sales_archive.c)):
+            bill_filter = and_(bills.customer_id == Customer.id, bills.status != BillStatus.CANCELLED)
+            sale_filter = and_(sales.customer_id == Customer.id, sales.status != SaleStatus.CANCELLED)
+            
+            counts.append(select(func.count(bills.id)).where(bill_filter).scalar_subquery())
+            amounts.append(select(func.coalesce(func.sum(bills.amount), 0)).where(bill_filter).scalar_subquery())
+            counts.append(select(func.count(sales.id)).where(sale_filter).scalar_subquery())
+            amounts.append(select(func.coalesce(func.sum(sales.total_bill_amount), 0)).where(sale_filter).scalar_subquery())
+        
+        return {
+            'total_bills': sum(counts[1:], counts[0]),
+            'total_amount': sum(amounts[1:], amounts[0])
+        }
+    
+    def refresh_customer_totals(self, db: Session, customer_ids: Iterable[int]) -> None:
+        """Recompute aggregate columns for the given customers in the caller's transaction
+        
+        Call this after changing which customer a bill or sale belongs to, or
+        its amount/cancellation state, before the caller commits.
+        
+        The customer rows are locked (in id order) before the totals are
+        computed. Under READ COMMITTED a transaction that waited for another
+        one's lock then recomputes with a fresh snapshot that includes the
+        other transaction's bills and sales, instead of writing totals from
+        the snapshot it took before waiting. FOR NO KEY UPDATE, the lock the
+        UPDATE takes anyway, so it does not conflict with the key-share locks
+        that inserting a sale or bill for the customer already holds.
+        """
+        ids = {customer_id for customer_id in customer_ids if customer_id}
+        if not ids:
+            return
+        
+        db.flush()
+        db.execute(
+            select(Customer.id).where(Customer.id.in_(ids)).order_by(Customer.id).with_for_update(key_share=True)
+        ).all()
+        db.execute(
+            update(Customer).where(Customer.id.in_(ids)).values(**self._totals_values()),
+            execution_options={'synchronize_session': False}
+        )
+    
+    @nplusone_detector.allow()  # one SELECT per chunk
+    def reconcile_customer_totals(self, fix: bool = True, chunk_size: int = 1000) -> Dict[str, Any]:
+        """Find (and optionally repair) customers whose aggregates have drifted"""
+        db = get_session()
+        try:
+            totals = self._totals_values()
+            
+            drifted = []
+            last_id = 0
+            checked = 0
+            while True:
+                rows = db.execute(
+                    select(
+                        Customer.id, Customer.total_bills, Customer.total_amount,
+                        totals['total_bills'].label('expected_bills'),
+                        totals['total_amount'].label('expected_amount')
+                    ).where(Customer.id > last_id).order_by(Customer.id).limit(chunk_size)
+                ).all()
+                if not rows:
+                    break
+                
+                checked += len(rows)
+                last_id = rows[-1].id
+                chunk_drift = [
+                    row for row in rows
+                    if row.total_bills != row.expected_bills or row.total_amount != row.expected_amount
+                ]
+                drifted.extend({
+                    'id': row.id,
+                    'total_bills': row.total_bills,
+                    'expected_bills': row.expected_bills,
+                    'total_amount': float(row.total_amount or 0),
+                    'expected_amount': float(row.expected_amount or 0)
+                } for row in chunk_drift)
+                
+                if fix and chunk_drift:
+                    self.refresh_customer_totals(db, [row.id for row in chunk_drift])
+                    db.commit()
+            
+            return {
+                'success': True,
+                'checked': checked,
+                'drifted': len(drifted),
+                'fixed': fix,
+                'customers': drifted
+            }
+            
+        except Exception as e:
+            if db:
+                db.rollback()
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            close_session(db)
+
+    @nplusone_detector.allow()  # one SELECT per chunk
+    def find_phone_duplicates(self, chunk_size: int = 5000) -> Dict[str, Any]:
+        """Group existing customers whose phone numbers normalize to the same E.164 value
+        
+        Scans the table in keyset chunks and normalizes the raw phone column,
+        so it also finds rows the phone_normalized backfill had to leave empty.
+        """
+        db = get_session()
+        try:
+            
+            by_phone: Dict[str, List[Dict[str, Any]]] = {}
+            last_id = 0
+            scanned = 0
+            while True:
+                rows = db.execute(
+                    select(
+                        Customer.id, Customer.name, Customer.phone, Customer.phone_normalized,
+                        Customer.is_active, Customer.total_bills
+                    ).where(Customer.id > last_id).order_by(Customer.id).limit(chunk_size)
+                ).all()
+                if not rows:
+                    break
+                
+                scanned += len(rows)
+                last_id = rows[-1].id
+                for row in rows:
+                    normalized = phone_e164(row.phone)
+                    if not normalized:
+                        continue
+                    by_phone.setdefault(normalized, []).append({
+                        'id': row.id,
+                        'name': row.name,
+                        'phone': row.phone,
+                        'phone_normalized': row.phone_normalized,
+                        'is_active': row.is_active,
+                        'total_bills': row.total_bills
+                    })
+            
+            clusters = [
+                {'phone_normalized': phone, 'customers': customers}
+                for phone, customers in by_phone.items()
+                if len(customers) > 1
+            ]
+            clusters.sort(key=lambda cluster: cluster['customers'][0]['id'])
+            
+            return {
+                'success': True,
+                'scanned': scanned,
+                'clusters': clusters,
+                'count': len(clusters)
+            }
             
         except Exception as e:
             return {
@@ -313,7 +607,7 @@ class CustomerService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
 
 # Create global instance
 customer_service = CustomerService()
@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_, desc
 from models.customer_transaction import CustomerTransaction, TransactionType, TransactionStatus
 from models.sale import Sale
-from config.database import get_db
+from config.database import get_session, close_session
 from datetime import datetime
 import json
 
@@ -18,13 +18,22 @@ class CustomerTransactionService:
                           bank_name: str = None,
                           bank_account: str = None,
                           reference_number: str = None,
-                          notes: str = None) -> Dict[str, Any]:
-        """Create a new customer transaction"""
+                          notes: str = None,
+                          db: Session = None) -> Dict[str, Any]:
+        """Create a new customer transaction
+        
+        When ``db`` is given the transaction is only added and flushed into
+        that session; committing (or rolling back) is left to the caller, so a
+        status change and its transaction record land in a single commit.
+        """
+        owns_session = db is None
         try:
-            db = next(get_db())
+            if owns_session:
+                db = get_session()
             
-            # Validate sale exists
-            sale = db.query(Sale).filter(Sale.id == sale_id).first()
+            # Validate sale exists (served from the identity map when the
+            # caller has already loaded it)
+            sale = db.get(Sale, sale_id)
             if not sale:
                 return {
                     'success': False,
@@ -45,8 +54,11 @@ class CustomerTransactionService:
             )
             
             db.add(transaction)
-            db.commit()
-            db.refresh(transaction)
+            if owns_session:
+                db.commit()
+                db.refresh(transaction)
+            else:
+                db.flush()
             
             return {
                 'success': True,
@@ -54,18 +66,20 @@ class CustomerTransactionService:
             }
             
         except Exception as e:
-            db.rollback()
+            if owns_session and db:
+                db.rollback()
             return {
                 'success': False,
                 'error': str(e)
             }
         finally:
-            db.close()
+            if owns_session:
+                close_session(db)
     
     def get_transactions_by_sale(self, sale_id: int) -> Dict[str, Any]:
         """Get all transactions for a specific sale"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             transactions = db.query(CustomerTransaction).filter(
                 CustomerTransaction.sale_id == sale_id
@@ -85,15 +99,15 @@ class CustomerTransactionService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def update_transaction_status(self, 
                                 transaction_id: int,
                                 status: str,
                                 admin_notes: str = None) -> Dict[str, Any]:
         """Update transaction status"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             transaction = db.query(CustomerTransaction).filter(
                 CustomerTransaction.id == transaction_id
@@ -129,12 +143,12 @@ class CustomerTransactionService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def get_transaction_summary(self, sale_id: int) -> Dict[str, Any]:
         """Get transaction summary for a sale"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             # Get all transactions for the sale
             transactions = db.query(CustomerTransaction).filter(
@@ -177,14 +191,15 @@ class CustomerTransactionService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def create_payment_received_transaction(self, 
                                           sale_id: int,
                                           amount: float,
                                           payment_method: str,
                                           reference_number: str = None,
-                                          notes: str = None) -> Dict[str, Any]:
+                                          notes: str = None,
+                                          db: Session = None) -> Dict[str, Any]:
         """Create transaction when customer pays"""
         return self.create_transaction(
             sale_id=sale_id,
@@ -192,7 +207,8 @@ class CustomerTransactionService:
             amount=amount,
             payment_method=payment_method,
             reference_number=reference_number,
-            notes=notes
+            notes=notes,
+            db=db
         )
     
     def create_payment_sent_transaction(self, 
@@ -202,7 +218,8 @@ class CustomerTransactionService:
                                        bank_name: str = None,
                                        bank_account: str = None,
                                        reference_number: str = None,
-                                       notes: str = None) -> Dict[str, Any]:
+                                       notes: str = None,
+                                       db: Session = None) -> Dict[str, Any]:
         """Create transaction when sending money to customer"""
         return self.create_transaction(
             sale_id=sale_id,
@@ -212,7 +229,8 @@ class CustomerTransactionService:
             bank_name=bank_name,
             bank_account=bank_account,
             reference_number=reference_number,
-            notes=notes
+            notes=notes,
+            db=db
         )
 
 # Create global instance
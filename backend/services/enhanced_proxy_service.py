@@ -2,7 +2,7 @@ from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, func, desc, or_
 from models.proxy import Proxy, ProxyStatus, ProxyType
-from config.database import get_db
+from config.database import get_session, close_session
 from datetime import datetime, timedelta
 import json
 import random
@@ -13,8 +13,8 @@ class EnhancedProxyService:
     
     def bulk_add_proxies(self, proxy_list: List[Dict[str, Any]], user_id: int) -> Dict[str, Any]:
         """Add multiple proxies in bulk"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             if len(proxy_list) > 100:  # Limit bulk operations
                 return {
@@ -105,12 +105,12 @@ class EnhancedProxyService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def bulk_test_proxies(self, proxy_ids: List[int] = None, test_all: bool = False) -> Dict[str, Any]:
         """Test multiple proxies in bulk"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             # Get proxies to test
             if test_all:
@@ -183,7 +183,7 @@ class EnhancedProxyService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def _test_single_proxy(self, proxy: Proxy) -> Dict[str, Any]:
         """Test a single proxy"""
@@ -252,8 +252,8 @@ class EnhancedProxyService:
     
     def rotate_proxies(self, rotation_type: str = 'round_robin', max_concurrent: int = 5) -> Dict[str, Any]:
         """Rotate proxies for load balancing"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             # Get active proxies
             active_proxies = db.query(Proxy).filter(
@@ -322,12 +322,12 @@ class EnhancedProxyService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def get_proxy_statistics(self) -> Dict[str, Any]:
         """Get comprehensive proxy statistics"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             # Total proxies
             total_proxies = db.query(Proxy).count()
@@ -405,12 +405,12 @@ class EnhancedProxyService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def cleanup_inactive_proxies(self, days_inactive: int = 30) -> Dict[str, Any]:
         """Clean up proxies that have been inactive for specified days"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             cutoff_date = datetime.utcnow() - timedelta(days=days_inactive)
             
@@ -451,12 +451,12 @@ class EnhancedProxyService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def export_proxy_list(self, format: str = 'json', include_inactive: bool = False) -> Dict[str, Any]:
         """Export proxy list"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             # Build query
             query = db.query(Proxy)
@@ -501,7 +501,7 @@ class EnhancedProxyService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
 
 # Create global instance
 enhanced_proxy_service = EnhancedProxyService()
@@ -0,0 +1,113 @@
+"""Job kinds run by the background job queue (see services.job_service)
+
+Each handler takes a ``JobContext`` and returns a service result dict,
+which is stored as the job's result. Importing this module registers them.
+"""
+
+from services.job_service import job_service
+from services.archive_service import archive_service
+from services.bill_service import bill_service
+from services.bill_import_service import bill_import_service
+from services.bill_link_service import bill_link_service
+from services.customer_service import customer_service
+from services.customer_dedup_service import customer_dedup_service
+from services.reports_service import reports_service
+from services.sales_service import sales_service
+from utils.shared_state import shared_state
+from utils import idempotency
+
+@job_service.handler('export_bills')
+def export_bills(context):
+    """Warehouse bill export; payload: format"""
+    context.progress(0, 1, 'Exporting warehouse bills')
+    result = bill_service.export_warehouse_bills(context.payload.get('format', 'json'))
+    context.progress(1, 1)
+    return result
+
+@job_service.handler('export_sales')
+def export_sales(context):
+    """Sales export; payload: format, start_date, end_date"""
+    payload = context.payload
+    context.progress(0, 1, 'Exporting sales')
+    result = sales_service.export_sales(payload.get('format', 'json'), payload.get('start_date'), payload.get('end_date'))
+    context.progress(1, 1)
+    return result
+
+@job_service.handler('export_customers')
+def export_customers(context):
+    """Customer export"""
+    context.progress(0, 1, 'Exporting customers')
+    result = customer_service.export_customers()
+    context.progress(1, 1)
+    return result
+
+@job_service.handler('report')
+def report(context):
+    """Report generation; payload: type, format, start_date, end_date"""
+    payload = context.payload
+    report_type = payload.get('type', 'comprehensive')
+    context.progress(0, 1, f'Generating {report_type} report')
+    result = reports_service.export_report(
+        report_type, payload.get('format', 'json'), payload.get('start_date'), payload.get('end_date')
+    )
+    context.progress(1, 1)
+    return result
+
+@job_service.handler('import_bills', max_attempts=1)
+def import_bills(context):
+    """Warehouse bill import from an uploaded CSV/XLSX; payload: upload, update_existing"""
+    payload = context.payload
+    return bill_import_service.import_file(
+        payload.get('upload'), context.user_id, context.job_id,
+        update_existing=bool(payload.get('update_existing', False)),
+        progress=context.progress
+    )
+
+@job_service.handler('expire_bills', admin_only=True)
+def expire_bills(context):
+    """Mark overdue warehouse bills EXPIRED; payload: chunk_size"""
+    return bill_service.expire_overdue_bills(
+        chunk_size=context.payload.get('chunk_size', 5000), progress=context.progress
+    )
+
+@job_service.handler('archive', admin_only=True)
+def archive(context):
+    """Move finished sales and bills to the archive tables; payload: older_than_days, chunk_size"""
+    return archive_service.archive(
+        older_than_days=context.payload.get('older_than_days'),
+        chunk_size=context.payload.get('chunk_size', 1000),
+        progress=context.progress
+    )
+
+@job_service.handler('link_bills', admin_only=True)
+def link_bills(context):
+    """Bill-to-customer auto-linking; payload: full"""
+    context.progress(0, 1, 'Linking bills to customers')
+    result = bill_link_service.link_bills(full=bool(context.payload.get('full', False)))
+    context.progress(1, 1)
+    return result
+
+@job_service.handler('dedup_customers', max_attempts=1, admin_only=True)
+def dedup_customers(context):
+    """Duplicate customer report, optionally merged; payload: threshold, merge"""
+    context.progress(0, 2, 'Finding duplicate customers')
+    report = customer_dedup_service.find_duplicates(threshold=float(context.payload.get('threshold', 0.6)))
+    if not report['success'] or not context.payload.get('merge'):
+        return report
+
+    context.progress(1, 2, f"Merging {len(report['clusters'])} clusters")
+    merged = customer_dedup_service.merge_clusters(report['clusters'])
+    context.progress(2, 2)
+    return {**merged, 'report': report}
+
+@job_service.handler('purge_expired', admin_only=True)
+def purge_expired(context):
+    """Delete expired shared state, stored idempotent responses, old finished jobs and import files"""
+    backend = shared_state.backend
+    return {
+        'success': True,
+        'state_keys_purged': backend.purge_expired() if hasattr(backend, 'purge_expired') else 0,
+        'idempotency_keys_purged': idempotency.purge_expired(),
+        'jobs_purged': job_service.purge_finished(),
+        'import_files_purged': bill_import_service.purge_files(job_service.KEEP_FINISHED_DAYS)
+    }
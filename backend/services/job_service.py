@@ -0,0 +1,496 @@
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import and_, case, delete, desc, func, literal, select, update
+from config.database import engine
+from models.job import Job, JobStatus
+from utils.json_provider import encode_value
+from utils.shared_state import shared_state
+from utils.nplusone import nplusone_detector
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job was cancelled"""
+
+class JobContext:
+    """What a job handler gets: its payload and a way to report progress"""
+
+    # Minimum seconds between progress writes (the final one always goes out)
+    PROGRESS_INTERVAL = 0.5
+
+    def __init__(self, service: 'JobService', job: Dict[str, Any], worker_id: str):
+        self.service = service
+        self.job_id = job['id']
+        self.kind = job['kind']
+        self.payload = job['payload'] or {}
+        self.user_id = job['created_by']
+        self.attempt = job['attempts']
+        self.worker_id = worker_id
+        self._reported_at = 0.0
+
+    def progress(self, done: int, total: Optional[int] = None, message: Optional[str] = None) -> None:
+        """Record progress, emit it over SocketIO and stop if the job was cancelled"""
+        now = time.monotonic()
+        if now - self._reported_at < self.PROGRESS_INTERVAL and (total is None or done < total):
+            return
+        self._reported_at = now
+        if self.service.report_progress(self.job_id, self.worker_id, done, total, message):
+            raise JobCancelled()
+
+class JobService:
+    """Durable background job queue in the ``jobs`` table
+
+    Any API process (or ``run_job_worker.py``) runs a few worker threads
+    that claim the oldest due PENDING job with ``FOR UPDATE SKIP LOCKED``,
+    so workers never block each other or run a job twice. Failed jobs are
+    retried with exponential backoff; a job whose worker stopped reporting
+    for ``STALE_AFTER_SECONDS`` is put back in the queue. While a handler
+    runs, a side thread refreshes its heartbeat every ``HEARTBEAT_SECONDS``,
+    so one long blocking call (an export query, a report) does not look
+    like a dead worker. Status changes and
+    progress are emitted as ``job_update`` SocketIO events.
+
+    Bookkeeping uses short transactions of its own on the engine, never the
+    handler's session, so reporting progress cannot commit a handler's
+    half-done work.
+    """
+
+    RETRY_BASE_SECONDS = 30
+    STALE_AFTER_SECONDS = 600
+    HEARTBEAT_SECONDS = 60
+    # Finished jobs (and their results) are deleted after this many days
+    KEEP_FINISHED_DAYS = 14
+
+    def __init__(self):
+        self._handlers: Dict[str, Dict[str, Any]] = {}
+        self._schedules: Dict[str, Dict[str, Any]] = {}
+        self._emit: Optional[Callable] = None
+
+    def init_app(self, app, socketio=None) -> None:
+        """Emit job updates through ``socketio`` and register ``JOB_SCHEDULES``"""
+        app.config.setdefault('JOB_WORKER_THREADS', 2)
+        app.config.setdefault('JOB_POLL_SECONDS', 1.0)
+        for kind, every_seconds in app.config.get('JOB_SCHEDULES', {}).items():
+            if every_seconds:
+                self.schedule(kind, every_seconds)
+        if socketio is not None:
+            self._emit = socketio.emit
+
+    # Registry
+
+    def handler(self, kind: str, max_attempts: int = 3, admin_only: bool = False):
+        """Register ``func(context) -> dict`` as the handler of ``kind`` jobs
+
+        Handlers return the usual ``{'success': ..., ...}`` service dict; a
+        result with ``success`` false fails the attempt like an exception.
+        """
+        def decorator(func):
+            self._handlers[kind] = {'func': func, 'max_attempts': max_attempts, 'admin_only': admin_only}
+            return func
+        return decorator
+
+    def schedule(self, kind: str, every_seconds: int, payload: Dict[str, Any] = None) -> None:
+        """Enqueue a ``kind`` job every ``every_seconds`` (once across all processes)"""
+        self._schedules[kind] = {'every': every_seconds, 'payload': payload or {}}
+
+    def kinds(self, admin: bool = False) -> List[str]:
+        return sorted(kind for kind, spec in self._handlers.items() if admin or not spec['admin_only'])
+
+    # API
+
+    def enqueue(self, kind: str, payload: Dict[str, Any] = None, user_id: int = None,
+                delay_seconds: float = 0, admin: bool = True) -> Dict[str, Any]:
+        """Queue a job of a registered ``kind``"""
+        spec = self._handlers.get(kind)
+        if spec is None:
+            return {
+                'success': False,
+                'error': f'Unknown job kind. Must be one of: {", ".join(self.kinds(admin))}'
+            }
+        if spec['admin_only'] and not admin:
+            return {
+                'success': False,
+                'error': 'Admin access required for this job kind'
+            }
+        try:
+            with engine.begin() as conn:
+                row = conn.execute(
+                    Job.__table__.insert().values(
+                        kind=kind,
+                        status=JobStatus.PENDING,
+                        payload=self._dumps(payload or {}),
+                        progress=0,
+                        attempts=0,
+                        max_attempts=spec['max_attempts'],
+                        cancel_requested=False,
+                        run_at=self._now() + timedelta(seconds=delay_seconds),
+                        created_by=user_id
+                    ).returning(*self._columns())
+                ).one()
+            job = self._row_dict(row)
+            self._publish(job)
+            return {
+                'success': True,
+                'job': job,
+                'message': 'Job queued successfully'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def get_job(self, job_id: int, user_id: int = None) -> Dict[str, Any]:
+        """Get one job; ``user_id`` restricts it to that user's jobs"""
+        try:
+            with engine.connect() as conn:
+                row = conn.execute(
+                    select(*self._columns()).where(Job.id == job_id, *self._owner(user_id))
+                ).first()
+            if row is None:
+                return {
+                    'success': False,
+                    'error': 'Job not found'
+                }
+            return {
+                'success': True,
+                'job': self._row_dict(row)
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def get_job_result(self, job_id: int, user_id: int = None) -> Dict[str, Any]:
+        """The stored JSON result text of a finished job"""
+        try:
+            with engine.connect() as conn:
+                row = conn.execute(
+                    select(Job.status, Job.result).where(Job.id == job_id, *self._owner(user_id))
+                ).first()
+            if row is None:
+                return {
+                    'success': False,
+                    'error': 'Job not found'
+                }
+            if row.result is None:
+                return {
+                    'success': False,
+                    'error': f'Job has no result (status {row.status.value})'
+                }
+            return {
+                'success': True,
+                'result': row.result
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def get_jobs(self, user_id: int = None, status: str = None, kind: str = None,
+                 limit: int = 50) -> Dict[str, Any]:
+        """Most recent jobs, newest first"""
+        try:
+            conditions = list(self._owner(user_id))
+            if status:
+                conditions.append(Job.status == JobStatus(status))
+            if kind:
+                conditions.append(Job.kind == kind)
+            with engine.connect() as conn:
+                rows = conn.execute(
+                    select(*self._columns()).where(*conditions).order_by(desc(Job.id)).limit(limit)
+                ).all()
+            return {
+                'success': True,
+                'jobs': [self._row_dict(row) for row in rows]
+            }
+        except ValueError:
+            return {
+                'success': False,
+                'error': f'Invalid status. Must be one of: {", ".join(s.value for s in JobStatus)}'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def cancel_job(self, job_id: int, user_id: int = None) -> Dict[str, Any]:
+        """Cancel a pending job now, or ask a running one to stop at its next progress report"""
+        try:
+            with engine.begin() as conn:
+                row = conn.execute(
+                    update(Job).where(
+                        Job.id == job_id, Job.status.in_([JobStatus.PENDING, JobStatus.RUNNING]), *self._owner(user_id)
+                    ).values(
+                        status=self._case_pending(literal(JobStatus.CANCELLED, Job.status.type), Job.status),
+                        finished_at=self._case_pending(func.now(), Job.finished_at),
+                        cancel_requested=True
+                    ).returning(*self._columns())
+                ).first()
+            if row is None:
+                return {
+                    'success': False,
+                    'error': 'Job not found or already finished'
+                }
+            job = self._row_dict(row)
+            self._publish(job)
+            return {
+                'success': True,
+                'job': job,
+                'message': 'Job cancelled' if job['status'] == JobStatus.CANCELLED else 'Cancellation requested'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    # Worker side
+
+    def claim_next(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Lock the oldest due PENDING job for ``worker_id`` and mark it RUNNING"""
+        next_id = select(Job.id).where(
+            Job.status == JobStatus.PENDING, Job.run_at <= self._now()
+        ).order_by(Job.run_at, Job.id).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+
+        with engine.begin() as conn:
+            row = conn.execute(
+                update(Job).where(Job.id == next_id, Job.status == JobStatus.PENDING).values(
+                    status=JobStatus.RUNNING,
+                    attempts=Job.attempts + 1,
+                    locked_by=worker_id,
+                    heartbeat_at=func.now(),
+                    started_at=func.now(),
+                    error=None
+                ).returning(*self._columns())
+            ).first()
+        if row is None:
+            return None
+        job = self._row_dict(row)
+        self._publish(job)
+        return job
+
+    @nplusone_detector.allow()  # handlers are batch work, not requests
+    def run_job(self, job: Dict[str, Any], worker_id: str) -> None:
+        """Run a claimed job's handler and record the outcome"""
+        spec = self._handlers.get(job['kind'])
+        try:
+            if spec is None:
+                raise RuntimeError(f"No handler registered for job kind '{job['kind']}'")
+            with self._heartbeat(job['id'], worker_id):
+                result = spec['func'](JobContext(self, job, worker_id))
+            if isinstance(result, dict) and result.get('success') is False:
+                raise RuntimeError(result.get('error') or 'Job handler reported failure')
+        except JobCancelled:
+            self._finish(job, worker_id, JobStatus.CANCELLED)
+        except Exception as e:
+            retry = job['attempts'] < job['max_attempts']
+            self._finish(
+                job, worker_id,
+                JobStatus.PENDING if retry else JobStatus.FAILED,
+                error=f'{e}\n{traceback.format_exc(limit=5)}' if not retry else str(e),
+                retry_in=self.RETRY_BASE_SECONDS * 2 ** (job['attempts'] - 1) if retry else None
+            )
+        else:
+            self._finish(job, worker_id, JobStatus.SUCCEEDED, result=result)
+
+    @contextmanager
+    def _heartbeat(self, job_id: int, worker_id: str):
+        """Refresh the job's heartbeat from a side thread while the block runs"""
+        stopped = threading.Event()
+
+        def beat():
+            while not stopped.wait(self.HEARTBEAT_SECONDS):
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(
+                            update(Job).where(
+                                Job.id == job_id, Job.locked_by == worker_id, Job.status == JobStatus.RUNNING
+                            ).values(heartbeat_at=func.now())
+                        )
+                except Exception as e:
+                    print(f"Warning: Failed to refresh heartbeat of job {job_id}: {e}")
+
+        thread = threading.Thread(target=beat, daemon=True, name=f'job-heartbeat-{job_id}')
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def report_progress(self, job_id: int, worker_id: str, done: int, total: Optional[int],
+                        message: Optional[str]) -> bool:
+        """Store progress and heartbeat; True when the job should stop (cancelled or lost)"""
+        values = {'progress': done, 'heartbeat_at': func.now()}
+        if total is not None:
+            values['total'] = total
+        if message is not None:
+            values['message'] = message[:255]
+        with engine.begin() as conn:
+            row = conn.execute(
+                update(Job).where(Job.id == job_id, Job.locked_by == worker_id, Job.status == JobStatus.RUNNING)
+                .values(**values).returning(*self._columns())
+            ).first()
+        if row is None:
+            # Requeued as stale and picked up elsewhere, or deleted
+            return True
+        job = self._row_dict(row)
+        self._publish(job)
+        return job['cancel_requested']
+
+    def _finish(self, job: Dict[str, Any], worker_id: str, status: JobStatus,
+                result: Any = None, error: str = None, retry_in: float = None) -> None:
+        values = {'status': status, 'locked_by': None, 'error': error}
+        if status == JobStatus.PENDING:
+            values['run_at'] = self._now() + timedelta(seconds=retry_in)
+        else:
+            values['finished_at'] = func.now()
+        if result is not None:
+            values['result'] = self._dumps(result)
+        with engine.begin() as conn:
+            row = conn.execute(
+                update(Job).where(Job.id == job['id'], Job.locked_by == worker_id)
+                .values(**values).returning(*self._columns())
+            ).first()
+        if row is not None:
+            self._publish(self._row_dict(row))
+
+    def requeue_stale(self) -> int:
+        """Put RUNNING jobs whose worker went silent back in the queue (or fail them)"""
+        silent_since = self._now() - timedelta(seconds=self.STALE_AFTER_SECONDS)
+        stale = and_(Job.status == JobStatus.RUNNING, Job.heartbeat_at < silent_since)
+        with engine.begin() as conn:
+            requeued = conn.execute(
+                update(Job).where(stale, Job.attempts < Job.max_attempts)
+                .values(status=JobStatus.PENDING, locked_by=None, run_at=func.now(), error='Worker stopped responding')
+            ).rowcount
+            failed = conn.execute(
+                update(Job).where(stale, Job.attempts >= Job.max_attempts)
+                .values(status=JobStatus.FAILED, locked_by=None, finished_at=func.now(), error='Worker stopped responding')
+            ).rowcount
+        return requeued + failed
+
+    def purge_finished(self, older_than_days: int = None) -> int:
+        """Delete finished jobs older than ``older_than_days``"""
+        cutoff = self._now() - timedelta(days=older_than_days or self.KEEP_FINISHED_DAYS)
+        with engine.begin() as conn:
+            return conn.execute(
+                delete(Job).where(
+                    Job.status.in_([JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED]),
+                    Job.finished_at < cutoff
+                )
+            ).rowcount
+
+    def enqueue_scheduled(self) -> List[str]:
+        """Enqueue scheduled kinds whose interval has passed; a shared-state lock makes it once per interval"""
+        enqueued = []
+        for kind, spec in self._schedules.items():
+            if shared_state.add(f'job_schedule:{kind}', self._now().isoformat(), ttl=spec['every']):
+                if self.enqueue(kind, spec['payload'])['success']:
+                    enqueued.append(kind)
+        return enqueued
+
+    # Helpers
+
+    @staticmethod
+    def _now():
+        return datetime.now(timezone.utc)
+
+    @staticmethod
+    def _dumps(value: Any) -> str:
+        return json.dumps(value, default=encode_value, ensure_ascii=False, separators=(',', ':'))
+
+    @staticmethod
+    def _columns():
+        return [Job.__table__.c[name] for name in Job.DICT_COLUMNS] + [Job.payload, Job.locked_by]
+
+    @staticmethod
+    def _row_dict(row) -> Dict[str, Any]:
+        data = row._asdict()
+        data['payload'] = json.loads(data['payload']) if data['payload'] else None
+        return data
+
+    @staticmethod
+    def _owner(user_id):
+        return (Job.created_by == user_id,) if user_id is not None else ()
+
+    @staticmethod
+    def _case_pending(when_pending, otherwise):
+        return case((Job.status == JobStatus.PENDING, when_pending), else_=otherwise)
+
+    def _publish(self, job: Dict[str, Any]) -> None:
+        if self._emit is None:
+            return
+        event = {key: job[key] for key in ('id', 'kind', 'status', 'progress', 'total', 'message',
+                                           'attempts', 'created_by', 'cancel_requested')}
+        event['status'] = job['status'].value
+        try:
+            self._emit('job_update', event)
+        except Exception as e:
+            print(f"Warning: Failed to emit job update: {e}")
+
+class JobWorker:
+    """Threads that claim and run queued jobs until stopped"""
+
+    # Seconds between stale-job recovery and schedule checks
+    MAINTENANCE_INTERVAL = 60
+
+    def __init__(self, service: JobService):
+        self.service = service
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._maintained_at = 0.0
+        self._lock = threading.Lock()
+
+    def start(self, threads: int = 2, poll_seconds: float = 1.0) -> None:
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        for number in range(threads):
+            thread = threading.Thread(
+                target=self._run, args=(f'{prefix}:{number}', poll_seconds), daemon=True, name=f'job-worker-{number}'
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = None) -> None:
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _maintain(self) -> None:
+        with self._lock:
+            if time.monotonic() - self._maintained_at < self.MAINTENANCE_INTERVAL:
+                return
+            self._maintained_at = time.monotonic()
+        self.service.requeue_stale()
+        self.service.enqueue_scheduled()
+
+    def _run(self, worker_id: str, poll_seconds: float) -> None:
+        while not self._stopping.is_set():
+            try:
+                self._maintain()
+                job = self.service.claim_next(worker_id)
+            except Exception as e:
+                print(f"Warning: Job queue unavailable: {e}")
+                job = None
+            if job is None:
+                self._stopping.wait(poll_seconds)
+                continue
+            try:
+                self.service.run_job(job, worker_id)
+            except Exception as e:
+                # E.g. the outcome could not be stored; requeue_stale picks the job up again
+                print(f"Warning: Job {job['id']} could not be finished: {e}")
+
+# Create global instances
+job_service = JobService()
+job_worker = JobWorker(job_service)
@@ -5,17 +5,24 @@ from models.sale import Sale, SaleStatus
 from models.customer import Customer
 from models.bill import Bill, BillStatus
 from models.user import User
-from config.database import get_db
+from config.database import get_session, close_session, workload, WORKLOAD_ANALYTICS
+from services.archive_service import archive_service
 from datetime import datetime, timedelta
+from collections import defaultdict
 import json
 
+@workload(WORKLOAD_ANALYTICS)
 class ReportsService:
-    """Service for reports and analytics operations"""
+    """Service for reports and analytics operations
+    
+    Runs on the analytics engine (its own pool, longer statement timeout,
+    optionally a read replica) so report scans never compete with sales.
+    """
     
     def get_dashboard_summary(self) -> Dict[str, Any]:
         """Get dashboard summary statistics"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             # Get current date info
             now = datetime.utcnow()
@@ -23,25 +30,32 @@ class ReportsService:
             month_start = now.replace(day=1).date()
             year_start = now.replace(month=1, day=1).date()
             
+            # Periods reaching back past the archive horizon read the archive too
+            def sales_since(day):
+                return archive_service.sales(datetime.combine(day, datetime.min.time()))
+            
             # Today's statistics
-            today_sales = db.query(Sale).filter(
-                func.date(Sale.created_at) == today
+            sales = sales_since(today)
+            today_sales = db.query(sales).filter(
+                func.date(sales.created_at) == today
             ).all()
             
             today_revenue = sum(sale.profit_amount for sale in today_sales)
             today_count = len(today_sales)
             
             # This month's statistics
-            month_sales = db.query(Sale).filter(
-                func.date(Sale.created_at) >= month_start
+            sales = sales_since(month_start)
+            month_sales = db.query(sales).filter(
+                func.date(sales.created_at) >= month_start
             ).all()
             
             month_revenue = sum(sale.profit_amount for sale in month_sales)
             month_count = len(month_sales)
             
             # This year's statistics
-            year_sales = db.query(Sale).filter(
-                func.date(Sale.created_at) >= year_start
+            sales = sales_since(year_start)
+            year_sales = db.query(sales).filter(
+                func.date(sales.created_at) >= year_start
             ).all()
             
             year_revenue = sum(sale.profit_amount for sale in year_sales)
@@ -61,9 +75,10 @@ class ReportsService:
             
             # Recent activity (last 7 days)
             week_ago = now - timedelta(days=7)
-            recent_sales = db.query(Sale).filter(
-                Sale.created_at >= week_ago
-            ).count()
+            sales = archive_service.sales(week_ago)
+            recent_sales = db.query(func.count(sales.id)).filter(
+                sales.created_at >= week_ago
+            ).scalar()
             
             return {
                 'success': True,
@@ -102,24 +117,26 @@ class ReportsService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def get_sales_analytics(self, start_date: str = None, end_date: str = None) -> Dict[str, Any]:
         """Get detailed sales analytics"""
+        db = get_session()
         try:
-            db = next(get_db())
             
-            # Build base query
-            query = db.query(Sale)
+            start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00')) if start_date else None
+            
+            # Build base query over the hot table, plus the archive when the range needs it
+            sales = archive_service.sales(start_dt)
+            query = db.query(sales)
             
             # Apply date filter
-            if start_date:
-                start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                query = query.filter(Sale.created_at >= start_dt)
+            if start_dt:
+                query = query.filter(sales.created_at >= start_dt)
             
             if end_date:
                 end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                query = query.filter(Sale.created_at <= end_dt)
+                query = query.filter(sales.created_at <= end_dt)
             
             # Get all sales in period
             sales = query.all()
@@ -227,24 +244,26 @@ class ReportsService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def get_customer_analytics(self, start_date: str = None, end_date: str = None) -> Dict[str, Any]:
         """Get customer analytics and insights"""
+        db = get_session()
         try:
-            db = next(get_db())
             
-            # Build base query for sales
-            sales_query = db.query(Sale)
+            start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00')) if start_date else None
+            
+            # Build base query for sales, over the archive too when the range needs it
+            period_sales = archive_service.sales(start_dt)
+            sales_query = db.query(period_sales)
             
             # Apply date filter
-            if start_date:
-                start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                sales_query = sales_query.filter(Sale.created_at >= start_dt)
+            if start_dt:
+                sales_query = sales_query.filter(period_sales.created_at >= start_dt)
             
             if end_date:
                 end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                sales_query = sales_query.filter(Sale.created_at <= end_dt)
+                sales_query = sales_query.filter(period_sales.created_at <= end_dt)
             
             # Get sales in period
             sales = sales_query.all()
@@ -252,6 +271,11 @@ class ReportsService:
             # Get all customers
             customers = db.query(Customer).filter(Customer.is_active == True).all()
             
+            # Lifetime sales per customer, archived ones included
+            customer_sales = defaultdict(list)
+            for sale in db.query(archive_service.sales()).all():
+                customer_sales[sale.customer_id].append(sale)
+            
             if not customers:
                 return {
                     'success': True,
@@ -269,12 +293,12 @@ class ReportsService:
             
             # Basic customer statistics
             total_customers = len(customers)
-            active_customers = len([c for c in customers if c.sales])
+            active_customers = len([c for c in customers if customer_sales[c.id]])
             new_customers = len([c for c in customers if c.created_at and (now - c.created_at).days <= 30])
             
             # Customer retention (customers with multiple sales)
-            customers_with_sales = [c for c in customers if c.sales]
-            repeat_customers = len([c for c in customers_with_sales if len(c.sales) > 1])
+            customers_with_sales = [c for c in customers if customer_sales[c.id]]
+            repeat_customers = len([c for c in customers_with_sales if len(customer_sales[c.id]) > 1])
             customer_retention = (repeat_customers / len(customers_with_sales)) * 100 if customers_with_sales else 0
             
             # Average customer value
@@ -290,7 +314,7 @@ class ReportsService:
             }
             
             for customer in customers:
-                customer_revenue = sum(sale.profit_amount for sale in customer.sales)
+                customer_revenue = sum(sale.profit_amount for sale in customer_sales[customer.id])
                 if customer_revenue > 1000000:
                     customer_segments['High Value (>1M)'] += 1
                 elif customer_revenue > 500000:
@@ -310,8 +334,8 @@ class ReportsService:
             # Top performing customers
             customer_performance = []
             for customer in customers:
-                total_revenue = sum(sale.profit_amount for sale in customer.sales)
-                sales_count = len(customer.sales)
+                total_revenue = sum(sale.profit_amount for sale in customer_sales[customer.id])
+                sales_count = len(customer_sales[customer.id])
                 if total_revenue > 0:
                     customer_performance.append({
                         'id': customer.id,
@@ -319,7 +343,7 @@ class ReportsService:
                         'total_revenue': float(total_revenue),
                         'sales_count': sales_count,
                         'average_sale_value': float(total_revenue / sales_count) if sales_count > 0 else 0,
-                        'last_sale_date': max(sale.created_at for sale in customer.sales).isoformat() if customer.sales else None
+                        'last_sale_date': max(sale.created_at for sale in customer_sales[customer.id]).isoformat() if customer_sales[customer.id] else None
                     })
             
             # Sort by revenue
@@ -349,12 +373,12 @@ class ReportsService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def get_warehouse_analytics(self) -> Dict[str, Any]:
         """Get warehouse analytics"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             # Get warehouse bills
             warehouse_bills = db.query(Bill).filter(
@@ -413,13 +437,14 @@ class ReportsService:
             week_ago = now - timedelta(days=7)
             recent_additions = len([b for b in warehouse_bills if b.added_to_warehouse_at and b.added_to_warehouse_at >= week_ago])
             
-            # Warehouse efficiency (bills sold vs total added)
-            total_bills_added = db.query(Bill).count()
-            total_bills_sold = db.query(Bill).filter(Bill.status.in_([
+            # Warehouse efficiency (bills sold vs total added, archived ones included)
+            bills = archive_service.bills()
+            total_bills_added = db.query(func.count(bills.id)).scalar()
+            total_bills_sold = db.query(func.count(bills.id)).filter(bills.status.in_([
                 BillStatus.PENDING_PAYMENT, 
                 BillStatus.PAID, 
                 BillStatus.COMPLETED
-            ])).count()
+            ])).scalar()
             warehouse_efficiency = (total_bills_sold / total_bills_added) * 100 if total_bills_added > 0 else 0
             
             return {
@@ -441,7 +466,23 @@ class ReportsService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
+    
+    def export_report(self, report_type: str = 'comprehensive', format: str = 'json',
+                      start_date: str = None, end_date: str = None) -> Dict[str, Any]:
+        """Export one report type (comprehensive, sales, customers or warehouse)"""
+        if report_type == 'comprehensive':
+            return self.export_comprehensive_report(format, start_date, end_date)
+        elif report_type == 'sales':
+            return self.get_sales_analytics(start_date, end_date)
+        elif report_type == 'customers':
+            return self.get_customer_analytics(start_date, end_date)
+        elif report_type == 'warehouse':
+            return self.get_warehouse_analytics()
+        return {
+            'success': False,
+            'error': f'Unknown report type: {report_type}'
+        }
     
     def export_comprehensive_report(self, format: str = 'json', start_date: str = None, end_date: str = None) -> Dict[str, Any]:
         """Export comprehensive report with all analytics"""
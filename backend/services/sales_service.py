@@ -1,22 +1,104 @@
 from typing import List, Dict, Any, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, func, desc
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import DateTime, and_, func, desc, insert, select
 from models.sale import Sale, SaleStatus, PaymentMethod
 from models.bill import Bill, BillStatus
 from models.customer import Customer
 from models.user import User
-# from models.customer_transaction import TransactionType  # Model doesn't exist
-from config.database import get_db
+from models.customer_transaction import CustomerTransaction, TransactionType, TransactionStatus
+from config.database import get_session, close_session, workload, WORKLOAD_ANALYTICS
+from services.customer_service import customer_service
+from services.archive_service import archive_service
+from models.archive import sales_archive
+from collections import defaultdict
 from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+import csv
+import io
 import json
+import re
+
+# Eager-loading profiles, matched to the depth of Sale.to_dict(). Each
+# selectinload costs one extra IN query per page, no matter how many sales
+# are on it, instead of one lazy load per sale and relationship.
+SALE_SUMMARY_LOAD = (
+    selectinload(Sale.customer),
+    selectinload(Sale.user),
+    selectinload(Sale.bills),
+)
+SALE_DETAIL_LOAD = SALE_SUMMARY_LOAD + (
+    selectinload(Sale.customer_transactions),
+)
+# Parent ids per IN query when list endpoints read related rows without the
+# ORM (see SalesService._sale_dicts); the same batch size selectinload uses
+ROW_IN_BATCH = 500
+
+# Bank statement columns recognised by reconcile_bank_statement (lowercased)
+STATEMENT_AMOUNT_COLUMNS = ('amount', 'credit', 'so_tien', 'số tiền', 'so tien')
+STATEMENT_REFERENCE_COLUMNS = ('reference', 'description', 'content', 'noi_dung', 'nội dung', 'noi dung')
+SALE_REFERENCE_PATTERN = re.compile(r'(?:SALE|#)\s*-?\s*(\d+)', re.IGNORECASE)
 
 class SalesService:
     """Service for sales management operations"""
     
+    def _load_sale(self, db: Session, sale_id: int, detail: bool = True) -> Optional[Sale]:
+        """Load a sale together with the relationships its serializer needs"""
+        options = SALE_DETAIL_LOAD if detail else SALE_SUMMARY_LOAD
+        return db.query(Sale).options(*options).filter(Sale.id == sale_id).first()
+    
+    def _sale_dicts(self, db: Session, sale_rows, detail: bool = False,
+                    include_archive: bool = False) -> List[Dict[str, Any]]:
+        """Serialize Core rows of ``Sale.dict_columns()`` with their related records
+
+        The row-level counterpart of SALE_SUMMARY_LOAD / SALE_DETAIL_LOAD:
+        customers, users, bills (and transactions when ``detail``) are read
+        as plain rows with one IN query per relationship and batch, and no
+        ORM instances are built. ``include_archive`` when some of the sales
+        may be archived, so their bills and transactions are too.
+        """
+        def read_related(columns, key, ids):
+            ids = list(ids)
+            for start in range(0, len(ids), ROW_IN_BATCH):
+                yield from db.execute(
+                    select(*columns).where(key.in_(ids[start:start + ROW_IN_BATCH])).order_by(columns[0])
+                )
+        
+        customers = {
+            row.id: dict(row._mapping)
+            for row in read_related(Customer.summary_columns(), Customer.id, {row.customer_id for row in sale_rows})
+        }
+        users = {
+            row.id: dict(row._mapping)
+            for row in read_related(User.summary_columns(), User.id, {row.user_id for row in sale_rows})
+        }
+        sale_ids = [row.id for row in sale_rows]
+        bill_source = archive_service.bills() if include_archive else Bill
+        bills = defaultdict(list)
+        for row in read_related(Bill.dict_columns(include_raw=detail, source=bill_source), bill_source.sale_id, sale_ids):
+            bills[row.sale_id].append(Bill.row_to_dict(row, include_raw=detail))
+        transactions = defaultdict(list)
+        if detail:
+            transaction_source = archive_service.transactions(include_archive)
+            for row in read_related(
+                CustomerTransaction.dict_columns(source=transaction_source), transaction_source.sale_id, sale_ids
+            ):
+                transactions[row.sale_id].append(CustomerTransaction.row_to_dict(row))
+        
+        return [
+            Sale.row_to_dict(
+                row,
+                customers.get(row.customer_id),
+                users.get(row.user_id),
+                bills.get(row.id, []),
+                transactions.get(row.id, []) if detail else None
+            )
+            for row in sale_rows
+        ]
+    
     def create_sale(self, sale_data: Dict[str, Any], user_id: int) -> Dict[str, Any]:
         """Create a new sale transaction"""
+        db = get_session()
         try:
-            db = next(get_db())
             
             # Validate required fields
             required_fields = ['customer_id', 'bill_ids', 'profit_percentage']
@@ -35,16 +117,22 @@ class SalesService:
                     'error': 'Customer not found'
                 }
             
-            # Validate bills exist and are available
-            bill_ids = sale_data['bill_ids']
+            # Claim the bills: lock the rows that are still in the warehouse and
+            # skip any that another sale has locked. Concurrent sales over
+            # disjoint bills never wait on each other, and a bill that is being
+            # sold elsewhere shows up as unavailable here instead of being sold
+            # twice. Postgres re-checks the status filter on locked rows, so a
+            # bill sold by a transaction that committed meanwhile is excluded.
+            bill_ids = set(sale_data['bill_ids'])
             bills = db.query(Bill).filter(
                 and_(
                     Bill.id.in_(bill_ids),
                     Bill.status == BillStatus.IN_WAREHOUSE
                 )
-            ).all()
+            ).order_by(Bill.id).with_for_update(skip_locked=True).all()
             
             if len(bills) != len(bill_ids):
+                db.rollback()
                 return {
                     'success': False,
                     'error': 'Some bills are not available or not found'
@@ -94,8 +182,9 @@ class SalesService:
                 bill.sale_id = sale.id
                 bill.updated_at = datetime.utcnow()
             
+            customer_service.refresh_customer_totals(db, [sale.customer_id])
             db.commit()
-            db.refresh(sale)
+            sale = self._load_sale(db, sale.id)
             
             return {
                 'success': True,
@@ -110,15 +199,19 @@ class SalesService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def confirm_payment(self, sale_id: int) -> Dict[str, Any]:
-        """Confirm customer has paid - chuyển từ pending_payment sang paid"""
+        """Confirm customer has paid - chuyển từ pending_payment sang paid
+        
+        The sale, its bills and the PAYMENT_RECEIVED transaction are written in
+        one session and one commit.
+        """
+        db = get_session()
         try:
-            db = next(get_db())
             
-            # Get sale
-            sale = db.query(Sale).filter(Sale.id == sale_id).first()
+            # Get sale (locked, so two confirmations cannot both pass the check)
+            sale = db.query(Sale).filter(Sale.id == sale_id).with_for_update().first()
             if not sale:
                 return {
                     'success': False,
@@ -139,10 +232,10 @@ class SalesService:
             sale.updated_at = datetime.utcnow()
             
             # Update bills status to paid
-            bills = db.query(Bill).filter(Bill.sale_id == sale_id).all()
-            for bill in bills:
-                bill.status = BillStatus.PAID
-                bill.updated_at = datetime.utcnow()
+            db.query(Bill).filter(Bill.sale_id == sale_id).update(
+                {Bill.status: BillStatus.PAID, Bill.updated_at: datetime.utcnow()},
+                synchronize_session=False
+            )
             
             # Create transaction record for payment received
             from services.customer_transaction_service import customer_transaction_service
@@ -150,14 +243,19 @@ class SalesService:
                 sale_id=sale_id,
                 amount=float(sale.total_bill_amount),
                 payment_method=sale.payment_method.value if hasattr(sale.payment_method, 'value') else str(sale.payment_method),
-                notes=f"Khách hàng đã thanh toán {sale.total_bill_amount} đ"
+                notes=f"Khách hàng đã thanh toán {sale.total_bill_amount} đ",
+                db=db
             )
             
             if not transaction_result['success']:
-                print(f"Warning: Failed to create payment transaction: {transaction_result['error']}")
+                db.rollback()
+                return {
+                    'success': False,
+                    'error': f"Failed to create payment transaction: {transaction_result['error']}"
+                }
             
             db.commit()
-            db.refresh(sale)
+            sale = self._load_sale(db, sale_id)
             
             return {
                 'success': True,
@@ -172,15 +270,18 @@ class SalesService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
 
     def complete_sale(self, sale_id: int) -> Dict[str, Any]:
-        """Complete sale - mình đã thanh lại cho khách"""
+        """Complete sale - mình đã thanh lại cho khách
+        
+        The sale and its bills are written in one session and one commit.
+        """
+        db = get_session()
         try:
-            db = next(get_db())
             
-            # Get sale
-            sale = db.query(Sale).filter(Sale.id == sale_id).first()
+            # Get sale (locked, so two completions cannot both pass the check)
+            sale = db.query(Sale).filter(Sale.id == sale_id).with_for_update().first()
             if not sale:
                 return {
                     'success': False,
@@ -200,10 +301,10 @@ class SalesService:
             sale.updated_at = datetime.utcnow()
             
             # Update bills status to completed
-            bills = db.query(Bill).filter(Bill.sale_id == sale_id).all()
-            for bill in bills:
-                bill.status = BillStatus.COMPLETED
-                bill.updated_at = datetime.utcnow()
+            db.query(Bill).filter(Bill.sale_id == sale_id).update(
+                {Bill.status: BillStatus.COMPLETED, Bill.updated_at: datetime.utcnow()},
+                synchronize_session=False
+            )
             
             # Create transaction record for payment sent to customer
             # from services.customer_transaction_service import customer_transaction_service
@@ -211,17 +312,22 @@ class SalesService:
             #     sale_id=sale_id,
             #     amount=float(sale.customer_payment),
             #     payment_method=sale.payment_method.value if hasattr(sale.payment_method, 'value') else str(sale.payment_method),
-            #     notes=f"Đã thanh lại cho khách hàng {sale.customer_payment} đ"
+            #     notes=f"Đã thanh lại cho khách hàng {sale.customer_payment} đ",
+            #     db=db
             # )
             
             # if not transaction_result['success']:
-            #     print(f"Warning: Failed to create payment transaction: {transaction_result['error']}")
+            #     db.rollback()
+            #     return {
+            #         'success': False,
+            #         'error': f"Failed to create payment transaction: {transaction_result['error']}"
+            #     }
             
             # Tạm thời bỏ qua tạo transaction để fix lỗi
             print(f"Sale {sale_id} completed, transaction creation temporarily disabled")
             
             db.commit()
-            db.refresh(sale)
+            sale = self._load_sale(db, sale_id)
             
             return {
                 'success': True,
@@ -236,29 +342,34 @@ class SalesService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
 
     def get_sale_by_id(self, sale_id: int) -> Dict[str, Any]:
         """Get sale by ID with details"""
+        db = get_session()
         try:
-            db = next(get_db())
-            sale = db.query(Sale).filter(Sale.id == sale_id).first()
+            sale = self._load_sale(db, sale_id)
             
             if not sale:
+                # Finished sales may have been moved to the archive
+                row = None
+                if archive_service.horizon() is not None:
+                    row = db.execute(
+                        select(*Sale.dict_columns(source=sales_archive.c)).where(sales_archive.c.id == sale_id)
+                    ).first()
+                if row is None:
+                    return {
+                        'success': False,
+                        'error': 'Sale not found'
+                    }
                 return {
-                    'success': False,
-                    'error': 'Sale not found'
+                    'success': True,
+                    'sale': self._sale_dicts(db, [row], detail=True, include_archive=True)[0]
                 }
             
-            # Get related data
-            sale_dict = sale.to_dict()
-            sale_dict['customer'] = sale.customer.to_dict() if sale.customer else None
-            sale_dict['user'] = sale.user.to_dict() if sale.user else None
-            sale_dict['bills'] = [bill.to_dict() for bill in sale.bills] if sale.bills else []
-            
             return {
                 'success': True,
-                'sale': sale_dict
+                'sale': sale.to_dict()
             }
             
         except Exception as e:
@@ -267,7 +378,7 @@ class SalesService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def get_all_sales(self, 
                       page: int = 1, 
@@ -277,42 +388,41 @@ class SalesService:
                       start_date: str = None,
                       end_date: str = None) -> Dict[str, Any]:
         """Get all sales with filtering and pagination"""
+        db = get_session()
         try:
-            db = next(get_db())
             
-            # Build query
-            query = db.query(Sale)
+            start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00')) if start_date else None
+            
+            # Hot table, or hot + archive when the range reaches archived sales
+            sales = archive_service.sales(start_dt, status)
             
-            # Apply filters
+            # Build filters
+            conditions = []
             if status:
-                query = query.filter(Sale.status == status)
+                conditions.append(sales.status == status)
             
             if customer_id:
-                query = query.filter(Sale.customer_id == customer_id)
+                conditions.append(sales.customer_id == customer_id)
             
-            if start_date:
-                start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                query = query.filter(Sale.created_at >= start_dt)
+            if start_dt:
+                conditions.append(sales.created_at >= start_dt)
             
             if end_date:
                 end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                query = query.filter(Sale.created_at <= end_dt)
+                conditions.append(sales.created_at <= end_dt)
             
             # Get total count
-            total = query.count()
+            total = db.scalar(select(func.count(sales.id)).where(*conditions))
             
-            # Apply pagination and ordering
-            sales = query.order_by(desc(Sale.created_at)).offset(
-                (page - 1) * per_page
-            ).limit(per_page).all()
+            # Read plain rows (no ORM instances) with pagination and ordering
+            rows = db.execute(
+                select(*Sale.dict_columns(source=sales)).where(*conditions)
+                .order_by(desc(sales.created_at))
+                .offset((page - 1) * per_page).limit(per_page)
+            ).all()
             
             # Convert to dict with related data
-            sale_list = []
-            for sale in sales:
-                sale_dict = sale.to_dict()
-                sale_dict['customer'] = sale.customer.to_dict() if sale.customer else None
-                sale_dict['bills_count'] = len(sale.bills) if sale.bills else 0
-                sale_list.append(sale_dict)
+            sale_list = self._sale_dicts(db, rows, include_archive=sales is not Sale)
             
             return {
                 'success': True,
@@ -331,12 +441,12 @@ class SalesService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def update_sale_status(self, sale_id: int, status: str, notes: str = None) -> Dict[str, Any]:
         """Update sale status"""
+        db = get_session()
         try:
-            db = next(get_db())
             sale = db.query(Sale).filter(Sale.id == sale_id).first()
             
             if not sale:
@@ -380,8 +490,10 @@ class SalesService:
                     bill.status = BillStatus.IN_WAREHOUSE
                     bill.sale_id = None
                     bill.updated_at = datetime.utcnow()
+                customer_service.refresh_customer_totals(db, [sale.customer_id])
             
             db.commit()
+            sale = self._load_sale(db, sale_id)
             
             return {
                 'success': True,
@@ -396,12 +508,12 @@ class SalesService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def update_payment_status(self, sale_id: int, payment_status: str, payment_date: str = None) -> Dict[str, Any]:
         """Update payment status"""
+        db = get_session()
         try:
-            db = next(get_db())
             sale = db.query(Sale).filter(Sale.id == sale_id).first()
             
             if not sale:
@@ -420,6 +532,7 @@ class SalesService:
             
             sale.updated_at = datetime.utcnow()
             db.commit()
+            sale = self._load_sale(db, sale_id)
             
             return {
                 'success': True,
@@ -434,29 +547,40 @@ class SalesService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
+    @workload(WORKLOAD_ANALYTICS)
     def get_sales_statistics(self, start_date: str = None, end_date: str = None) -> Dict[str, Any]:
-        """Get sales statistics"""
+        """Get sales statistics
+        
+        All figures are aggregated in the database with grouped queries, so
+        the cost does not grow with the number of sale rows sent to Python.
+        """
+        db = get_session()
         try:
-            db = next(get_db())
             
-            # Base query
-            query = db.query(Sale)
+            start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00')) if start_date else None
             
-            # Apply date filter
-            if start_date:
-                start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                query = query.filter(Sale.created_at >= start_dt)
+            # Hot table, or hot + archive when the range reaches archived sales
+            sales = archive_service.sales(start_dt)
+            
+            # Date filter shared by every aggregate
+            filters = []
+            if start_dt:
+                filters.append(sales.created_at >= start_dt)
             
             if end_date:
                 end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                query = query.filter(Sale.created_at <= end_dt)
+                filters.append(sales.created_at <= end_dt)
             
-            # Get all sales in period
-            sales = query.all()
+            # Totals
+            total_sales, total_profit, average_profit_percentage = db.query(
+                func.count(sales.id),
+                func.coalesce(func.sum(sales.profit_amount), 0),
+                func.coalesce(func.avg(sales.profit_percentage), 0)
+            ).filter(*filters).one()
             
-            if not sales:
+            if not total_sales:
                 return {
                     'success': True,
                     'statistics': {
@@ -470,41 +594,41 @@ class SalesService:
                     }
                 }
             
-            # Calculate statistics
-            total_sales = len(sales)
-            total_revenue = sum(sale.profit_amount for sale in sales)
-            total_profit = sum(sale.profit_amount for sale in sales)
-            average_profit_percentage = sum(sale.profit_percentage for sale in sales) / total_sales
-            
             # Sales by status
-            sales_by_status = {}
-            for sale in sales:
-                status = sale.status.value if hasattr(sale.status, 'value') else str(sale.status)
-                sales_by_status[status] = sales_by_status.get(status, 0) + 1
+            status_rows = db.query(sales.status, func.count(sales.id)).filter(
+                *filters
+            ).group_by(sales.status).all()
+            sales_by_status = {
+                status.value if hasattr(status, 'value') else str(status): count
+                for status, count in status_rows
+            }
             
             # Revenue by month
-            revenue_by_month = {}
-            for sale in sales:
-                month_key = sale.created_at.strftime('%Y-%m')
-                revenue_by_month[month_key] = revenue_by_month.get(month_key, 0) + sale.profit_amount
+            month = func.date_trunc('month', sales.created_at, type_=DateTime(timezone=True))
+            month_rows = db.query(month, func.sum(sales.profit_amount)).filter(
+                *filters
+            ).group_by(month).order_by(month).all()
+            revenue_by_month = {
+                month_start.strftime('%Y-%m'): float(revenue)
+                for month_start, revenue in month_rows
+            }
             
             # Top customers
-            customer_revenue = {}
-            for sale in sales:
-                customer_name = sale.customer.name if sale.customer else 'Unknown'
-                customer_revenue[customer_name] = customer_revenue.get(customer_name, 0) + sale.profit_amount
-            
-            top_customers = sorted(
-                [{'name': name, 'revenue': revenue} for name, revenue in customer_revenue.items()],
-                key=lambda x: x['revenue'],
-                reverse=True
-            )[:10]
+            customer_name = func.coalesce(Customer.name, 'Unknown')
+            revenue = func.sum(sales.profit_amount)
+            customer_rows = db.query(customer_name, revenue).select_from(sales).outerjoin(
+                Customer, sales.customer_id == Customer.id
+            ).filter(*filters).group_by(customer_name).order_by(desc(revenue)).limit(10).all()
+            top_customers = [
+                {'name': name, 'revenue': float(customer_revenue)}
+                for name, customer_revenue in customer_rows
+            ]
             
             return {
                 'success': True,
                 'statistics': {
                     'total_sales': total_sales,
-                    'total_revenue': float(total_revenue),
+                    'total_revenue': float(total_profit),
                     'total_profit': float(total_profit),
                     'average_profit_percentage': float(average_profit_percentage),
                     'sales_by_status': sales_by_status,
@@ -519,36 +643,37 @@ class SalesService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
+    @workload(WORKLOAD_ANALYTICS)
     def export_sales(self, format: str = 'json', start_date: str = None, end_date: str = None) -> Dict[str, Any]:
         """Export sales data"""
+        db = get_session()
         try:
-            db = next(get_db())
             
-            # Build query
-            query = db.query(Sale)
+            start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00')) if start_date else None
+            
+            # Hot table, or hot + archive when the range reaches archived sales
+            sales = archive_service.sales(start_dt)
+            
+            # Build filters
+            conditions = []
             
             # Apply date filter
-            if start_date:
-                start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                query = query.filter(Sale.created_at >= start_dt)
+            if start_dt:
+                conditions.append(sales.created_at >= start_dt)
             
             if end_date:
                 end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                query = query.filter(Sale.created_at <= end_dt)
+                conditions.append(sales.created_at <= end_dt)
             
-            # Get sales
-            sales = query.order_by(desc(Sale.created_at)).all()
+            # Get sales as plain rows
+            rows = db.execute(
+                select(*Sale.dict_columns(source=sales)).where(*conditions).order_by(desc(sales.created_at))
+            ).all()
             
             # Convert to dict with related data
-            sale_list = []
-            for sale in sales:
-                sale_dict = sale.to_dict()
-                sale_dict['customer'] = sale.customer.to_dict() if sale.customer else None
-                sale_dict['user'] = sale.user.to_dict() if sale.user else None
-                sale_dict['bills'] = [bill.to_dict() for bill in sale.bills] if sale.bills else []
-                sale_list.append(sale_dict)
+            sale_list = self._sale_dicts(db, rows, detail=True, include_archive=sales is not Sale)
             
             if format == 'json':
                 return {
@@ -569,12 +694,12 @@ class SalesService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
     
     def cancel_sale(self, sale_id: int, reason: str = None) -> Dict[str, Any]:
         """Cancel a sale and return bills to warehouse"""
+        db = get_session()
         try:
-            db = next(get_db())
             sale = db.query(Sale).filter(Sale.id == sale_id).first()
             
             if not sale:
@@ -596,17 +721,19 @@ class SalesService:
             sale.updated_at = datetime.utcnow()
             
             # Return bills to warehouse
+            bills_returned = len(sale.bills)
             for bill in sale.bills:
                 bill.status = BillStatus.IN_WAREHOUSE
                 bill.sale_id = None
                 bill.updated_at = datetime.utcnow()
             
+            customer_service.refresh_customer_totals(db, [sale.customer_id])
             db.commit()
             
             return {
                 'success': True,
                 'message': 'Sale cancelled successfully',
-                'bills_returned': len(sale.bills)
+                'bills_returned': bills_returned
             }
             
         except Exception as e:
@@ -616,26 +743,341 @@ class SalesService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
+
+    # ------------------------------------------------------------------
+    # Bulk lifecycle operations
+    #
+    # Each bulk call locks the requested sales, works out a per-sale outcome
+    # and then moves every eligible sale with one UPDATE for sales, one for
+    # bills and one multi-row INSERT for customer_transactions, all in a
+    # single commit.
+    # ------------------------------------------------------------------
+
+    def _lock_sales_for_bulk(self, db: Session, sale_ids: List[int]) -> Dict[int, Any]:
+        """Lock the requested sales and return their rows keyed by id"""
+        rows = db.query(
+            Sale.id, Sale.customer_id, Sale.status, Sale.total_bill_amount, Sale.payment_method
+        ).filter(Sale.id.in_(set(sale_ids))).order_by(Sale.id).with_for_update().all()
+        return {row.id: row for row in rows}
+
+    def _bulk_outcomes(self, sale_ids: List[int], rows: Dict[int, Any],
+                       allowed_statuses: List[SaleStatus], target_status: SaleStatus):
+        """Split requested sales into eligible ids and per-sale outcomes"""
+        eligible = []
+        outcomes = []
+        seen = set()
+        for sale_id in sale_ids:
+            if sale_id in seen:
+                continue
+            seen.add(sale_id)
+            row = rows.get(sale_id)
+            if not row:
+                outcomes.append({'sale_id': sale_id, 'success': False, 'error': 'Sale not found'})
+            elif row.status not in allowed_statuses:
+                outcomes.append({
+                    'sale_id': sale_id,
+                    'success': False,
+                    'error': f'Invalid status transition from {row.status.value} to {target_status.value}'
+                })
+            else:
+                eligible.append(sale_id)
+                outcomes.append({'sale_id': sale_id, 'success': True, 'status': target_status.value})
+        return eligible, outcomes
+
+    def _bulk_result(self, outcomes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        successful = sum(1 for outcome in outcomes if outcome['success'])
+        return {
+            'success': True,
+            'bulk_results': outcomes,
+            'summary': {
+                'total': len(outcomes),
+                'successful': successful,
+                'failed': len(outcomes) - successful
+            }
+        }
+
+    def _confirm_payments(self, db: Session, sale_ids: List[int],
+                          references: Dict[int, str] = None) -> List[Dict[str, Any]]:
+        """Move PENDING_PAYMENT sales to PAID inside the caller's session"""
+        references = references or {}
+        rows = self._lock_sales_for_bulk(db, sale_ids)
+        eligible, outcomes = self._bulk_outcomes(
+            sale_ids, rows, [SaleStatus.PENDING_PAYMENT], SaleStatus.PAID
+        )
+        if not eligible:
+            return outcomes
+
+        now = datetime.utcnow()
+        db.query(Sale).filter(Sale.id.in_(eligible)).update(
+            {Sale.status: SaleStatus.PAID, Sale.payment_status: True,
+             Sale.payment_date: now, Sale.updated_at: now},
+            synchronize_session=False
+        )
+        db.query(Bill).filter(Bill.sale_id.in_(eligible)).update(
+            {Bill.status: BillStatus.PAID, Bill.updated_at: now},
+            synchronize_session=False
+        )
+        db.execute(insert(CustomerTransaction), [
+            {
+                'sale_id': sale_id,
+                'transaction_type': TransactionType.PAYMENT_RECEIVED,
+                'amount': rows[sale_id].total_bill_amount,
+                'payment_method': rows[sale_id].payment_method.value,
+                'reference_number': references.get(sale_id),
+                'status': TransactionStatus.PENDING,
+                'notes': f"Khách hàng đã thanh toán {rows[sale_id].total_bill_amount} đ"
+            }
+            for sale_id in eligible
+        ])
+        return outcomes
+
+    def bulk_confirm_payment(self, sale_ids: List[int]) -> Dict[str, Any]:
+        """Confirm customer payment for many sales in one transaction"""
+        db = get_session()
+        try:
+            outcomes = self._confirm_payments(db, sale_ids)
+            db.commit()
+            return self._bulk_result(outcomes)
+            
+        except Exception as e:
+            if db:
+                db.rollback()
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            close_session(db)
+
+    def bulk_complete_sales(self, sale_ids: List[int]) -> Dict[str, Any]:
+        """Complete many PAID sales (mình đã thanh lại) in one transaction"""
+        db = get_session()
+        try:
+            rows = self._lock_sales_for_bulk(db, sale_ids)
+            eligible, outcomes = self._bulk_outcomes(
+                sale_ids, rows, [SaleStatus.PAID], SaleStatus.COMPLETED
+            )
+            
+            if eligible:
+                now = datetime.utcnow()
+                db.query(Sale).filter(Sale.id.in_(eligible)).update(
+                    {Sale.status: SaleStatus.COMPLETED, Sale.completed_at: now, Sale.updated_at: now},
+                    synchronize_session=False
+                )
+                db.query(Bill).filter(Bill.sale_id.in_(eligible)).update(
+                    {Bill.status: BillStatus.COMPLETED, Bill.updated_at: now},
+                    synchronize_session=False
+                )
+                # No PAYMENT_SENT record, as in complete_sale (temporarily disabled)
+            
+            db.commit()
+            return self._bulk_result(outcomes)
+            
+        except Exception as e:
+            if db:
+                db.rollback()
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            close_session(db)
+
+    def bulk_cancel_sales(self, sale_ids: List[int], reason: str = None) -> Dict[str, Any]:
+        """Cancel many sales and return their bills to the warehouse"""
+        db = get_session()
+        try:
+            rows = self._lock_sales_for_bulk(db, sale_ids)
+            eligible, outcomes = self._bulk_outcomes(
+                sale_ids, rows, [SaleStatus.PENDING_PAYMENT, SaleStatus.PAID], SaleStatus.CANCELLED
+            )
+            
+            if eligible:
+                now = datetime.utcnow()
+                db.query(Sale).filter(Sale.id.in_(eligible)).update(
+                    {Sale.status: SaleStatus.CANCELLED, Sale.updated_at: now,
+                     Sale.notes: f"Cancelled: {reason}" if reason else "Cancelled by user"},
+                    synchronize_session=False
+                )
+                db.query(Bill).filter(Bill.sale_id.in_(eligible)).update(
+                    {Bill.status: BillStatus.IN_WAREHOUSE, Bill.sale_id: None, Bill.updated_at: now},
+                    synchronize_session=False
+                )
+                db.query(CustomerTransaction).filter(
+                    and_(
+                        CustomerTransaction.sale_id.in_(eligible),
+                        CustomerTransaction.status == TransactionStatus.PENDING
+                    )
+                ).update(
+                    {CustomerTransaction.status: TransactionStatus.CANCELLED,
+                     CustomerTransaction.updated_at: now},
+                    synchronize_session=False
+                )
+                customer_service.refresh_customer_totals(
+                    db, {rows[sale_id].customer_id for sale_id in eligible}
+                )
+            
+            db.commit()
+            return self._bulk_result(outcomes)
+            
+        except Exception as e:
+            if db:
+                db.rollback()
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            close_session(db)
+
+    def reconcile_bank_statement(self, csv_content: str, confirm: bool = False) -> Dict[str, Any]:
+        """Match bank statement rows to pending sales and optionally confirm them
+        
+        The CSV needs an amount column and may carry a reference/description
+        column. A row whose reference names a sale (``SALE 123``, ``#123``)
+        matches that sale if the amount equals its ``total_bill_amount`` (what
+        the customer pays, and what the PAYMENT_RECEIVED record carries); other
+        rows match only when exactly one unmatched pending sale has that
+        amount. With ``confirm=True`` every matched sale is confirmed in the
+        same transaction, using the statement reference as reference_number.
+        """
+        db = None
+        try:
+            statement = self._parse_bank_statement(csv_content)
+            if not statement:
+                return {
+                    'success': False,
+                    'error': 'No statement rows with an amount column were found'
+                }
+            
+            db = get_session()
+            amounts = {row['amount'] for row in statement if row['amount'] is not None}
+            pending = db.query(Sale.id, Sale.total_bill_amount).filter(
+                and_(
+                    Sale.status == SaleStatus.PENDING_PAYMENT,
+                    Sale.total_bill_amount.in_(amounts)
+                )
+            ).all() if amounts else []
+            
+            amount_by_sale = {sale_id: Decimal(amount) for sale_id, amount in pending}
+            sales_by_amount = {}
+            for sale_id, amount in amount_by_sale.items():
+                sales_by_amount.setdefault(amount, []).append(sale_id)
+            
+            matches = []
+            references = {}
+            matched = set()
+            for row in statement:
+                outcome = {'line': row['line'], 'amount': row['amount'], 'reference': row['reference']}
+                amount = row['amount']
+                sale_id = row['sale_ref']
+                if amount is None:
+                    outcome.update(matched=False, error='Invalid amount')
+                elif sale_id is not None and amount_by_sale.get(sale_id) == amount and sale_id not in matched:
+                    outcome.update(matched=True, sale_id=sale_id, match_type='reference')
+                else:
+                    candidates = [s for s in sales_by_amount.get(amount, []) if s not in matched]
+                    if len(candidates) == 1:
+                        sale_id = candidates[0]
+                        outcome.update(matched=True, sale_id=sale_id, match_type='amount')
+                    elif candidates:
+                        outcome.update(matched=False, error='Ambiguous amount', candidates=candidates)
+                    else:
+                        outcome.update(matched=False, error='No pending sale with this amount')
+                
+                if outcome['matched']:
+                    matched.add(outcome['sale_id'])
+                    references[outcome['sale_id']] = row['reference']
+                if outcome['amount'] is not None:
+                    outcome['amount'] = float(outcome['amount'])
+                matches.append(outcome)
+            
+            result = {
+                'success': True,
+                'matches': matches,
+                'summary': {
+                    'rows': len(statement),
+                    'matched': len(matched),
+                    'unmatched': len(statement) - len(matched)
+                },
+                'confirmed': False
+            }
+            
+            if confirm and matched:
+                sale_ids = sorted(matched)
+                outcomes = self._confirm_payments(db, sale_ids, references)
+                db.commit()
+                result['confirmed'] = True
+                result['bulk_results'] = outcomes
+            
+            return result
+            
+        except Exception as e:
+            if db:
+                db.rollback()
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            close_session(db)
+
+    def _parse_bank_statement(self, csv_content: str) -> List[Dict[str, Any]]:
+        """Parse a bank statement CSV into amount/reference rows"""
+        reader = csv.DictReader(io.StringIO(csv_content.lstrip('\ufeff')))
+        if not reader.fieldnames:
+            return []
+        
+        columns = {name.strip().lower(): name for name in reader.fieldnames if name}
+        amount_column = next((columns[c] for c in STATEMENT_AMOUNT_COLUMNS if c in columns), None)
+        reference_column = next((columns[c] for c in STATEMENT_REFERENCE_COLUMNS if c in columns), None)
+        if not amount_column:
+            return []
+        
+        rows = []
+        for line, record in enumerate(reader, start=2):
+            reference = (record.get(reference_column) or '').strip() if reference_column else ''
+            sale_ref = SALE_REFERENCE_PATTERN.search(reference)
+            rows.append({
+                'line': line,
+                'amount': self._parse_statement_amount(record.get(amount_column)),
+                'reference': reference or None,
+                'sale_ref': int(sale_ref.group(1)) if sale_ref else None
+            })
+        return rows
+
+    def _parse_statement_amount(self, value: str) -> Optional[Decimal]:
+        """Parse amounts like '1,500,000', '1.500.000' or '1500000.00'"""
+        if not value:
+            return None
+        text = re.sub(r'[^\d,.\-]', '', value)
+        if re.fullmatch(r'-?\d{1,3}([.,]\d{3})+', text):
+            text = re.sub(r'[.,]', '', text)
+        else:
+            text = text.replace(',', '')
+        try:
+            return Decimal(text).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            return None
 
     def get_sales_by_customer(self, customer_id: int) -> Dict[str, Any]:
         """Get all sales for a specific customer"""
+        db = get_session()
         try:
-            db = next(get_db())
             
-            # Get sales by customer ID
-            sales = db.query(Sale).filter(Sale.customer_id == customer_id).order_by(
-                desc(Sale.created_at)
+            # The customer's whole history, archived sales included
+            sales = archive_service.sales()
+            
+            # Get sales by customer ID as plain rows
+            rows = db.execute(
+                select(*Sale.dict_columns(source=sales))
+                .where(sales.customer_id == customer_id)
+                .order_by(desc(sales.created_at))
             ).all()
             
             # Convert to dict with related data
-            sale_list = []
-            for sale in sales:
-                sale_dict = sale.to_dict()
-                sale_dict['customer'] = sale.customer.to_dict() if sale.customer else None
-                sale_dict['user'] = sale.user.to_dict() if sale.user else None
-                sale_dict['bills'] = [bill.to_dict() for bill in sale.bills] if sale.bills else []
-                sale_list.append(sale_dict)
+            sale_list = self._sale_dicts(db, rows, include_archive=sales is not Sale)
             
             return {
                 'success': True,
@@ -649,7 +1091,7 @@ class SalesService:
                 'error': str(e)
             }
         finally:
-            db.close()
+            close_session(db)
 
 # Create global instance
 sales_service = SalesService()
@@ -0,0 +1,81 @@
+import os
+import sys
+
+import pytest
+
+# Application modules import each other relative to the backend directory
+# (``from config.database import ...``), the same way app.py is run.
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from config.config import TestingConfig
+
+# Never let the test suite touch the database configured for the app
+os.environ['DATABASE_URL'] = os.getenv('TEST_DATABASE_URL', TestingConfig.DATABASE_URL)
+
+# Same SELECT allowed this many times per test before it counts as N+1
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', '10'))
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'allow_nplusone: do not fail the test on repeated identical SELECTs')
+
+
+@pytest.fixture(autouse=True)
+def nplusone(request):
+    """Fail any test that runs the same parameterized SELECT too often"""
+    if request.node.get_closest_marker('allow_nplusone'):
+        yield None
+        return
+
+    from utils.nplusone import nplusone_detector
+    with nplusone_detector.track(NPLUSONE_THRESHOLD, name=request.node.nodeid) as scope:
+        yield scope
+
+
+@pytest.fixture(scope='session')
+def db_engine():
+    """Engine bound to the test database, skipping when it is unreachable"""
+    from sqlalchemy import text
+    from config.database import engine, init_db
+    import models  # noqa: F401 - register all tables on Base.metadata
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+    except Exception as e:
+        pytest.skip(f'Test database not available: {e}')
+
+    init_db()
+    return engine
+
+
+@pytest.fixture
+def clean_db(db_engine):
+    """Empty every table after the test"""
+    from sqlalchemy import text
+    from config.database import Base
+
+    yield db_engine
+
+    table_names = ', '.join(table.name for table in Base.metadata.sorted_tables)
+    with db_engine.begin() as conn:
+        conn.execute(text(f'TRUNCATE {table_names} RESTART IDENTITY CASCADE'))
+
+
+@pytest.fixture
+def seed_user(clean_db):
+    """Create a staff user and return its id"""
+    from config.database import SessionLocal
+    from models import User
+
+    db = SessionLocal()
+    try:
+        user = User(username='staff', email='staff@example.com', role='admin')
+        user.set_password('password123')
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
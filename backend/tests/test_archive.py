@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from config.database import SessionLocal
+from models import (
+    Bill, BillStatus, Customer, CustomerTransaction, PaymentMethod, Sale, SaleStatus,
+    TransactionStatus, TransactionType, bills_archive, sales_archive, customer_transactions_archive
+)
+from services.archive_service import archive_service
+from services.bill_service import BillService
+from services.customer_service import CustomerService
+from services.sales_service import SalesService
+
+pytestmark = pytest.mark.database
+
+LONG_AGO = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def history(seed_user, monkeypatch):
+    """Two old finished sales, an old pending one, a recent finished one and an old expired bill"""
+    monkeypatch.setattr(archive_service, 'settle_seconds', 0)
+    monkeypatch.setattr(archive_service, '_horizon', (None, 0.0, None))
+
+    db = SessionLocal()
+    try:
+        customer = Customer(name='Archive Customer', phone='0901234567', created_by=seed_user)
+        db.add(customer)
+        db.flush()
+
+        ids = {'customer': customer.id, 'sales': []}
+        for i, (status, created_at) in enumerate([
+            (SaleStatus.COMPLETED, LONG_AGO),
+            (SaleStatus.CANCELLED, LONG_AGO),
+            (SaleStatus.PENDING_PAYMENT, LONG_AGO),
+            (SaleStatus.COMPLETED, datetime.now(timezone.utc)),
+        ]):
+            sale = Sale(customer_id=customer.id, user_id=seed_user, total_bill_amount=200_000,
+                        profit_percentage=5, profit_amount=10_000, customer_payment=190_000,
+                        payment_method=PaymentMethod.CASH, status=status,
+                        created_at=created_at, completed_at=created_at)
+            db.add(sale)
+            db.flush()
+            ids['sales'].append(sale.id)
+            db.add(Bill(contract_code=f'PB{i}', customer_name='x', amount=200_000, sale_id=sale.id,
+                        status=BillStatus.COMPLETED, created_at=created_at))
+            db.add(CustomerTransaction(sale_id=sale.id, transaction_type=TransactionType.PAYMENT_RECEIVED,
+                                       amount=190_000, status=TransactionStatus.COMPLETED))
+        db.add(Bill(contract_code='PB-EXPIRED', customer_name='x', amount=50_000, customer_id=customer.id,
+                    status=BillStatus.EXPIRED, created_at=LONG_AGO))
+        db.add(Bill(contract_code='PB-STOCK', customer_name='x', amount=50_000,
+                    status=BillStatus.IN_WAREHOUSE, created_at=LONG_AGO))
+        db.flush()
+        CustomerService().refresh_customer_totals(db, [customer.id])
+        db.commit()
+        return ids
+    finally:
+        db.close()
+
+
+def _count(table):
+    db = SessionLocal()
+    try:
+        return db.scalar(select(func.count()).select_from(table))
+    finally:
+        db.close()
+
+
+def _totals(customer_id):
+    db = SessionLocal()
+    try:
+        customer = db.get(Customer, customer_id)
+        return customer.total_bills, customer.total_amount
+    finally:
+        db.close()
+
+
+def test_old_finished_rows_move_to_the_archive(history):
+    totals = _totals(history['customer'])
+
+    result = archive_service.archive(older_than_days=30, chunk_size=1)
+
+    assert result['success'], result.get('error')
+    assert result['run']['sales_archived'] == 2
+    assert result['run']['bills_archived'] == 3
+    assert result['run']['transactions_archived'] == 2
+    assert _count(Sale.__table__) == 2
+    assert _count(sales_archive) == 2
+    assert _count(bills_archive) == 3
+    assert _count(customer_transactions_archive) == 2
+    # Warehouse stock is never archived
+    assert _count(Bill.__table__) == 3
+
+    # Aggregates still count archived history
+    db = SessionLocal()
+    try:
+        CustomerService().refresh_customer_totals(db, [history['customer']])
+        db.commit()
+    finally:
+        db.close()
+    assert _totals(history['customer']) == totals
+
+
+def test_reads_union_the_archive_only_when_the_range_reaches_it(history):
+    assert archive_service.sales() is Sale
+    archive_service.archive(older_than_days=30)
+    service = SalesService()
+
+    everything = service.get_all_sales(per_page=50)
+    assert everything['pagination']['total'] == 4
+
+    recent = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+    assert archive_service.sales(datetime.fromisoformat(recent)) is Sale
+    assert service.get_all_sales(start_date=recent)['pagination']['total'] == 1
+    # No sale in a non-terminal status is ever archived
+    assert archive_service.sales(status='PENDING_PAYMENT') is Sale
+    assert archive_service.sales(status='COMPLETED') is not Sale
+
+    archived = service.get_sale_by_id(history['sales'][0])
+    assert archived['success'], archived.get('error')
+    assert len(archived['sale']['bills']) == 1
+    assert len(archived['sale']['customer_transactions']) == 1
+
+    assert service.get_sales_by_customer(history['customer'])['total'] == 4
+    assert service.export_sales()['total'] == 4
+    assert BillService().get_bills_by_customer(history['customer'])['total'] == 1
+    assert BillService().get_all_bills()['total'] == 6
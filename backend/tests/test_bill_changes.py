@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy import update
+
+from config.database import SessionLocal
+from models import Bill, BillStatus
+from services.bill_service import BillService
+
+pytestmark = pytest.mark.database
+
+
+def _add_bills(count, prefix='PB'):
+    db = SessionLocal()
+    try:
+        bills = [Bill(contract_code=f'{prefix}{i}', customer_name='Khách', amount=100_000,
+                      status=BillStatus.IN_WAREHOUSE) for i in range(count)]
+        db.add_all(bills)
+        db.commit()
+        return [bill.id for bill in bills]
+    finally:
+        db.close()
+
+
+def _set_status(bill_id, status):
+    db = SessionLocal()
+    try:
+        db.execute(update(Bill).where(Bill.id == bill_id).values(status=status))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_feed_returns_inserts_and_status_transitions(clean_db):
+    service = BillService()
+    token = service.get_bill_changes()['token']
+
+    ids = _add_bills(3)
+    result = service.get_bill_changes(token)
+    assert result['success'], result.get('error')
+    assert {bill['id'] for bill in result['changes']} == set(ids)
+
+    _set_status(ids[0], BillStatus.PENDING_PAYMENT)
+    result = service.get_bill_changes(result['token'])
+    assert [(bill['id'], bill['status']) for bill in result['changes']] == [(ids[0], BillStatus.PENDING_PAYMENT)]
+
+    assert service.get_bill_changes(result['token'])['changes'] == []
+
+
+def test_feed_pages_through_large_rounds(clean_db):
+    service = BillService()
+    token = service.get_bill_changes()['token']
+    ids = _add_bills(5)
+
+    seen = []
+    while True:
+        result = service.get_bill_changes(token, limit=2)
+        seen += [bill['id'] for bill in result['changes']]
+        token = result['token']
+        if not result['has_more']:
+            break
+
+    assert seen == ids
+
+
+def test_invalid_token_is_rejected():
+    with pytest.raises(ValueError):
+        BillService()._parse_change_token('1.2')
+    assert BillService()._parse_change_token('812.815.40') == (812, 815, 40)
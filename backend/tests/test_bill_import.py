@@ -0,0 +1,199 @@
+import csv
+import io
+import os
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import StaticPool
+from werkzeug.datastructures import FileStorage
+
+import models  # noqa: F401 - bills reference users, customers and sales
+from models.bill import Bill, BillStatus
+from services import bill_import_service as bill_import_module
+from services.bill_import_service import BillImportService
+
+pytestmark = pytest.mark.unit
+
+USER_ID = 7
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    Bill.__table__.create(engine)
+    monkeypatch.setattr(bill_import_module, 'engine', engine)
+    return engine
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = BillImportService()
+    service.folder = str(tmp_path / 'imports')
+    return service
+
+
+def upload(service, content, filename='bills.csv'):
+    saved = service.save_upload(FileStorage(io.BytesIO(content.encode('utf-8')), filename=filename))
+    assert saved['success'], saved
+    return saved['upload']
+
+
+def bills(engine):
+    with engine.connect() as conn:
+        return {row.contract_code: row for row in conn.execute(select(Bill.__table__))}
+
+
+def add_bill(engine, contract_code, status=BillStatus.IN_WAREHOUSE):
+    with engine.begin() as conn:
+        conn.execute(Bill.__table__.insert().values(
+            contract_code=contract_code, customer_name='Existing', amount=1, status=status
+        ))
+
+
+def test_valid_rows_load_in_chunks_and_bad_rows_go_to_the_error_file(engine, service):
+    add_bill(engine, 'PE0003')
+    name = upload(service, (
+        'Contract Code;Customer Name;Amount;Due Date\n'
+        'PE0001;Nguyen Van A;"1.250.000";15/09/2025\n'
+        'PE0002;Tran Thi B;300000;2025-09-20\n'
+        '\n'
+        'PE0003;Le Van C;100000;\n'
+        'PE0004;;100000;\n'
+        'PE0005;Pham D;-5;\n'
+        'PE0001;Nguyen Van A;1250000;\n'
+        'PE0006;Vo E;abc;\n'
+        'PE0007;Do F;200000;31/02/2025\n'
+    ))
+    progress = []
+
+    result = service.import_file(name, USER_ID, job_id=1, chunk_size=1,
+                                 progress=lambda done, total, message: progress.append((done, total)))
+
+    assert result['success']
+    assert (result['total_rows'], result['imported'], result['failed']) == (8, 2, 6)
+    assert progress[-1] == (8, 8)
+
+    loaded = bills(engine)
+    assert loaded['PE0001'].amount == Decimal('1250000')
+    assert loaded['PE0001'].due_date.day == 15
+    assert loaded['PE0002'].status == BillStatus.IN_WAREHOUSE
+    assert loaded['PE0002'].added_by == USER_ID
+    assert loaded['PE0003'].customer_name == 'Existing'
+
+    with open(service.error_path(1), newline='', encoding='utf-8-sig') as f:
+        rejected = list(csv.reader(f))
+    assert rejected[0] == ['row', 'error', 'Contract Code', 'Customer Name', 'Amount', 'Due Date']
+    assert [(row[0], row[1]) for row in rejected[1:]] == [
+        ('5', 'Bill with this contract code already exists'),
+        ('6', 'customer_name is required'),
+        ('7', 'Amount must be positive'),
+        ('8', 'Duplicate contract code in this file'),
+        ('9', 'Invalid amount format'),
+        ('10', 'Invalid due_date, expected DD/MM/YYYY or YYYY-MM-DD'),
+    ]
+    assert rejected[2][2:] == ['PE0004', '', '100000', '']
+    assert result['errors'][0] == {'row': 5, 'error': 'Bill with this contract code already exists'}
+
+    # The upload is gone once the job is done, the error file stays
+    assert os.listdir(service.folder) == ['errors-1.csv']
+
+
+def test_amounts_that_do_not_fit_the_column_are_row_errors(engine, service):
+    name = upload(service, (
+        'contract_code,customer_name,amount\n'
+        'PE0001,A,NaN\n'
+        'PE0002,B,Infinity\n'
+        'PE0003,C,-Infinity\n'
+        'PE0004,D,1e20\n'
+        'PE0005,E,1e40\n'
+        'PE0006,F,10000000000000\n'
+        'PE0007,G,9999999999999.99\n'
+        'PE0008,H,0.001\n'
+    ))
+
+    result = service.import_file(name, USER_ID, job_id=4, chunk_size=2)
+
+    assert result['success']
+    assert (result['imported'], result['failed']) == (1, 7)
+    assert bills(engine)['PE0007'].amount == Decimal('9999999999999.99')
+    assert result['errors'] == [
+        {'row': 2, 'error': 'Invalid amount format'},
+        {'row': 3, 'error': 'Invalid amount format'},
+        {'row': 4, 'error': 'Invalid amount format'},
+        {'row': 5, 'error': 'Amount is too large'},
+        {'row': 6, 'error': 'Invalid amount format'},
+        {'row': 7, 'error': 'Amount is too large'},
+        {'row': 9, 'error': 'Amount must be positive'},
+    ]
+
+
+def test_update_existing_only_touches_bills_still_in_the_warehouse(engine, service):
+    add_bill(engine, 'PE0001')
+    add_bill(engine, 'PE0002', status=BillStatus.PENDING_PAYMENT)
+    name = upload(service, 'contract_code,customer_name,amount\nPE0001,New Name,500000\nPE0002,New Name,500000\n')
+
+    result = service.import_file(name, USER_ID, job_id=2, update_existing=True)
+
+    assert (result['imported'], result['failed']) == (1, 1)
+    loaded = bills(engine)
+    assert (loaded['PE0001'].customer_name, loaded['PE0001'].amount) == ('New Name', Decimal('500000'))
+    assert loaded['PE0002'].customer_name == 'Existing'
+    assert result['errors'] == [{'row': 3, 'error': 'Bill with this contract code is no longer in the warehouse'}]
+
+
+def test_a_chunk_the_database_refuses_is_rejected_and_the_import_goes_on(engine, service, monkeypatch):
+    name = upload(service, 'contract_code,customer_name,amount\n' + ''.join(
+        f'PE000{i},Customer {i},100000\n' for i in range(1, 6)
+    ))
+    write_chunk = service._write_chunk
+
+    def refuse_second_chunk(rows, *args):
+        if rows[0]['contract_code'] == 'PE0003':
+            raise OperationalError('INSERT INTO bills', {}, Exception('disk full\nCONTEXT: COPY'))
+        return write_chunk(rows, *args)
+
+    monkeypatch.setattr(service, '_write_chunk', refuse_second_chunk)
+
+    result = service.import_file(name, USER_ID, job_id=5, chunk_size=2)
+
+    assert result['success']
+    assert (result['imported'], result['failed']) == (3, 2)
+    assert sorted(bills(engine)) == ['PE0001', 'PE0002', 'PE0005']
+    assert result['errors'] == [
+        {'row': 4, 'error': 'Database error: disk full'},
+        {'row': 5, 'error': 'Database error: disk full'},
+    ]
+
+
+def test_uploads_are_checked_before_a_job_is_queued(service):
+    missing = service.save_upload(FileStorage(io.BytesIO(b'contract_code,amount\nPE1,5\n'), filename='bills.csv'))
+    assert not missing['success']
+    assert 'customer_name' in missing['error']
+
+    wrong_type = service.save_upload(FileStorage(io.BytesIO(b'x'), filename='bills.pdf'))
+    assert not wrong_type['success']
+
+    with pytest.raises(ValueError):
+        service.upload_path('../../etc/passwd')
+
+
+def test_xlsx_rows_are_read_with_their_cell_types(engine, service, tmp_path):
+    openpyxl = pytest.importorskip('openpyxl')
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['contract_code', 'customer_name', 'amount', 'meter_number'])
+    sheet.append(['PE0001', 'Nguyen Van A', 1250000, 123456.0])
+    sheet.append([None, None, None, None])
+    sheet.append(['PE0002', 'Tran Thi B', 0, None])
+    path = tmp_path / 'bills.xlsx'
+    workbook.save(path)
+
+    with open(path, 'rb') as f:
+        saved = service.save_upload(FileStorage(f, filename='bills.xlsx'))
+    result = service.import_file(saved['upload'], USER_ID, job_id=3)
+
+    assert (result['imported'], result['failed']) == (1, 1)
+    assert bills(engine)['PE0001'].meter_number == '123456'
+    assert result['errors'] == [{'row': 4, 'error': 'Amount must be positive'}]
@@ -0,0 +1,102 @@
+import pytest
+from sqlalchemy import text
+
+from config.database import SessionLocal
+from models import Bill, BillStatus, Customer
+from services.bill_link_service import BillLinkService
+from services.customer_service import CustomerService
+
+pytestmark = pytest.mark.database
+
+
+def _add_bills(*bills):
+    db = SessionLocal()
+    try:
+        for i, (name, address) in enumerate(bills):
+            db.add(Bill(contract_code=f'PB{name[:3]}{address or ""}{i}', customer_name=name,
+                        address=address, amount=100_000, status=BillStatus.IN_WAREHOUSE))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _links():
+    db = SessionLocal()
+    try:
+        return {bill.contract_code: bill.customer_id for bill in db.query(Bill).order_by(Bill.id)}
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def customers(seed_user):
+    service = CustomerService()
+    ids = {}
+    for name, phone, address in [
+        ('Nguyễn Văn An', '0901000001', '12 Lê Lợi'),
+        ('Trần Bình', '0901000002', None),
+        ('Lê Hoa', '0901000003', '1 Hai Bà Trưng'),
+        ('Lê Hoa', '0901000004', '2 Pasteur'),
+    ]:
+        result = service.create_customer({'name': name, 'phone': phone, 'address': address,
+                                          'customerType': 'INDIVIDUAL', 'status': 'ACTIVE'}, seed_user)
+        assert result['success'], result.get('error')
+        ids[phone] = result['customer']['id']
+    return ids
+
+
+def test_bills_link_only_to_unambiguous_customers(customers):
+    _add_bills(
+        ('NGUYEN VAN AN', '12 le loi'),      # name + address
+        ('Nguyễn Văn An', '99 Điện Biên'),   # address disagrees
+        ('tran binh', '5 Nguyễn Huệ'),        # unique name, customer has no address
+        ('Lê Hoa', '2 pasteur'),              # ambiguous name, address decides
+        ('Lê Hoa', '7 Lý Tự Trọng'),          # ambiguous name, no address match
+    )
+
+    result = BillLinkService().link_bills()
+
+    assert result['success'], result.get('error')
+    assert result['run']['bills_scanned'] == 5
+    assert result['run']['bills_linked'] == 3
+    assert list(_links().values()) == [
+        customers['0901000001'], None, customers['0901000002'], customers['0901000004'], None
+    ]
+
+    db = SessionLocal()
+    try:
+        assert db.get(Customer, customers['0901000002']).total_bills == 1
+    finally:
+        db.close()
+
+
+def test_incremental_run_only_scans_new_bills(customers):
+    service = BillLinkService()
+    _add_bills(('Someone Else', None))
+    assert service.link_bills()['run']['bills_scanned'] == 1
+
+    _add_bills(('Trần Bình', None))
+    run = service.link_bills()['run']
+    assert run['bills_scanned'] == 1
+    assert run['bills_linked'] == 1
+
+    assert service.link_bills(full=True)['run']['bills_scanned'] == 1
+
+
+def test_rescans_do_not_rewrite_bills_whose_keys_are_unchanged(customers):
+    _add_bills(('Someone Else', '3 Nguyễn Huệ'))
+    service = BillLinkService()
+
+    def row_version():
+        db = SessionLocal()
+        try:
+            return db.execute(text("SELECT xmin::text, match_name FROM bills")).one()
+        finally:
+            db.close()
+
+    service.link_bills()
+    first = row_version()
+    assert first.match_name == 'someone else'
+
+    service.link_bills(full=True)
+    assert row_version() == first
@@ -0,0 +1,104 @@
+import random
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services.customer_dedup_service import CustomerDedupService
+
+pytestmark = pytest.mark.unit
+
+
+def _customer(id, name, phone, zalo=None, email=None, bank_account=None, address=None, total_bills=0):
+    return SimpleNamespace(id=id, name=name, phone=phone, zalo=zalo, email=email,
+                           bank_account=bank_account, address=address, total_bills=total_bills)
+
+
+def _report(rows, threshold=0.6):
+    service = CustomerDedupService()
+    report = service.find_duplicates(threshold, customers=[service._prepare(row) for row in rows])
+    assert report['success'], report.get('error')
+    return report
+
+
+def test_same_phone_in_different_formats_is_a_duplicate():
+    report = _report([
+        _customer(1, 'Nguyễn Văn An', '0901 234 567'),
+        _customer(2, 'Nguyen Van An', '+84901234567', total_bills=3),
+        _customer(3, 'Trần Thị Bình', '0912345678'),
+    ])
+
+    assert len(report['clusters']) == 1
+    cluster = report['clusters'][0]
+    assert cluster['primary_id'] == 2  # most bills wins
+    assert cluster['duplicate_ids'] == [1]
+    assert set(cluster['pairs'][0]['reasons']) == {'phone', 'name'}
+
+
+def test_bank_account_and_similar_name_link_different_phones():
+    report = _report([
+        _customer(1, 'Lê Minh Tâm', '0901000001', bank_account='0123 456 789'),
+        _customer(2, 'Lê Tâm', '0901000002', bank_account='0123456789'),
+    ])
+
+    assert [c['primary_id'] for c in report['clusters']] == [1]
+
+
+def test_same_name_alone_is_not_enough():
+    rows = [
+        _customer(1, 'Phạm Hùng', '0901000001'),
+        _customer(2, 'Phạm Hùng', '0901000002'),
+    ]
+
+    assert _report(rows)['clusters'] == []
+    assert len(_report(rows, threshold=0.4)['clusters']) == 1
+
+
+def test_same_name_at_the_same_address_is_a_duplicate():
+    report = _report([
+        _customer(1, 'Đặng Thu Hà', '0901000001', address='12 Lê Lợi, Q.1'),
+        _customer(2, 'Dang Thu Ha', '0901000002', address='12 le loi q 1'),
+        _customer(3, 'Đặng Thu Hà', '0901000003', address='5 Nguyễn Huệ'),
+    ])
+
+    assert [cluster['duplicate_ids'] for cluster in report['clusters']] == [[2]]
+
+
+def test_clusters_are_transitive():
+    report = _report([
+        _customer(1, 'Võ Lan', '0901000001', email='lan@example.com'),
+        _customer(2, 'Võ Thị Lan', '0901000001'),
+        _customer(3, 'Vo Lan', '0901000003', email='LAN@example.com'),
+        _customer(4, 'Võ Lan', '0901000004', email='lan@example.com'),
+    ])
+
+    assert len(report['clusters']) == 1
+    assert sorted(report['clusters'][0]['duplicate_ids']) == [2, 3, 4]
+
+
+@pytest.mark.slow
+def test_report_for_100k_customers_takes_seconds():
+    rng = random.Random(11)
+    family = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng', 'Bùi', 'Đỗ', 'Hồ', 'Ngô', 'Dương']
+    middle = ['Văn', 'Thị', 'Minh', 'Quốc', 'Thanh', 'Ngọc', 'Hữu', 'Đức', 'Kim', 'Gia']
+    given = ['Anh', 'Bình', 'Châu', 'Dũng', 'Giang', 'Hà', 'Hải', 'Hoa', 'Hùng', 'Khánh', 'Lan', 'Linh',
+             'Nam', 'Phúc', 'Quân', 'Sơn', 'Thảo', 'Trang', 'Tuấn', 'Vy', 'Yến', 'Long', 'Nhi', 'Tâm']
+    rows = [
+        _customer(i, f'{rng.choice(family)} {rng.choice(middle)} {rng.choice(given)}', f'09{i:08d}',
+                  bank_account=f'{rng.randrange(10 ** 9):010d}')
+        for i in range(100_000)
+    ]
+    # 500 planted duplicates sharing a reformatted phone number
+    for j in range(500):
+        original = rows[j * 150]
+        rows.append(_customer(100_000 + j, original.name.upper(), '+84' + original.phone[1:]))
+
+    started = time.perf_counter()
+    report = _report(rows)
+    elapsed = time.perf_counter() - started
+    print(f"\ndedup over {len(rows)} customers: {elapsed:.2f}s, {report['pairs_scored']} pairs scored")
+
+    planted = {(j * 150, 100_000 + j) for j in range(500)}
+    found = {(c['primary_id'], d) for c in report['clusters'] for d in c['duplicate_ids']}
+    assert planted <= found
+    assert elapsed < 10
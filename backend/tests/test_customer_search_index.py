@@ -0,0 +1,133 @@
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services import customer_search_index as search_index_module
+from services.customer_search_index import CustomerSearchIndex
+from utils.shared_state import SharedState
+from utils.table_versions import TableVersions
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def index():
+    index = CustomerSearchIndex()
+    index.load_rows([
+        (1, 'Nguyễn Văn Đức', '0901234567', None),
+        (2, 'Nguyễn Thị Hoa', '+84 912 345 678', '0912345678'),
+        (3, 'Trần Đức Anh', '0987654321', 'tranducanh'),
+    ])
+    return index
+
+
+def test_name_prefix_is_accent_insensitive(index):
+    assert [c['id'] for c in index.search('duc')] == [1, 3]
+    assert [c['id'] for c in index.search('Nguyễn')] == [1, 2]
+
+
+def test_every_token_must_match(index):
+    assert [c['id'] for c in index.search('ng h')] == [2]
+    assert index.search('tran hoa') == []
+
+
+def test_phone_prefix_matches_national_and_international_forms(index):
+    assert [c['id'] for c in index.search('0912')] == [2]
+    assert [c['id'] for c in index.search('+84 912 3')] == [2]
+    assert [c['id'] for c in index.search('98765')] == [3]
+
+
+def test_results_are_slim(index):
+    assert index.search('hoa') == [{'id': 2, 'name': 'Nguyễn Thị Hoa', 'phone': '+84 912 345 678'}]
+
+
+def test_upsert_and_remove_keep_index_current(index):
+    index.upsert(SimpleNamespace(id=1, name='Lê Văn Đức', phone='0901234567', zalo=None, is_active=True))
+    assert [c['id'] for c in index.search('nguyen')] == [2]
+    assert [c['id'] for c in index.search('le')] == [1]
+
+    index.upsert(SimpleNamespace(id=4, name='Phạm Minh', phone='0933000111', zalo=None, is_active=True))
+    assert [c['id'] for c in index.search('0933')] == [4]
+
+    index.remove([3])
+    assert [c['id'] for c in index.search('duc')] == [1]
+
+    index.upsert(SimpleNamespace(id=2, name='Nguyễn Thị Hoa', phone='0912345678', zalo=None, is_active=False))
+    assert index.search('hoa') == []
+
+
+def test_limit(index):
+    assert len(index.search('n', limit=1)) == 1
+
+
+@pytest.mark.slow
+def test_lookup_latency_for_100k_customers():
+    rng = random.Random(3)
+    family = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng']
+    given = ['Anh', 'Bình', 'Châu', 'Dũng', 'Đức', 'Giang', 'Hà', 'Hải', 'Hoa', 'Hùng', 'Khánh', 'Lan', 'Linh', 'Minh', 'Nam', 'Phúc', 'Quân', 'Sơn', 'Thảo', 'Trang']
+    index = CustomerSearchIndex()
+    index.load_rows(
+        (i, f'{rng.choice(family)} {rng.choice(given)} {rng.choice(given)}', f'09{i:08d}', None)
+        for i in range(100_000)
+    )
+
+    queries = ['n', 'ng', 'nguyen', 'nguyen hoa', 'tran d', 'pham minh th', '09', '0900012', '90009']
+    started = time.perf_counter()
+    for _ in range(20):
+        for query in queries:
+            assert index.search(query, limit=10)
+    elapsed = (time.perf_counter() - started) / (20 * len(queries))
+    print(f'\ncustomer typeahead over 100k customers: {elapsed * 1000:.3f} ms per lookup')
+
+    assert elapsed < 0.005
+
+
+def test_first_load_does_not_hold_the_index_lock():
+    index = CustomerSearchIndex()
+    reading = threading.Event()
+    release = threading.Event()
+
+    def slow_load():
+        reading.set()
+        release.wait(5)
+        return index.load_rows([(1, 'Nguyễn Văn Đức', '0901234567', None)])
+
+    index.load = slow_load
+    searcher = threading.Thread(target=index.search, args=('duc',))
+    searcher.start()
+    assert reading.wait(5)
+
+    # Writers and the index lock stay available while customers are read
+    assert index._lock.acquire(timeout=1)
+    index._lock.release()
+    index.warm_up()  # no second load while one is running
+
+    release.set()
+    searcher.join(5)
+    assert [c['id'] for c in index.search('duc')] == [1]
+
+
+def test_only_other_processes_customer_writes_trigger_a_rebuild(index, monkeypatch):
+    state = SharedState()
+    ours, theirs = TableVersions(), TableVersions()
+    ours.use_backend(state, refresh_seconds=0)
+    theirs.use_backend(state, refresh_seconds=0)
+    monkeypatch.setattr(search_index_module, 'table_versions', ours)
+    monkeypatch.setattr(index, 'VERSION_CHECK_SECONDS', 0)
+    monkeypatch.setattr(index, 'RELOAD_MIN_SECONDS', 0)
+    reloaded = threading.Event()
+    monkeypatch.setattr(index, 'load', reloaded.set)
+    index._version = index._table_version()
+
+    # Already applied through upsert/remove by the service that wrote
+    ours.bump(['customers'])
+    ours.bump(['customers', 'sales'])
+    index.search('duc')
+    assert not reloaded.is_set()
+
+    theirs.bump(['customers'])
+    index.search('duc')
+    assert reloaded.wait(5)
@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import insert
+
+from config.database import SessionLocal
+from models import Customer
+from services.customer_service import CustomerService
+
+pytestmark = pytest.mark.database
+
+
+@pytest.fixture
+def customers_by_month(seed_user):
+    created = [
+        datetime(2024, 1, 5, 12, tzinfo=timezone.utc),
+        datetime(2024, 1, 31, 12, tzinfo=timezone.utc),
+        datetime(2024, 3, 15, 12, tzinfo=timezone.utc),
+        datetime(2024, 5, 1, 12, tzinfo=timezone.utc),
+    ]
+    db = SessionLocal()
+    try:
+        db.execute(insert(Customer), [
+            {'name': f'Customer {i}', 'phone': f'09{i:08d}', 'created_by': seed_user,
+             'created_at': created_at, 'is_active': i != 0}
+            for i, created_at in enumerate(created)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_monthly_growth_covers_every_calendar_month(customers_by_month):
+    result = CustomerService().get_customer_statistics('2024-01', '2024-04')
+
+    assert result['success'], result.get('error')
+    statistics = result['statistics']
+    assert statistics['total_customers'] == 4
+    assert statistics['active_customers'] == 3
+    assert statistics['monthly_growth'] == [
+        {'month': '2024-01', 'count': 2},
+        {'month': '2024-02', 'count': 0},
+        {'month': '2024-03', 'count': 1},
+        {'month': '2024-04', 'count': 0},
+    ]
+
+
+def test_statistics_are_cached_until_a_customer_write(customers_by_month, seed_user):
+    service = CustomerService()
+    first = service.get_customer_statistics('2024-01', '2024-12')
+    assert service.get_customer_statistics('2024-01', '2024-12') is first
+
+    service.create_customer({'name': 'New', 'phone': '0999999999', 'customerType': 'INDIVIDUAL', 'status': 'ACTIVE'}, seed_user)
+    refreshed = service.get_customer_statistics('2024-01', '2024-12')
+    assert refreshed is not first
+    assert refreshed['statistics']['total_customers'] == 5
+
+
+def test_statistics_cache_keeps_only_recent_ranges(customers_by_month):
+    service = CustomerService()
+    service.STATISTICS_CACHE_SIZE = 2
+    january = service.get_customer_statistics('2024-01', '2024-01')
+    service.get_customer_statistics('2024-01', '2024-02')
+    assert service.get_customer_statistics('2024-01', '2024-01') is january
+
+    service.get_customer_statistics('2024-01', '2024-03')
+    assert len(service._statistics_cache) == 2
+    # February was the least recently used range
+    assert [key[2].month for key in service._statistics_cache] == [1, 3]
+
+
+def test_invalid_range_is_rejected():
+    result = CustomerService().get_customer_statistics('2024-05', '2024-01')
+    assert not result['success']
@@ -0,0 +1,97 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import update
+
+from config.database import SessionLocal
+from models import Bill, BillStatus, Customer
+from services.bill_link_service import BillLinkService
+from services.customer_service import CustomerService
+from services.sales_service import SalesService
+
+pytestmark = pytest.mark.database
+
+
+@pytest.fixture
+def customer(seed_user):
+    result = CustomerService().create_customer({'name': 'Phạm Minh', 'phone': '0902000001', 'address': None,
+                                                'customerType': 'INDIVIDUAL', 'status': 'ACTIVE'}, seed_user)
+    assert result['success'], result.get('error')
+    return {'id': result['customer']['id'], 'user_id': seed_user}
+
+
+def _add_bills(count, customer_name='Kho', amount=100_000):
+    db = SessionLocal()
+    try:
+        bills = [Bill(contract_code=f'PT{customer_name[:2]}{i:04d}', customer_name=customer_name,
+                      amount=amount, status=BillStatus.IN_WAREHOUSE) for i in range(count)]
+        db.add_all(bills)
+        db.flush()
+        bill_ids = [bill.id for bill in bills]
+        db.commit()
+        return bill_ids
+    finally:
+        db.close()
+
+
+def _totals(customer_id):
+    db = SessionLocal()
+    try:
+        customer = db.get(Customer, customer_id)
+        return customer.total_bills, float(customer.total_amount)
+    finally:
+        db.close()
+
+
+def _sell(customer, bill_ids):
+    result = SalesService().create_sale({'customer_id': customer['id'], 'bill_ids': bill_ids,
+                                         'profit_percentage': 5}, customer['user_id'])
+    assert result['success'], result.get('error')
+    return result['sale']['id']
+
+
+def test_totals_follow_sales_being_created_and_cancelled(customer):
+    bill_ids = _add_bills(3)
+
+    first = _sell(customer, bill_ids[:2])
+    _sell(customer, bill_ids[2:])
+    assert _totals(customer['id']) == (2, 300_000.0)
+
+    assert SalesService().cancel_sale(first, 'test')['success']
+    assert _totals(customer['id']) == (1, 100_000.0)
+
+
+def test_totals_follow_bills_being_linked(customer):
+    _add_bills(2, customer_name='Phạm Minh', amount=50_000)
+
+    assert BillLinkService().link_bills()['run']['bills_linked'] == 2
+    assert _totals(customer['id']) == (2, 100_000.0)
+
+
+def test_concurrent_sales_to_one_customer_keep_every_sale_in_the_totals(customer):
+    bill_ids = _add_bills(40)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda bill_id: _sell(customer, [bill_id]), bill_ids))
+
+    assert _totals(customer['id']) == (40, 4_000_000.0)
+
+
+def test_reconcile_reports_and_repairs_drift(customer):
+    _sell(customer, _add_bills(1))
+    db = SessionLocal()
+    try:
+        db.execute(update(Customer).where(Customer.id == customer['id']).values(total_bills=7, total_amount=1))
+        db.commit()
+    finally:
+        db.close()
+    service = CustomerService()
+
+    report = service.reconcile_customer_totals(fix=False)
+    assert (report['checked'], report['drifted']) == (1, 1)
+    assert report['customers'][0]['expected_bills'] == 1
+    assert _totals(customer['id']) == (7, 1.0)
+
+    assert service.reconcile_customer_totals()['drifted'] == 1
+    assert _totals(customer['id']) == (1, 100_000.0)
+    assert service.reconcile_customer_totals()['drifted'] == 0
@@ -0,0 +1,48 @@
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, text
+
+from utils.db_metrics import DbMetrics
+from utils.metrics import Histogram, format_histogram
+
+pytestmark = pytest.mark.unit
+
+
+def test_histogram_is_cumulative():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value)
+
+    assert format_histogram('latency_seconds', histogram, {'route': 'x'}) == [
+        'latency_seconds_bucket{route="x",le="0.1"} 1',
+        'latency_seconds_bucket{route="x",le="1"} 3',
+        'latency_seconds_bucket{route="x",le="+Inf"} 4',
+        'latency_seconds_sum{route="x"} 4.05',
+        'latency_seconds_count{route="x"} 4',
+    ]
+
+
+def test_queries_are_counted_per_request_and_rendered():
+    engine = create_engine('sqlite://')
+    metrics = DbMetrics()
+    metrics.install(engine)
+
+    app = Flask(__name__)
+    app.config['DB_METRICS_HEADER'] = True
+    metrics.init_app(app)
+
+    @app.route('/two-queries')
+    def two_queries():
+        with engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+            conn.execute(text('SELECT 2'))
+        return 'ok'
+
+    response = app.test_client().get('/two-queries')
+
+    assert response.headers['X-DB-Stats'].startswith('queries=2;')
+    rendered = metrics.render()
+    assert 'db_query_duration_seconds_count 2' in rendered
+    assert 'db_queries_per_request_bucket{le="2"} 1' in rendered
+    assert 'db_pool_checkouts_total 1' in rendered
+    assert 'db_slowest_query_seconds{statement="SELECT' in rendered
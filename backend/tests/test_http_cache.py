@@ -0,0 +1,96 @@
+import gzip
+
+import pytest
+from flask import Flask, jsonify
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required
+from sqlalchemy import create_engine, event, text
+
+from utils.http_cache import ResponseCompression, conditional_get
+from utils.table_versions import TableVersions, table_versions
+
+pytestmark = pytest.mark.unit
+
+
+def test_versions_bump_on_commit_only():
+    engine = create_engine('sqlite://')
+    versions = TableVersions()
+    versions.install(engine)
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE bills (id INTEGER PRIMARY KEY, amount INTEGER)'))
+
+    with engine.connect() as conn:
+        conn.execute(text('INSERT INTO bills (amount) VALUES (1)'))
+        conn.rollback()
+    assert versions.get(['bills']) == (0,)
+
+    with engine.begin() as conn:
+        conn.execute(text('INSERT INTO "bills" (amount) VALUES (1)'))
+        conn.execute(text('UPDATE bills SET amount = 2'))
+        conn.execute(text('SELECT * FROM bills'))
+    assert versions.snapshot() == {'bills': 1}
+
+
+def test_versions_bump_only_after_the_dbapi_commit():
+    engine = create_engine('sqlite://')
+    versions = TableVersions()
+    versions.install(engine)
+    seen_at_commit = []
+    event.listen(engine, 'commit', lambda conn: seen_at_commit.append(versions.get(['bills'])))
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE bills (id INTEGER PRIMARY KEY, amount INTEGER)'))
+
+    with engine.begin() as conn:
+        conn.execute(text('INSERT INTO bills (amount) VALUES (1)'))
+
+    assert seen_at_commit[-1] == (0,)
+    assert versions.get(['bills']) == (1,)
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config.update(JWT_SECRET_KEY='test', COMPRESS_MIN_SIZE=100)
+    JWTManager(app)
+    ResponseCompression().init_app(app)
+    app.calls = 0
+
+    @app.route('/bills')
+    @jwt_required()
+    @conditional_get('etag_test_bills')
+    def bills():
+        app.calls += 1
+        return jsonify({'bills': [{'contract_code': f'PB{i}'} for i in range(50)]})
+
+    with app.app_context():
+        token = create_access_token(identity='1')
+    client = app.test_client()
+    client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    return client
+
+
+def test_matching_etag_returns_304_without_running_the_view(client):
+    first = client.get('/bills')
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    again = client.get('/bills', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert client.application.calls == 1
+
+    table_versions.bump(['etag_test_bills'])
+    changed = client.get('/bills', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_etag_depends_on_query_parameters(client):
+    etag = client.get('/bills?page=1').headers['ETag']
+    assert client.get('/bills?page=2', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_large_json_is_compressed(client):
+    response = client.get('/bills', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert b'PB49' in gzip.decompress(response.data)
+    assert client.get('/bills').headers.get('Content-Encoding') is None
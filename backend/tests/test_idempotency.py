@@ -0,0 +1,141 @@
+from datetime import timedelta
+
+import pytest
+from flask import Flask, jsonify, request
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.pool import StaticPool
+
+from models.idempotency_key import IdempotencyKey
+from utils import idempotency
+from utils.idempotency import idempotent
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def app(monkeypatch):
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    IdempotencyKey.__table__.create(engine)
+    monkeypatch.setattr(idempotency, 'engine', engine)
+
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test'
+    JWTManager(app)
+    app.calls = []
+
+    @app.route('/api/sales/', methods=['POST'])
+    @jwt_required()
+    @idempotent
+    def create_sale():
+        data = request.get_json()
+        app.calls.append(data)
+        if data.get('fail'):
+            return jsonify({'error': 'database unavailable'}), 500
+        if data.get('raise'):
+            raise RuntimeError('connection lost after commit')
+        return jsonify({'success': True, 'sale': {'id': len(app.calls)}}), 201
+
+    return app
+
+
+def headers(app, key=None, user='1'):
+    with app.app_context():
+        token = create_access_token(identity=user)
+    result = {'Authorization': f'Bearer {token}'}
+    if key:
+        result['Idempotency-Key'] = key
+    return result
+
+
+def test_retry_with_same_key_replays_the_first_response(app):
+    client = app.test_client()
+    first = client.post('/api/sales/', json={'bill_ids': [1]}, headers=headers(app, 'k1'))
+    retry = client.post('/api/sales/', json={'bill_ids': [1]}, headers=headers(app, 'k1'))
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.get_json() == first.get_json() == {'success': True, 'sale': {'id': 1}}
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+    assert len(app.calls) == 1
+
+
+def test_requests_without_key_or_with_other_keys_run(app):
+    client = app.test_client()
+    client.post('/api/sales/', json={'bill_ids': [1]}, headers=headers(app))
+    client.post('/api/sales/', json={'bill_ids': [1]}, headers=headers(app))
+    client.post('/api/sales/', json={'bill_ids': [1]}, headers=headers(app, 'k2'))
+    # Keys are per user
+    client.post('/api/sales/', json={'bill_ids': [1]}, headers=headers(app, 'k2', user='2'))
+    assert len(app.calls) == 4
+
+
+def test_key_reused_for_different_body_is_rejected(app):
+    client = app.test_client()
+    client.post('/api/sales/', json={'bill_ids': [1]}, headers=headers(app, 'k3'))
+    response = client.post('/api/sales/', json={'bill_ids': [2]}, headers=headers(app, 'k3'))
+    assert response.status_code == 422
+    assert len(app.calls) == 1
+
+
+def test_server_errors_leave_the_key_unfinished(app):
+    client = app.test_client()
+    assert client.post('/api/sales/', json={'fail': True}, headers=headers(app, 'k4')).status_code == 500
+    # The view may have committed before failing, so it is not run again
+    assert client.post('/api/sales/', json={'fail': True}, headers=headers(app, 'k4')).status_code == 409
+    assert len(app.calls) == 1
+
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+    assert client.post('/api/sales/', json={'raise': True}, headers=headers(app, 'k8')).status_code == 500
+    assert client.post('/api/sales/', json={'raise': True}, headers=headers(app, 'k8')).status_code == 409
+    assert len(app.calls) == 2
+
+
+def test_unfinished_key_gets_409_until_it_expires(app):
+    client = app.test_client()
+    table = IdempotencyKey.__table__
+    client.post('/api/sales/', json={'bill_ids': [1]}, headers=headers(app, 'k5'))
+    # As if the first request were still running, or its worker died after committing
+    with idempotency.engine.begin() as conn:
+        conn.execute(update(table).values(status_code=None, started_at=idempotency._now() - timedelta(hours=1)))
+
+    response = client.post('/api/sales/', json={'bill_ids': [1]}, headers=headers(app, 'k5'))
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+    assert len(app.calls) == 1
+
+    with idempotency.engine.begin() as conn:
+        conn.execute(update(table).values(expires_at=idempotency._now() - timedelta(seconds=1)))
+    assert client.post('/api/sales/', json={'bill_ids': [1]}, headers=headers(app, 'k5')).status_code == 201
+    assert len(app.calls) == 2
+
+
+def test_committed_response_is_returned_when_storing_it_fails(app, monkeypatch):
+    def broken_store(scope, key, response):
+        raise RuntimeError('database unavailable')
+
+    monkeypatch.setattr(idempotency, '_store', broken_store)
+    client = app.test_client()
+    first = client.post('/api/sales/', json={'bill_ids': [1]}, headers=headers(app, 'k7'))
+    assert first.status_code == 201
+
+    # The sale exists, so the retry must not create another one
+    assert client.post('/api/sales/', json={'bill_ids': [1]}, headers=headers(app, 'k7')).status_code == 409
+    assert len(app.calls) == 1
+
+
+def test_expired_keys_run_again_and_are_purged(app):
+    client = app.test_client()
+    table = IdempotencyKey.__table__
+    client.post('/api/sales/', json={'bill_ids': [1]}, headers=headers(app, 'k6'))
+    with idempotency.engine.begin() as conn:
+        conn.execute(update(table).values(expires_at=idempotency._now() - timedelta(seconds=1)))
+
+    client.post('/api/sales/', json={'bill_ids': [1]}, headers=headers(app, 'k6'))
+    assert len(app.calls) == 2
+
+    with idempotency.engine.begin() as conn:
+        conn.execute(update(table).values(expires_at=idempotency._now() - timedelta(seconds=1)))
+    assert idempotency.purge_expired() == 1
+    with idempotency.engine.connect() as conn:
+        assert conn.execute(select(table.c.key)).all() == []
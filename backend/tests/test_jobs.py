@@ -0,0 +1,180 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.pool import StaticPool
+
+import models  # noqa: F401 - the jobs table references users
+from models.job import Job, JobStatus
+from services import job_service as job_service_module
+from services.job_service import JobService, JobWorker
+
+pytestmark = pytest.mark.unit
+
+WORKER = 'test-host:1:0'
+
+
+@pytest.fixture
+def service(monkeypatch):
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    Job.__table__.create(engine)
+    monkeypatch.setattr(job_service_module, 'engine', engine)
+
+    service = JobService()
+    events = []
+    service._emit = lambda name, data: events.append(data)
+    service.events = events
+    return service
+
+
+def run_next(service):
+    job = service.claim_next(WORKER)
+    assert job is not None
+    service.run_job(job, WORKER)
+    return service.get_job(job['id'])['job']
+
+
+def test_job_runs_once_and_stores_its_result(service):
+    @service.handler('export')
+    def export(context):
+        context.progress(1, 2, 'halfway')
+        return {'success': True, 'rows': context.payload['rows']}
+
+    queued = service.enqueue('export', {'rows': 3}, user_id=7)
+    assert queued['success']
+    assert queued['job']['status'] == JobStatus.PENDING
+
+    job = run_next(service)
+    assert job['status'] == JobStatus.SUCCEEDED
+    assert job['attempts'] == 1
+    assert (job['progress'], job['total'], job['message']) == (1, 2, 'halfway')
+    assert service.get_job_result(job['id'])['result'] == '{"success":true,"rows":3}'
+
+    # Nothing left to claim, and other users cannot see the job
+    assert service.claim_next(WORKER) is None
+    assert not service.get_job(job['id'], user_id=8)['success']
+    assert [e['status'] for e in service.events] == ['PENDING', 'RUNNING', 'RUNNING', 'SUCCEEDED']
+
+
+def test_failed_job_is_retried_with_backoff_then_failed(service):
+    @service.handler('flaky', max_attempts=2)
+    def flaky(context):
+        raise ValueError(f'attempt {context.attempt} broke')
+
+    job_id = service.enqueue('flaky')['job']['id']
+
+    job = run_next(service)
+    assert job['status'] == JobStatus.PENDING
+    assert job['error'] == 'attempt 1 broke'
+    # Backed off: not due yet
+    assert service.claim_next(WORKER) is None
+
+    with job_service_module.engine.begin() as conn:
+        conn.execute(update(Job).where(Job.id == job_id).values(run_at=service._now()))
+
+    job = run_next(service)
+    assert job['status'] == JobStatus.FAILED
+    assert job['attempts'] == 2
+    assert job['error'].startswith('attempt 2 broke')
+
+
+def test_unsuccessful_result_fails_the_attempt(service):
+    service.handler('noop', max_attempts=1)(lambda context: {'success': False, 'error': 'no data'})
+    service.enqueue('noop')
+
+    job = run_next(service)
+    assert job['status'] == JobStatus.FAILED
+    assert job['error'].startswith('no data')
+
+
+def test_cancel_pending_and_running_jobs(service):
+    finished = []
+
+    @service.handler('long')
+    def long_job(context):
+        service.cancel_job(context.job_id)
+        context.progress(1, 1)
+        finished.append(context.job_id)
+        return {'success': True}
+
+    pending = service.enqueue('long')['job']
+    cancelled = service.cancel_job(pending['id'])
+    assert cancelled['job']['status'] == JobStatus.CANCELLED
+
+    service.enqueue('long')
+    job = run_next(service)
+    assert job['status'] == JobStatus.CANCELLED
+    assert job['cancel_requested'] is True
+    assert finished == []
+
+
+def test_unknown_and_admin_only_kinds_are_rejected(service):
+    service.handler('purge', admin_only=True)(lambda context: {'success': True})
+
+    assert 'Unknown job kind' in service.enqueue('nope')['error']
+    assert not service.enqueue('purge', admin=False)['success']
+    assert service.kinds(admin=False) == []
+    assert service.kinds(admin=True) == ['purge']
+
+
+def test_stale_running_job_is_requeued(service):
+    service.handler('slow')(lambda context: {'success': True})
+    job_id = service.enqueue('slow')['job']['id']
+    assert service.claim_next(WORKER)['id'] == job_id
+
+    with job_service_module.engine.begin() as conn:
+        conn.execute(update(Job).where(Job.id == job_id).values(heartbeat_at=service._now().replace(year=2000)))
+
+    assert service.requeue_stale() == 1
+    assert service.get_job(job_id)['job']['status'] == JobStatus.PENDING
+    # The old worker learns it lost the job
+    assert service.report_progress(job_id, WORKER, 1, None, None) is True
+
+
+def test_heartbeat_is_refreshed_while_a_handler_blocks(service, monkeypatch):
+    monkeypatch.setattr(service, 'HEARTBEAT_SECONDS', 0.01)
+    heartbeats = []
+
+    @service.handler('report')
+    def report(context):
+        with job_service_module.engine.begin() as conn:
+            conn.execute(update(Job).where(Job.id == context.job_id)
+                         .values(heartbeat_at=service._now().replace(year=2000)))
+        time.sleep(0.2)  # one long query, no progress reported
+        with job_service_module.engine.connect() as conn:
+            heartbeats.append(conn.scalar(select(Job.heartbeat_at).where(Job.id == context.job_id)))
+        return {'success': True}
+
+    service.enqueue('report')
+
+    assert run_next(service)['status'] == JobStatus.SUCCEEDED
+    assert heartbeats[0].year > 2000
+
+
+def test_worker_keeps_running_when_a_job_cannot_be_finished(service, monkeypatch):
+    service.handler('export')(lambda context: {'success': True})
+    first = service.enqueue('export')['job']['id']
+    second = service.enqueue('export')['job']['id']
+    finish = service._finish
+    failed = []
+
+    def finish_once_broken(job, *args, **kwargs):
+        if not failed:
+            failed.append(job['id'])
+            raise RuntimeError('database went away')
+        return finish(job, *args, **kwargs)
+
+    monkeypatch.setattr(service, '_finish', finish_once_broken)
+    worker = JobWorker(service)
+    worker.start(threads=1, poll_seconds=0.01)
+    try:
+        deadline = time.monotonic() + 5
+        while service.get_job(second)['job']['status'] != JobStatus.SUCCEEDED and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        worker.stop(5)
+
+    assert failed == [first]
+    assert service.get_job(second)['job']['status'] == JobStatus.SUCCEEDED
+    # Left RUNNING for requeue_stale
+    assert service.get_job(first)['job']['status'] == JobStatus.RUNNING
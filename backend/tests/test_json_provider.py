@@ -0,0 +1,71 @@
+import json
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+from flask import Flask, jsonify, request
+
+from models.bill import Bill, BillStatus
+from utils.json_provider import FastJSONProvider, orjson
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def app(request):
+    if request.param == 'orjson' and orjson is None:
+        pytest.skip('orjson is not installed')
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    app.json.use_orjson = request.param == 'orjson'
+    return app
+
+
+def make_bill():
+    return Bill(
+        id=1,
+        contract_code='PB02020040261',
+        customer_name='Nguyễn Văn A',
+        amount=Decimal('1500000.50'),
+        due_date=datetime(2026, 10, 1, 8, 30, 15, 120000, tzinfo=timezone.utc),
+        status=BillStatus.IN_WAREHOUSE,
+        raw_response={'data': {'amount': 1500000}},
+    )
+
+
+def test_raw_model_values_encode_like_the_old_to_dict(app):
+    with app.app_context():
+        encoded = json.loads(app.json.dumps(make_bill().to_dict()))
+
+    assert encoded['amount'] == 1500000.5
+    assert encoded['due_date'] == '2026-10-01T08:30:15.120000+00:00'
+    assert encoded['status'] == 'IN_WAREHOUSE'
+    assert encoded['customer_name'] == 'Nguyễn Văn A'
+    assert encoded['created_at'] is None
+
+
+def test_backends_produce_equivalent_output():
+    if orjson is None:
+        pytest.skip('orjson is not installed')
+    app = Flask(__name__)
+    fast, stdlib = FastJSONProvider(app), FastJSONProvider(app)
+    stdlib.use_orjson = False
+    payload = {'bills': [make_bill().to_dict()], 'day': date(2026, 1, 2)}
+
+    assert json.loads(fast.encode(payload)) == json.loads(stdlib.encode(payload))
+
+
+def test_jsonify_and_request_parsing(app):
+    @app.route('/echo', methods=['POST'])
+    def echo():
+        return jsonify({'received': request.get_json(), 'total': Decimal('2.5')})
+
+    response = app.test_client().post('/echo', json={'contract_code': 'PB1'})
+
+    assert response.mimetype == 'application/json'
+    assert response.get_json() == {'received': {'contract_code': 'PB1'}, 'total': 2.5}
+
+
+def test_unknown_types_still_raise(app):
+    with app.app_context(), pytest.raises(TypeError):
+        app.json.dumps({'value': object()})
@@ -0,0 +1,32 @@
+import pytest
+
+from utils.normalization import name_tokens, phone_digits, phone_e164
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.mark.parametrize('phone', [
+    '0901234567',
+    '0901 234 567',
+    '090-123-4567',
+    '+84901234567',
+    '+84 901 234 567',
+    '84901234567',
+    '0084901234567',
+])
+def test_phone_e164_collapses_vietnamese_formats(phone):
+    assert phone_e164(phone) == '+84901234567'
+
+
+def test_phone_e164_keeps_foreign_numbers_and_rejects_garbage():
+    assert phone_e164('+1 650 555 0100') == '+16505550100'
+    assert phone_e164('123') is None
+    assert phone_e164(None) is None
+
+
+def test_phone_digits_is_national_form():
+    assert phone_digits('+84 901 234 567') == '0901234567'
+
+
+def test_name_tokens_strip_diacritics():
+    assert name_tokens('Nguyễn Văn  Đức') == ['nguyen', 'van', 'duc']
@@ -0,0 +1,92 @@
+import logging
+from decimal import Decimal
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from config.database import Base
+from models import Customer, PaymentMethod, Sale, User
+from services.sales_service import SALE_SUMMARY_LOAD
+from utils.nplusone import NPlusOneDetector, NPlusOneError
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def detector():
+    return NPlusOneDetector()
+
+
+@pytest.fixture
+def sqlite_engine(detector):
+    engine = create_engine('sqlite://')
+    detector.install(engine)
+    Base.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def sales(sqlite_engine):
+    with Session(sqlite_engine) as db:
+        user = User(username='staff', email='staff@example.com', password_hash='x', role='admin')
+        db.add(user)
+        db.flush()
+        for i in range(15):
+            customer = Customer(name=f'Customer {i}', phone=f'09{i:08d}', created_by=user.id)
+            db.add(customer)
+            db.flush()
+            db.add(Sale(customer_id=customer.id, user_id=user.id, total_bill_amount=Decimal('100'),
+                        profit_percentage=Decimal('5'), profit_amount=Decimal('5'),
+                        customer_payment=Decimal('95'), payment_method=PaymentMethod.CASH))
+        db.commit()
+
+
+def test_repeated_statement_over_threshold_raises(detector, sqlite_engine):
+    with pytest.raises(NPlusOneError, match='4x SELECT'):
+        with detector.track(threshold=3):
+            with sqlite_engine.connect() as conn:
+                for i in range(4):
+                    conn.execute(text('SELECT :value'), {'value': i})
+
+
+def test_lazy_loads_in_to_dict_are_caught(detector, sqlite_engine, sales):
+    with Session(sqlite_engine) as db:
+        with pytest.raises(NPlusOneError, match=r'models/sale.py:\d+ in to_dict'):
+            with detector.track(threshold=5):
+                [sale.to_dict(detail=False) for sale in db.query(Sale).all()]
+
+
+def test_eager_loaded_sales_page_passes(detector, sqlite_engine, sales):
+    with Session(sqlite_engine) as db:
+        with detector.track(threshold=1) as scope:
+            [sale.to_dict(detail=False) for sale in db.query(Sale).options(*SALE_SUMMARY_LOAD).all()]
+    assert scope.violations() == []
+
+
+def test_allow_suspends_detection(detector, sqlite_engine):
+    with detector.track(threshold=1):
+        with detector.allow(), sqlite_engine.connect() as conn:
+            for _ in range(3):
+                conn.execute(text('SELECT 1'))
+
+
+def test_flask_requests_warn_or_raise(detector, sqlite_engine, caplog):
+    app = Flask(__name__)
+    app.config.update(NPLUSONE_MODE='warn', NPLUSONE_THRESHOLD=2)
+    detector.init_app(app)
+
+    @app.route('/loop')
+    def loop():
+        with sqlite_engine.connect() as conn:
+            for _ in range(3):
+                conn.execute(text('SELECT 1'))
+        return 'ok'
+
+    with caplog.at_level(logging.WARNING):
+        assert app.test_client().get('/loop').status_code == 200
+    assert 'Repeated queries in GET /loop' in caplog.text
+
+    app.config['NPLUSONE_MODE'] = 'raise'
+    assert app.test_client().get('/loop').status_code == 500
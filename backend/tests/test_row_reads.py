@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import Session
+
+from config.database import Base
+from models import (Bill, BillStatus, Customer, CustomerTransaction, PaymentMethod, Sale,
+                    TransactionStatus, TransactionType, User)
+from services.sales_service import SALE_DETAIL_LOAD, sales_service
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(username='staff', email='staff@example.com', password_hash='x', role='admin')
+        session.add(user)
+        session.flush()
+        for i in range(3):
+            customer = Customer(name=f'Khách {i}', phone=f'09{i:08d}', created_by=user.id,
+                                total_amount=Decimal('0') if i else Decimal('300.50'))
+            session.add(customer)
+            session.flush()
+            sale = Sale(customer_id=customer.id, user_id=user.id, total_bill_amount=Decimal('300.50'),
+                        profit_percentage=Decimal('5'), profit_amount=Decimal('15.03'),
+                        customer_payment=Decimal('285.47'), payment_method=PaymentMethod.CASH)
+            session.add(sale)
+            session.flush()
+            for j in range(2):
+                session.add(Bill(contract_code=f'PB{i}{j}', customer_name=customer.name, amount=Decimal('150.25'),
+                                 status=BillStatus.PENDING_PAYMENT, raw_response='{}', sale_id=sale.id,
+                                 due_date=datetime(2026, 11, 1, tzinfo=timezone.utc)))
+            session.add(CustomerTransaction(sale_id=sale.id, transaction_type=TransactionType.PAYMENT_RECEIVED,
+                                            amount=Decimal('285.47'), status=TransactionStatus.COMPLETED))
+        session.add(Bill(contract_code='PB-WAREHOUSE', customer_name='Kho', amount=Decimal('0'),
+                         status=BillStatus.IN_WAREHOUSE))
+        session.commit()
+        yield session
+
+
+def test_bill_and_customer_rows_serialize_like_instances(db):
+    for model in (Bill, Customer):
+        instances = {item.id: item.to_dict() for item in db.query(model).all()}
+        rows = db.execute(select(*model.dict_columns())).all()
+
+        assert {row.id: model.row_to_dict(row) for row in rows} == instances
+
+    rows = db.execute(select(*Bill.dict_columns(include_raw=False))).all()
+    assert all('raw_response' not in Bill.row_to_dict(row, include_raw=False) for row in rows)
+
+
+@pytest.mark.parametrize('detail', [False, True])
+def test_sale_rows_serialize_like_instances(db, detail):
+    expected = [sale.to_dict(detail=detail) for sale in db.query(Sale).options(*SALE_DETAIL_LOAD).order_by(Sale.id)]
+    db.expunge_all()
+
+    statements = []
+    event.listen(db.get_bind(), 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    rows = db.execute(select(*Sale.dict_columns()).order_by(Sale.id)).all()
+
+    assert sales_service._sale_dicts(db, rows, detail=detail) == expected
+    # sales, customers, users, bills (+ transactions): one query each
+    assert len(statements) == (5 if detail else 4)
@@ -0,0 +1,129 @@
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+from config.database import SessionLocal, remove_session
+from models import Bill, BillStatus, Customer, CustomerTransaction, Sale, SaleStatus, TransactionType
+from routes.sales import sales_bp
+from services.sales_service import SalesService
+
+pytestmark = pytest.mark.database
+
+
+@pytest.fixture
+def client(clean_db):
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test'
+    JWTManager(app)
+    app.register_blueprint(sales_bp)
+    app.teardown_appcontext(remove_session)
+    with app.app_context():
+        token = create_access_token(identity='1')
+    client = app.test_client()
+    client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    return client
+
+
+@pytest.fixture
+def sale_ids(seed_user):
+    """Three pending sales of 100.000, 200.000 and 300.000 at 5% profit"""
+    db = SessionLocal()
+    try:
+        customer = Customer(name='Bulk Customer', phone='0900000001', created_by=seed_user)
+        db.add(customer)
+        db.flush()
+        bills = [
+            Bill(contract_code=f'PK{i}', customer_name='Bulk', amount=amount, status=BillStatus.IN_WAREHOUSE)
+            for i, amount in enumerate((100000, 200000, 300000))
+        ]
+        db.add_all(bills)
+        db.commit()
+        customer_id, bill_ids = customer.id, [bill.id for bill in bills]
+    finally:
+        db.close()
+
+    service = SalesService()
+    results = [
+        service.create_sale({'customer_id': customer_id, 'bill_ids': [bill_id], 'profit_percentage': 5}, seed_user)
+        for bill_id in bill_ids
+    ]
+    assert all(result['success'] for result in results), results
+    return [result['sale']['id'] for result in results]
+
+
+def _statuses(sale_ids):
+    db = SessionLocal()
+    try:
+        return [db.get(Sale, sale_id).status for sale_id in sale_ids]
+    finally:
+        db.close()
+
+
+def _transactions():
+    db = SessionLocal()
+    try:
+        return sorted(
+            (t.sale_id, t.transaction_type, float(t.amount), t.reference_number)
+            for t in db.query(CustomerTransaction)
+        )
+    finally:
+        db.close()
+
+
+def test_bulk_lifecycle_moves_eligible_sales_and_reports_the_rest(client, sale_ids):
+    first, second, third = sale_ids
+
+    confirmed = client.post('/api/sales/bulk/confirm-payment', json={'sale_ids': [first, second, 9999]})
+    assert confirmed.status_code == 200
+    assert confirmed.get_json()['summary'] == {'total': 3, 'successful': 2, 'failed': 1}
+    assert _transactions() == [
+        (first, TransactionType.PAYMENT_RECEIVED, 100000.0, None),
+        (second, TransactionType.PAYMENT_RECEIVED, 200000.0, None),
+    ]
+
+    completed = client.post('/api/sales/bulk/complete', json={'sale_ids': [first, third]})
+    assert [outcome['success'] for outcome in completed.get_json()['bulk_results']] == [True, False]
+
+    cancelled = client.post('/api/sales/bulk/cancel', json={'sale_ids': [first, second, third], 'reason': 'test'})
+    assert [outcome['success'] for outcome in cancelled.get_json()['bulk_results']] == [False, True, True]
+
+    assert _statuses(sale_ids) == [SaleStatus.COMPLETED, SaleStatus.CANCELLED, SaleStatus.CANCELLED]
+    assert len(_transactions()) == 2
+
+    rejected = client.post('/api/sales/bulk/complete', json={'sale_ids': 'all'})
+    assert rejected.status_code == 400
+
+
+def test_reconcile_matches_statement_rows_on_the_bill_total(client, sale_ids):
+    first, second, third = sale_ids
+    statement = (
+        'amount,description\n'
+        f'"200,000",CK thanh toan SALE {second}\n'
+        '100.000,chuyen khoan\n'
+        '95000,customer_payment is not what the customer pays\n'
+        '300000,SALE 9999\n'
+    )
+
+    preview = client.post('/api/sales/bulk/reconcile', json={'csv': statement})
+    body = preview.get_json()
+
+    assert preview.status_code == 200
+    assert [(m['matched'], m.get('sale_id'), m.get('match_type')) for m in body['matches']] == [
+        (True, second, 'reference'),
+        (True, first, 'amount'),
+        (False, None, None),
+        (True, third, 'amount'),
+    ]
+    assert body['matches'][2]['error'] == 'No pending sale with this amount'
+    assert body['summary'] == {'rows': 4, 'matched': 3, 'unmatched': 1}
+    assert _statuses(sale_ids) == [SaleStatus.PENDING_PAYMENT] * 3
+
+    confirmed = client.post('/api/sales/bulk/reconcile', json={'csv': statement, 'confirm': True})
+
+    assert confirmed.get_json()['confirmed'] is True
+    assert _statuses(sale_ids) == [SaleStatus.PAID] * 3
+    assert _transactions() == [
+        (first, TransactionType.PAYMENT_RECEIVED, 100000.0, 'chuyen khoan'),
+        (second, TransactionType.PAYMENT_RECEIVED, 200000.0, f'CK thanh toan SALE {second}'),
+        (third, TransactionType.PAYMENT_RECEIVED, 300000.0, 'SALE 9999'),
+    ]
@@ -0,0 +1,97 @@
+import random
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from config.database import SessionLocal
+from models import Bill, BillStatus, Customer, Sale
+from services.sales_service import SalesService
+
+pytestmark = [pytest.mark.database, pytest.mark.slow]
+
+WORKERS = 24
+
+
+@pytest.fixture
+def warehouse(seed_user):
+    """A customer plus 200 bills in the warehouse"""
+    db = SessionLocal()
+    try:
+        customer = Customer(name='Stress Customer', phone='0900000000', created_by=seed_user)
+        db.add(customer)
+        db.flush()
+        bills = [
+            Bill(contract_code=f'PB{i:06d}', customer_name='Stress', amount=100000 + i,
+                 status=BillStatus.IN_WAREHOUSE)
+            for i in range(200)
+        ]
+        db.add_all(bills)
+        db.flush()
+        warehouse = {
+            'user_id': seed_user,
+            'customer_id': customer.id,
+            'bill_ids': [bill.id for bill in bills],
+        }
+        db.commit()
+        return warehouse
+    finally:
+        db.close()
+
+
+def _sell_concurrently(warehouse, bill_id_sets):
+    service = SalesService()
+
+    def sell(bill_ids):
+        return service.create_sale({
+            'customer_id': warehouse['customer_id'],
+            'bill_ids': bill_ids,
+            'profit_percentage': 5,
+        }, warehouse['user_id'])
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        return list(pool.map(sell, bill_id_sets))
+
+
+def test_concurrent_sales_over_disjoint_bills_all_succeed(warehouse):
+    bill_ids = warehouse['bill_ids']
+    batches = [bill_ids[i:i + 5] for i in range(0, len(bill_ids), 5)]
+
+    results = _sell_concurrently(warehouse, batches)
+
+    assert all(result['success'] for result in results), [r.get('error') for r in results]
+    db = SessionLocal()
+    try:
+        assert db.query(Sale).count() == len(batches)
+        assert db.query(Bill).filter(Bill.status == BillStatus.IN_WAREHOUSE).count() == 0
+    finally:
+        db.close()
+
+
+def test_concurrent_sales_over_overlapping_bills_never_double_sell(warehouse):
+    rng = random.Random(42)
+    pool_ids = warehouse['bill_ids'][:30]
+    bill_id_sets = [rng.sample(pool_ids, 4) for _ in range(120)]
+
+    results = _sell_concurrently(warehouse, bill_id_sets)
+
+    sold = Counter()
+    for result in results:
+        if result['success']:
+            sold.update(bill['id'] for bill in result['sale']['bills'])
+    assert sold, 'at least one sale should win its bills'
+    assert max(sold.values()) == 1
+
+    db = SessionLocal()
+    try:
+        sales = {sale.id: sale for sale in db.query(Sale).all()}
+        assert len(sales) == sum(1 for result in results if result['success'])
+        for bill in db.query(Bill).filter(Bill.id.in_(pool_ids)).all():
+            if bill.id in sold:
+                assert bill.status == BillStatus.PENDING_PAYMENT
+                assert bill.sale_id in sales
+            else:
+                assert bill.status == BillStatus.IN_WAREHOUSE
+                assert bill.sale_id is None
+    finally:
+        db.close()
@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+
+from config.database import SessionLocal
+from models import Bill, BillStatus, Customer, PaymentMethod, Sale, User
+from services.sales_service import sales_service
+
+pytestmark = pytest.mark.database
+
+
+@pytest.fixture
+def sales(seed_user):
+    """40 sales, each with its own customer, seller and two bills"""
+    db = SessionLocal()
+    try:
+        for i in range(40):
+            user = User(username=f'seller{i}', email=f'seller{i}@example.com', password_hash='x', role='user')
+            customer = Customer(name=f'Khách {i}', phone=f'09{i:08d}', created_by=seed_user)
+            db.add_all([user, customer])
+            db.flush()
+            sale = Sale(customer_id=customer.id, user_id=user.id, total_bill_amount=Decimal('200'),
+                        profit_percentage=Decimal('5'), profit_amount=Decimal('10'),
+                        customer_payment=Decimal('190'), payment_method=PaymentMethod.CASH)
+            db.add(sale)
+            db.flush()
+            db.add_all([
+                Bill(contract_code=f'PL{i:03d}{j}', customer_name=customer.name, amount=Decimal('100'),
+                     status=BillStatus.PENDING_PAYMENT, sale_id=sale.id)
+                for j in range(2)
+            ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def _count_queries(db_engine, **kwargs):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db_engine, 'before_cursor_execute', record)
+    try:
+        result = sales_service.get_all_sales(**kwargs)
+    finally:
+        event.remove(db_engine, 'before_cursor_execute', record)
+    assert result['success'], result.get('error')
+    return result, statements
+
+
+def test_a_page_of_sales_costs_the_same_queries_at_any_size(db_engine, sales):
+    # Warm the archive horizon so both pages see the same cache state
+    sales_service.get_all_sales(per_page=1)
+
+    small, small_statements = _count_queries(db_engine, per_page=5)
+    large, large_statements = _count_queries(db_engine, per_page=40)
+
+    assert len(small['sales']) == 5
+    assert len(large['sales']) == 40
+    assert all(len(sale['bills']) == 2 and sale['customer'] and sale['user'] for sale in large['sales'])
+    # count, sales, customers, users, bills: independent of the page size
+    assert len(small_statements) == len(large_statements), large_statements
+    assert 4 <= len(large_statements) <= 6
@@ -0,0 +1,86 @@
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import insert
+
+from config.database import SessionLocal
+from models import Customer, PaymentMethod, Sale, SaleStatus
+from services.sales_service import SalesService
+
+pytestmark = [pytest.mark.database, pytest.mark.slow]
+
+SALE_COUNT = 100_000
+CUSTOMER_COUNT = 500
+
+
+@pytest.fixture
+def year_of_sales(seed_user):
+    """Seed 100k sales spread over 2024 and return the expected aggregates"""
+    rng = random.Random(7)
+    year_start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    statuses = list(SaleStatus)
+
+    db = SessionLocal()
+    try:
+        db.execute(insert(Customer), [
+            {'name': f'Customer {i}', 'phone': f'09{i:08d}', 'created_by': seed_user}
+            for i in range(CUSTOMER_COUNT)
+        ])
+        customer_ids = [row[0] for row in db.query(Customer.id).all()]
+
+        rows = []
+        expected = {'total_profit': Decimal('0'), 'by_status': {}}
+        for i in range(SALE_COUNT):
+            total = Decimal(rng.randrange(100_000, 5_000_000))
+            percentage = Decimal(rng.choice(['2.00', '3.50', '5.00', '8.00']))
+            profit = (total * percentage / 100).quantize(Decimal('0.01'))
+            status = rng.choice(statuses)
+            rows.append({
+                'customer_id': rng.choice(customer_ids),
+                'user_id': seed_user,
+                'total_bill_amount': total,
+                'profit_percentage': percentage,
+                'profit_amount': profit,
+                'customer_payment': total - profit,
+                'payment_method': PaymentMethod.BANK_TRANSFER,
+                'status': status,
+                'created_at': year_start + timedelta(minutes=rng.randrange(366 * 24 * 60)),
+            })
+            expected['total_profit'] += profit
+            expected['by_status'][status.value] = expected['by_status'].get(status.value, 0) + 1
+
+        for i in range(0, len(rows), 10_000):
+            db.execute(insert(Sale), rows[i:i + 10_000])
+        db.commit()
+        return expected
+    finally:
+        db.close()
+
+
+def test_sales_statistics_for_a_year_is_aggregated_in_sql(year_of_sales):
+    service = SalesService()
+
+    # Warm-up run so the timing below measures the queries, not pool setup
+    service.get_sales_statistics('2024-01-01T00:00:00Z', '2024-12-31T23:59:59Z')
+
+    started = time.perf_counter()
+    result = service.get_sales_statistics('2024-01-01T00:00:00Z', '2024-12-31T23:59:59Z')
+    elapsed = time.perf_counter() - started
+    print(f'\nget_sales_statistics over {SALE_COUNT} sales: {elapsed * 1000:.1f} ms')
+
+    assert result['success'], result.get('error')
+    statistics = result['statistics']
+    assert statistics['total_sales'] == SALE_COUNT
+    assert statistics['total_profit'] == pytest.approx(float(year_of_sales['total_profit']))
+    assert statistics['total_revenue'] == statistics['total_profit']
+    assert statistics['sales_by_status'] == year_of_sales['by_status']
+    assert 12 <= len(statistics['revenue_by_month']) <= 13  # month buckets follow the DB time zone
+    assert sum(statistics['revenue_by_month'].values()) == pytest.approx(statistics['total_profit'])
+    assert len(statistics['top_customers']) == 10
+    assert set(statistics['top_customers'][0]) == {'name', 'revenue'}
+
+    # Grouped SQL over an indexed range; loading 100k ORM rows took seconds
+    assert elapsed < 0.5
@@ -0,0 +1,105 @@
+import pytest
+from flask import Flask
+from sqlalchemy import event, text
+
+from config.database import (
+    WORKLOAD_ANALYTICS, analytics_engine, close_session, engine, get_session,
+    remove_session, workload
+)
+
+pytestmark = pytest.mark.database
+
+
+@pytest.fixture
+def checkouts(db_engine):
+    counter = {'count': 0}
+
+    def on_checkout(*args):
+        counter['count'] += 1
+
+    event.listen(engine, 'checkout', on_checkout)
+    yield counter
+    event.remove(engine, 'checkout', on_checkout)
+
+
+def test_services_share_one_connection_per_request(checkouts):
+    app = Flask(__name__)
+    app.teardown_appcontext(remove_session)
+
+    with app.test_request_context('/'):
+        first = get_session()
+        first.execute(text('SELECT 1'))
+        first.commit()
+        close_session(first)
+
+        second = get_session()
+        assert second is first
+        second.execute(text('SELECT 1'))
+        close_session(second)
+
+    assert checkouts['count'] == 1
+    assert engine.pool.checkedout() == 0
+
+
+def test_a_failed_statement_does_not_poison_the_shared_session(db_engine):
+    app = Flask(__name__)
+    app.teardown_appcontext(remove_session)
+
+    with app.test_request_context('/'):
+        failing = get_session()
+        with pytest.raises(Exception):
+            failing.execute(text('SELECT * FROM no_such_table'))
+        # The service reports the error without rolling back
+        close_session(failing)
+
+        next_service = get_session()
+        assert next_service is failing
+        assert next_service.execute(text('SELECT 1')).scalar() == 1
+        close_session(next_service)
+
+    assert engine.pool.checkedout() == 0
+
+
+def test_outside_a_request_the_outermost_caller_releases_the_session(checkouts):
+    outer = get_session()
+    inner = get_session()
+    assert inner is outer
+
+    close_session(inner)
+    outer.execute(text('SELECT 1'))
+    close_session(outer)
+
+    assert checkouts['count'] == 1
+    assert engine.pool.checkedout() == 0
+    again = get_session()
+    assert again is not outer
+    close_session(again)
+
+
+def test_analytics_workload_gets_its_own_session_and_pool(checkouts):
+    app = Flask(__name__)
+    app.teardown_appcontext(remove_session)
+
+    @workload(WORKLOAD_ANALYTICS)
+    def report():
+        db = get_session()
+        try:
+            assert db.bind.engine is analytics_engine
+            return db, db.execute(text('SHOW statement_timeout')).scalar()
+        finally:
+            close_session(db)
+
+    with app.test_request_context('/'):
+        oltp = get_session()
+        analytics, timeout = report()
+        assert analytics is not oltp
+        assert oltp.execute(text('SHOW statement_timeout')).scalar() != timeout
+        close_session(oltp)
+
+    assert engine.pool.checkedout() == 0
+    assert analytics_engine.pool.checkedout() == 0
+
+
+def test_unknown_workload_is_rejected():
+    with pytest.raises(ValueError):
+        workload('batch')
@@ -0,0 +1,118 @@
+import os
+import time
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from models.shared_state import SharedStateEntry
+from utils.rate_limit import parse_limits, rate_limit
+from utils.shared_state import (
+    MemoryStateBackend, RedisStateBackend, SharedState, TableStateBackend, shared_state
+)
+from utils.table_versions import TableVersions
+
+pytestmark = pytest.mark.unit
+
+
+def table_backend():
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    SharedStateEntry.__table__.create(engine)
+    return TableStateBackend(engine)
+
+
+def redis_backend():
+    url = os.getenv('TEST_REDIS_URL')
+    if not url:
+        pytest.skip('TEST_REDIS_URL is not set')
+    backend = RedisStateBackend(url)
+    backend.client.flushdb()
+    return backend
+
+
+@pytest.fixture(params=['memory', 'table', 'redis'])
+def backend(request):
+    return {'memory': MemoryStateBackend, 'table': table_backend, 'redis': redis_backend}[request.param]()
+
+
+def test_values_round_trip_as_json(backend):
+    backend.set('batch:status', {'running': True, 'results': [{'contract_code': 'PB01'}]})
+    backend.set('proxy:list', [])
+
+    assert backend.get('batch:status') == {'running': True, 'results': [{'contract_code': 'PB01'}]}
+    assert backend.get_many(['proxy:list', 'missing']) == {'proxy:list': []}
+    assert backend.get('missing', 'default') == 'default'
+
+    backend.delete('batch:status')
+    assert backend.get('batch:status') is None
+
+
+def test_add_only_sets_absent_or_expired_keys(backend):
+    assert backend.add('batch:lock', 'first', ttl=1) is True
+    assert backend.add('batch:lock', 'second', ttl=1) is False
+    assert backend.get('batch:lock') == 'first'
+
+    time.sleep(1.1)
+    assert backend.get('batch:lock') is None
+    assert backend.add('batch:lock', 'third') is True
+    assert backend.get('batch:lock') == 'third'
+
+
+def test_counters_are_fixed_windows(backend):
+    assert backend.incr('hits', ttl=1) == 1
+    assert backend.incr('hits', 4, ttl=1) == 5
+    assert backend.get('hits') == 5
+
+    time.sleep(1.1)
+    assert backend.incr('hits', ttl=1) == 1
+    assert backend.incr('forever') == 1
+    assert backend.incr('forever') == 2
+
+
+def test_table_backend_purges_expired_rows():
+    backend = table_backend()
+    backend.set('old', 1, ttl=0.01)
+    backend.set('kept', 2)
+    time.sleep(0.05)
+
+    assert backend.purge_expired() == 1
+    assert backend.get_many(['old', 'kept']) == {'kept': 2}
+
+
+def test_table_versions_agree_between_processes():
+    state = SharedState()
+    state.backend = table_backend()
+    first, second = TableVersions(), TableVersions()
+    first.use_backend(state, refresh_seconds=0)
+    second.use_backend(state, refresh_seconds=0)
+
+    assert first.epoch == second.epoch
+    first.bump(['bills'])
+    first.bump(['bills', 'sales'])
+    assert second.get(['bills', 'sales', 'customers']) == (2, 1, 0)
+
+
+def test_rate_limit_counts_per_client_across_the_shared_state(monkeypatch):
+    monkeypatch.setattr(shared_state, 'backend', MemoryStateBackend())
+    app = Flask(__name__)
+
+    @app.route('/login', methods=['POST'])
+    @rate_limit('2 per minute')
+    def login():
+        return {'success': True}
+
+    client = app.test_client()
+    assert [client.post('/login').status_code for _ in range(3)] == [200, 200, 429]
+    assert int(client.post('/login').headers['Retry-After']) <= 61
+    assert client.post('/login', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+
+    app.config['RATELIMIT_ENABLED'] = False
+    assert client.post('/login').status_code == 200
+
+
+def test_parse_limits():
+    assert parse_limits('10 per minute;100 per hour') == [(10, 60), (100, 3600)]
+    assert parse_limits('5/second') == [(5, 1)]
+    with pytest.raises(ValueError):
+        parse_limits('often')
@@ -0,0 +1,65 @@
+import base64
+import pickle
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from utils.shared_state import SharedState
+from utils.socketio_queue import PostgresManager, decode_message
+
+pytestmark = pytest.mark.unit
+
+
+class NotifyRecorder:
+    """Stands in for the engine: records pg_notify payloads instead of sending them"""
+
+    def __init__(self):
+        self.payloads = []
+
+    @contextmanager
+    def begin(self):
+        yield self
+
+    def execute(self, statement):
+        self.payloads.append(list(statement.compile().params.values())[-1])
+
+
+@pytest.fixture
+def manager():
+    return PostgresManager(NotifyRecorder(), SharedState())
+
+
+def test_messages_travel_as_json(manager):
+    message = {'method': 'emit', 'event': 'job_update', 'data': {'amount': Decimal('1.5'), 'at': datetime(2025, 1, 2)}}
+    manager._publish(message)
+
+    payload = manager.engine.payloads[0]
+    assert payload.startswith('{')
+    assert manager._decode(payload)['data'] == {'amount': 1.5, 'at': '2025-01-02T00:00:00'}
+
+
+def test_large_messages_are_parked_in_shared_state(manager):
+    manager._publish({'method': 'emit', 'event': 'batch', 'data': 'x' * 10000})
+
+    payload = manager.engine.payloads[0]
+    assert payload.startswith('@socketio:')
+    assert manager._decode(payload)['data'] == 'x' * 10000
+
+
+class Exploit:
+    def __reduce__(self):
+        return (pytest.fail, ('pickle payload was loaded',))
+
+
+def test_non_json_payloads_are_rejected(manager):
+    pickled = pickle.dumps({'method': 'emit', 'obj': Exploit()})
+    assert manager._decode(base64.b64encode(pickled).decode('ascii')) is None
+    assert decode_message(pickled) is None
+
+    manager.state.set('socketio:parked', base64.b64encode(pickled).decode('ascii'))
+    assert manager._decode('@socketio:parked') is None
+
+    assert manager._decode('[1, 2]') is None
+    assert manager._decode('{"event": "no method"}') is None
@@ -0,0 +1,66 @@
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, text
+
+from utils.tracing import RequestTracer, traced_serialization
+
+pytestmark = pytest.mark.unit
+
+
+class Row:
+    def __init__(self, children=()):
+        self.children = children
+
+    @traced_serialization
+    def to_dict(self):
+        return {'children': [child.to_dict() for child in self.children]}
+
+
+def make_app(tracer, engine):
+    app = Flask(__name__)
+    app.config['SLOW_REQUEST_SECONDS'] = 0
+    tracer.init_app(app)
+
+    @app.route('/rows/<int:count>')
+    def rows(count):
+        with engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+        return {'rows': [Row([Row(), Row()]).to_dict() for _ in range(count)]}
+
+    return app
+
+
+def test_request_trace_has_sql_serialization_and_json_spans():
+    engine = create_engine('sqlite://')
+    tracer = RequestTracer()
+    tracer.install(engine)
+    client = make_app(tracer, engine).test_client()
+
+    assert client.get('/rows/5').status_code == 200
+
+    trace = tracer.slow_traces()[0]
+    assert trace['route'] == '/rows/<int:count>'
+    assert trace['sql_queries'] == 1
+    assert trace['rows_serialized'] == 15
+    assert {span['name'] for span in trace['spans']} == {'sql', 'json'}
+    assert set(trace['breakdown_ms']) == {'sql', 'serialize', 'json', 'python'}
+    assert sum(trace['breakdown_ms'].values()) == pytest.approx(trace['duration_ms'], abs=0.01)
+
+
+def test_route_percentiles_and_prometheus_histogram():
+    engine = create_engine('sqlite://')
+    tracer = RequestTracer()
+    tracer.install(engine)
+    client = make_app(tracer, engine).test_client()
+
+    for count in range(20):
+        client.get(f'/rows/{count}')
+
+    [route] = tracer.route_stats()
+    assert route['count'] == 20
+    assert route['p50_ms'] <= route['p95_ms'] <= route['p99_ms']
+    assert 'http_request_duration_seconds_count{method="GET",route="/rows/<int:count>"} 20' in tracer.render()
+
+
+def test_serialization_outside_a_request_is_untraced():
+    assert Row([Row()]).to_dict() == {'children': [{'children': []}]}
@@ -0,0 +1,178 @@
+import heapq
+import threading
+import time
+from typing import Dict, List, Any, Optional
+from flask import current_app, g, has_app_context
+from sqlalchemy import event
+from utils.metrics import Histogram, format_header, format_histogram, format_sample
+
+# Number of slowest statements kept for /api/metrics
+SLOWEST_STATEMENTS = 10
+# Statements are truncated to this many characters in labels and headers
+STATEMENT_PREVIEW = 200
+
+class RequestDbStats:
+    """SQL activity of one request (or SocketIO event), kept on ``g``"""
+
+    __slots__ = ('queries', 'sql_seconds', 'checkout_seconds', 'slowest_seconds', 'slowest_statement')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.checkout_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+
+    def header_value(self) -> str:
+        return (f'queries={self.queries}; sql_ms={self.sql_seconds * 1000:.1f}; '
+                f'checkout_ms={self.checkout_seconds * 1000:.1f}; slowest_ms={self.slowest_seconds * 1000:.1f}')
+
+class DbMetrics:
+    """SQLAlchemy event-based query and connection pool instrumentation
+
+    Process-wide counters and histograms are rendered in the Prometheus
+    text format; per-request totals live on ``g`` and can be echoed back in
+    an ``X-DB-Stats`` response header.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engines: Dict[str, Any] = {}
+        self.query_duration = Histogram()
+        self.checkout_wait = Histogram()
+        self.queries_per_request = Histogram((1, 2, 5, 10, 20, 50, 100, 200, 500))
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.query_errors = 0
+        self._slowest: List = []  # min-heap of (seconds, statement)
+
+    def install(self, engine, name: str = 'default') -> None:
+        """Attach the cursor and pool listeners to ``engine``; pool gauges are labelled ``name``"""
+        self._engines[name] = engine
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'handle_error', self._handle_error)
+        event.listen(engine.pool, 'checkout', self._on_checkout)
+
+    def init_app(self, app) -> None:
+        """Track per-request totals and add the debug response header"""
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    # SQLAlchemy listeners
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        self.query_duration.observe(elapsed)
+
+        preview = ' '.join(statement.split())[:STATEMENT_PREVIEW]
+        with self._lock:
+            if len(self._slowest) < SLOWEST_STATEMENTS:
+                heapq.heappush(self._slowest, (elapsed, preview))
+            elif elapsed > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, (elapsed, preview))
+
+        stats = self.current_request()
+        if stats is not None:
+            stats.queries += 1
+            stats.sql_seconds += elapsed
+            if elapsed > stats.slowest_seconds:
+                stats.slowest_seconds = elapsed
+                stats.slowest_statement = preview
+
+    def _handle_error(self, context):
+        with self._lock:
+            self.query_errors += 1
+        starts = context.connection.info.get('query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    # Hooks called from config.database
+
+    def record_checkout_wait(self, seconds: float) -> None:
+        self.checkout_wait.observe(seconds)
+        stats = self.current_request()
+        if stats is not None:
+            stats.checkout_seconds += seconds
+
+    def record_checkout_timeout(self) -> None:
+        with self._lock:
+            self.checkout_timeouts += 1
+
+    # Request tracking
+
+    def current_request(self) -> Optional[RequestDbStats]:
+        if not has_app_context():
+            return None
+        return g.get('_db_stats')
+
+    def _start_request(self):
+        g._db_stats = RequestDbStats()
+
+    def _finish_request(self, response):
+        stats = self.current_request()
+        if stats is None:
+            return response
+        self.queries_per_request.observe(stats.queries)
+        if current_app.config.get('DB_METRICS_HEADER', current_app.debug):
+            response.headers['X-DB-Stats'] = stats.header_value()
+        return response
+
+    # Exposition
+
+    def pool_status(self) -> Dict[str, Dict[str, Any]]:
+        """Current pool usage per installed engine name"""
+        status = {}
+        for name, engine in self._engines.items():
+            pool = engine.pool
+            if not hasattr(pool, 'checkedout'):
+                continue
+            status[name] = {
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+            }
+        return status
+
+    def slowest_statements(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            slowest = sorted(self._slowest, reverse=True)
+        return [{'seconds': round(seconds, 6), 'statement': statement} for seconds, statement in slowest]
+
+    def render(self) -> str:
+        """All database metrics in the Prometheus text exposition format"""
+        lines = []
+        lines += format_header('db_query_duration_seconds', 'histogram', 'SQL statement execution time')
+        lines += format_histogram('db_query_duration_seconds', self.query_duration)
+        lines += format_header('db_queries_per_request', 'histogram', 'SQL statements executed per HTTP request')
+        lines += format_histogram('db_queries_per_request', self.queries_per_request)
+        lines += format_header('db_query_errors_total', 'counter', 'SQL statements that raised an error')
+        lines.append(format_sample('db_query_errors_total', self.query_errors))
+
+        lines += format_header('db_pool_checkout_wait_seconds', 'histogram', 'Time spent waiting for a pooled connection')
+        lines += format_histogram('db_pool_checkout_wait_seconds', self.checkout_wait)
+        lines += format_header('db_pool_checkouts_total', 'counter', 'Connections checked out of the pool')
+        lines.append(format_sample('db_pool_checkouts_total', self.checkouts))
+        lines += format_header('db_pool_checkout_timeouts_total', 'counter', 'Checkouts that timed out waiting for the pool')
+        lines.append(format_sample('db_pool_checkout_timeouts_total', self.checkout_timeouts))
+        pools = self.pool_status()
+        for key in ('size', 'checked_out', 'checked_in', 'overflow'):
+            lines += format_header(f'db_pool_{key}', 'gauge', f'Connection pool {key.replace("_", " ")}')
+            for name, status in pools.items():
+                lines.append(format_sample(f'db_pool_{key}', status[key], {'engine': name}))
+
+        lines += format_header('db_slowest_query_seconds', 'gauge', f'The {SLOWEST_STATEMENTS} slowest statements since start')
+        for item in self.slowest_statements():
+            lines.append(format_sample('db_slowest_query_seconds', item['seconds'], {'statement': item['statement']}))
+        return '\n'.join(lines) + '\n'
+
+# Create global instance
+db_metrics = DbMetrics()
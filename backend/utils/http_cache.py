@@ -0,0 +1,98 @@
+import gzip
+import hashlib
+import time
+from functools import wraps
+from flask import current_app, request
+from flask_jwt_extended import get_jwt_identity
+from utils.table_versions import table_versions
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def conditional_get(*tables: str, max_age: int = 0):
+    """Answer GET requests with ETags derived from the versions of ``tables``
+
+    The ETag covers the endpoint, its query parameters, the requesting user
+    and the versions of every table the view reads. It is computed before
+    the view runs, so a matching ``If-None-Match`` gets a 304 without a
+    single query. Writes made outside this process (CLI scripts, other
+    workers) do not bump the counters; the ETag also changes every
+    ``ETAG_TTL_SECONDS`` so such changes show up within that window.
+
+    Place it below ``@jwt_required()`` so that authentication still runs
+    first. ``max_age`` lets the browser reuse a response without asking at
+    all for that many seconds; the default makes it revalidate every time.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or not current_app.config.get('ETAGS_ENABLED', True):
+                return view(*args, **kwargs)
+
+            etag = _compute_etag(tables)
+            cache_control = f'private, max-age={max_age}' if max_age else 'private, no-cache'
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
+
+def _compute_etag(tables) -> str:
+    ttl = current_app.config.get('ETAG_TTL_SECONDS', 60)
+    parts = [
+        request.endpoint or '',
+        request.path,
+        '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True))),
+        str(get_jwt_identity()),
+        table_versions.epoch,
+        ','.join(map(str, table_versions.get(tables))),
+        str(int(time.time() // ttl)) if ttl else ''
+    ]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:20]
+
+class ResponseCompression:
+    """Compress large JSON responses with brotli or gzip
+
+    Bodies under ``COMPRESS_MIN_SIZE`` bytes are sent as-is; compressing
+    them costs more than it saves. Brotli is preferred when the client
+    accepts it and the ``brotli`` package is installed.
+    """
+
+    def init_app(self, app) -> None:
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_LEVEL', 5)
+        app.after_request(self._compress)
+
+    def _compress(self, response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+            return response
+
+        body = response.get_data()
+        if len(body) < current_app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        accepted = request.accept_encodings
+        level = current_app.config['COMPRESS_LEVEL']
+        if brotli is not None and accepted['br']:
+            encoding, body = 'br', brotli.compress(body, quality=level)
+        elif accepted['gzip']:
+            encoding, body = 'gzip', gzip.compress(body, compresslevel=level)
+        else:
+            return response
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+# Create global instance
+response_compression = ResponseCompression()
@@ -0,0 +1,148 @@
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from config.database import engine
+from models.idempotency_key import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+_table = IdempotencyKey.__table__
+
+def idempotent(view):
+    """Make a POST endpoint safe to retry with an ``Idempotency-Key`` header
+
+    The first request with a key claims it in the ``idempotency_keys`` table
+    and runs the view; its response is stored for ``IDEMPOTENCY_TTL_SECONDS``
+    and every retry with the same key gets that response back (marked with
+    ``Idempotent-Replayed: true``) without running the view again. While the
+    first request is still running, retries get 409. Requests without the
+    header are unaffected.
+
+    The view commits its writes before the response is stored, so a key
+    whose request never stored one may belong to a request that did commit:
+    its worker died, ``_store`` failed, or the view answered with a server
+    error (5xx) or raised, possibly after committing. Such keys are never
+    run again: retries get 409 until the key's TTL runs out, and a client
+    that wants to try again after checking uses a new key.
+
+    Keys are scoped per user; reusing one for a different request body is
+    rejected with 422. Place it below ``@jwt_required()``.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+        scope = str(get_jwt_identity() or request.remote_addr or 'anonymous')
+        request_hash = _request_hash()
+
+        if not _claim(scope, key, request_hash):
+            return _replay(scope, key, request_hash)
+
+        # On an exception the key stays unfinished too (409 for retries)
+        response = current_app.make_response(view(*args, **kwargs))
+
+        if response.status_code >= 500:
+            # The view may have committed before failing; the key stays unfinished
+            logger.warning('%s %s left unfinished after a %s response', HEADER, key, response.status_code)
+        elif response.direct_passthrough:
+            _release(scope, key)
+        else:
+            try:
+                _store(scope, key, response)
+            except Exception:
+                # The view's writes are committed; the key stays unfinished (409 for retries)
+                logger.exception('Cannot store the response for %s %s', HEADER, key)
+        return response
+    return wrapper
+
+def purge_expired() -> int:
+    """Delete stored responses past their TTL"""
+    with engine.begin() as conn:
+        return conn.execute(delete(_table).where(_table.c.expires_at <= _now())).rowcount
+
+def _now():
+    return datetime.now(timezone.utc)
+
+def _request_hash() -> str:
+    digest = hashlib.sha256(f'{request.method} {request.path}\n'.encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+def _claim(scope: str, key: str, request_hash: str) -> bool:
+    """Insert the key as in progress; True if this request owns it
+
+    Only an expired key is taken over. An unfinished one is not, even when
+    its worker died: whether that request committed is unknown.
+    """
+    now = _now()
+    insert = postgresql.insert if engine.dialect.name == 'postgresql' else sqlite.insert
+    statement = insert(_table).values(
+        scope=scope,
+        key=key,
+        request_hash=request_hash,
+        started_at=now,
+        expires_at=now + timedelta(seconds=current_app.config.get('IDEMPOTENCY_TTL_SECONDS', 86400))
+    )
+    excluded = statement.excluded
+    with engine.begin() as conn:
+        claimed = conn.execute(statement.on_conflict_do_update(
+            index_elements=[_table.c.scope, _table.c.key],
+            set_={
+                'request_hash': excluded.request_hash,
+                'started_at': excluded.started_at,
+                'expires_at': excluded.expires_at,
+                'status_code': None,
+                'content_type': None,
+                'response_body': None
+            },
+            where=_table.c.expires_at <= now
+        ).returning(_table.c.key)).first()
+    return claimed is not None
+
+def _replay(scope: str, key: str, request_hash: str):
+    with engine.connect() as conn:
+        row = conn.execute(
+            select(_table.c.request_hash, _table.c.status_code, _table.c.content_type, _table.c.response_body)
+            .where(_table.c.scope == scope, _table.c.key == key)
+        ).first()
+
+    if row is None:
+        # Released (a streamed response) or purged between our claim and this read
+        return jsonify({'error': 'Request with this Idempotency-Key failed, please retry'}), 409
+    if row.request_hash != request_hash:
+        return jsonify({'error': f'{HEADER} was already used for a different request'}), 422
+    if row.status_code is None:
+        response = jsonify({'error': 'A request with this Idempotency-Key is still in progress or did not finish'})
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response
+
+    response = current_app.response_class(row.response_body, status=row.status_code, mimetype=row.content_type)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def _store(scope: str, key: str, response) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            _table.update().where(_table.c.scope == scope, _table.c.key == key).values(
+                status_code=response.status_code,
+                content_type=response.mimetype,
+                response_body=response.get_data(as_text=True)
+            )
+        )
+
+def _release(scope: str, key: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(delete(_table).where(_table.c.scope == scope, _table.c.key == key))
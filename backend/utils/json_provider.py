@@ -0,0 +1,89 @@
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Exact-type fast path for the values models hand back most often
+_ENCODERS = {
+    Decimal: float,
+    datetime: datetime.isoformat,
+    date: date.isoformat,
+    time: time.isoformat,
+}
+
+def encode_value(value: Any) -> Any:
+    """Encode a value the JSON encoders do not handle themselves
+
+    Decimal becomes a number, dates and times ISO 8601 strings (not Flask's
+    HTTP date format) and enums their value; everything else falls back to
+    Flask's defaults (dataclasses, UUIDs, ``__html__``).
+    """
+    encoder = _ENCODERS.get(type(value))
+    if encoder is not None:
+        return encoder(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return DefaultJSONProvider.default(value)
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson when it is installed
+
+    Models return column values as-is from ``to_dict`` (Decimal, datetime,
+    enum members) and they are encoded here in one pass, natively by orjson
+    or through ``encode_value`` with the standard library encoder. Responses
+    are written as UTF-8 bytes without an intermediate ``str``.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.use_orjson = orjson is not None
+
+    def encode(self, obj: Any, indent: bool = False) -> bytes:
+        """Serialize ``obj`` to UTF-8 encoded JSON"""
+        if self.use_orjson:
+            option = orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            try:
+                return orjson.dumps(obj, default=encode_value, option=option)
+            except orjson.JSONEncodeError:
+                # e.g. integers beyond 64 bits; the standard library decides
+                pass
+        return json.dumps(
+            obj,
+            default=encode_value,
+            ensure_ascii=False,
+            check_circular=False,
+            sort_keys=self.sort_keys,
+            indent=2 if indent else None,
+            separators=None if indent else (',', ':')
+        ).encode('utf-8')
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs.keys() <= {'indent', 'separators'}:
+            return self.encode(obj, indent=bool(kwargs.get('indent'))).decode('utf-8')
+        kwargs.setdefault('default', encode_value)
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.encode(obj, indent) + b'\n', mimetype=self.mimetype)
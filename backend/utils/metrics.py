@@ -0,0 +1,60 @@
+import bisect
+import threading
+from typing import Dict, List, Iterable, Optional, Tuple
+
+# Default latency buckets in seconds (upper bounds)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Thread-safe cumulative histogram in the Prometheus style"""
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """Cumulative bucket counts (last one is +Inf), sum and count"""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = []
+        running = 0
+        for value in counts:
+            running += value
+            cumulative.append(running)
+        return cumulative, total, count
+
+def escape_label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels: Optional[Dict[str, str]]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + '}'
+
+def format_header(name: str, metric_type: str, help_text: str) -> List[str]:
+    return [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+
+def format_sample(name: str, value: float, labels: Optional[Dict[str, str]] = None) -> str:
+    return f'{name}{format_labels(labels)} {value}'
+
+def format_histogram(name: str, histogram: Histogram, labels: Optional[Dict[str, str]] = None) -> List[str]:
+    """Sample lines (without HELP/TYPE) for one histogram series"""
+    cumulative, total, count = histogram.snapshot()
+    labels = dict(labels or {})
+    lines = []
+    for bound, value in zip(list(histogram.buckets) + ['+Inf'], cumulative):
+        lines.append(format_sample(f'{name}_bucket', value, {**labels, 'le': bound if bound == '+Inf' else f'{bound:g}'}))
+    lines.append(format_sample(f'{name}_sum', float(total), labels))
+    lines.append(format_sample(f'{name}_count', count, labels))
+    return lines
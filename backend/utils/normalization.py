@@ -0,0 +1,56 @@
+import re
+import unicodedata
+from typing import List, Optional
+
+_NON_DIGITS = re.compile(r'\D')
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+def unaccent(text: str) -> str:
+    """Strip Vietnamese diacritics: 'Nguyễn Văn Đức' -> 'Nguyen Van Duc'"""
+    if not text:
+        return ''
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    decomposed = unicodedata.normalize('NFD', text)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+def normalize_name(name: str) -> str:
+    """Lowercase, unaccented, single-spaced form of a name or address"""
+    return ' '.join(name_tokens(name))
+
+def name_tokens(name: str) -> List[str]:
+    """Unaccented lowercase word tokens of a name"""
+    return [token for token in _NON_WORD.split(unaccent(name or '').lower()) if token]
+
+def phone_digits(phone: str) -> str:
+    """Digits of a phone number in national form: '+84 901 234 567' -> '0901234567'"""
+    digits = _NON_DIGITS.sub('', phone or '')
+    if digits.startswith('84') and len(digits) >= 11:
+        digits = '0' + digits[2:]
+    return digits
+
+def normalize_zalo(zalo: str) -> Optional[str]:
+    """Zalo handles are usually phone numbers; fall back to the lowercase handle"""
+    if not zalo:
+        return None
+    digits = phone_digits(zalo)
+    if len(digits) >= 9:
+        return digits
+    return zalo.strip().lower() or None
+
+def phone_e164(phone: str, country_code: str = '84') -> Optional[str]:
+    """E.164 form of a phone number: '0901 234 567' -> '+84901234567'
+
+    Numbers without a country code are taken as Vietnamese. Returns None
+    when the input has too few digits to be a phone number.
+    """
+    raw = (phone or '').strip()
+    digits = _NON_DIGITS.sub('', raw)
+    if len(digits) < 8:
+        return None
+    if raw.startswith('+'):
+        return '+' + digits
+    if raw.startswith('00'):
+        return '+' + digits[2:]
+    if digits.startswith(country_code) and len(digits) >= 11:
+        return '+' + digits
+    return '+' + country_code + digits.lstrip('0')
@@ -0,0 +1,141 @@
+import logging
+import os
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Any, Optional
+from flask import current_app, g, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Default number of times one SELECT may run in a scope before it is reported
+DEFAULT_THRESHOLD = 10
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class NPlusOneError(AssertionError):
+    """Raised when a scope repeats the same SELECT more than the threshold"""
+
+class QueryScope:
+    """Identical parameterized SELECTs seen during one request or test"""
+
+    def __init__(self, threshold: int, name: str):
+        self.threshold = threshold
+        self.name = name
+        self.counts: Dict[str, int] = {}
+        self.locations: Dict[str, str] = {}
+
+    def record(self, statement: str) -> None:
+        count = self.counts.get(statement, 0) + 1
+        self.counts[statement] = count
+        if count == self.threshold + 1:
+            self.locations[statement] = _caller_location()
+
+    def violations(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                'statement': ' '.join(statement.split())[:300],
+                'count': count,
+                'location': self.locations.get(statement)
+            }
+            for statement, count in sorted(self.counts.items(), key=lambda item: -item[1])
+            if count > self.threshold
+        ]
+
+    def report(self) -> str:
+        lines = [f'Repeated queries in {self.name} (threshold {self.threshold}):']
+        for violation in self.violations():
+            lines.append(f"  {violation['count']}x {violation['statement']}")
+            if violation['location']:
+                lines.append(f"      at {violation['location']}")
+        return '\n'.join(lines)
+
+def _caller_location() -> Optional[str]:
+    """Innermost backend frame outside this module, e.g. a to_dict() loop"""
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(_BACKEND_DIR) and not frame.filename.endswith('nplusone.py'):
+            return f'{os.path.relpath(frame.filename, _BACKEND_DIR)}:{frame.lineno} in {frame.name}'
+    return None
+
+class NPlusOneDetector:
+    """Detects lazy-load style N+1 query patterns
+
+    Every SELECT executed while a scope is active is counted by its
+    parameterized SQL text; lazy loads inside a ``to_dict()`` loop show up
+    as the same statement run once per row. Scopes are opened per Flask
+    request by ``init_app`` and per test by ``track``.
+    """
+
+    def __init__(self):
+        self._scopes: ContextVar = ContextVar('nplusone_scopes', default=())
+
+    def install(self, engine) -> None:
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        scopes = self._scopes.get()
+        if not scopes or executemany:
+            return
+        if statement.lstrip()[:6].upper() != 'SELECT':
+            return
+        for scope in scopes:
+            scope.record(statement)
+
+    @contextmanager
+    def track(self, threshold: int = DEFAULT_THRESHOLD, name: str = 'block', raise_on_violation: bool = True):
+        """Count SELECTs inside the block; raise ``NPlusOneError`` on violations"""
+        scope = QueryScope(threshold, name)
+        token = self._scopes.set(self._scopes.get() + (scope,))
+        try:
+            yield scope
+        finally:
+            self._scopes.reset(token)
+        if raise_on_violation and scope.violations():
+            raise NPlusOneError(scope.report())
+
+    @contextmanager
+    def allow(self):
+        """Suspend detection, e.g. around a deliberate keyset-chunked loop"""
+        token = self._scopes.set(())
+        try:
+            yield
+        finally:
+            self._scopes.reset(token)
+
+    def init_app(self, app) -> None:
+        """Check each request; NPLUSONE_MODE is 'off', 'warn' (default in debug) or 'raise'"""
+        app.config.setdefault('NPLUSONE_MODE', 'warn' if app.debug else 'off')
+        app.config.setdefault('NPLUSONE_THRESHOLD', DEFAULT_THRESHOLD)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._teardown_request)
+
+    def _start_request(self):
+        if current_app.config['NPLUSONE_MODE'] == 'off':
+            return
+        scope = QueryScope(current_app.config['NPLUSONE_THRESHOLD'], f'{request.method} {request.path}')
+        g._nplusone = (scope, self._scopes.set(self._scopes.get() + (scope,)))
+
+    def _finish_request(self, response):
+        state = g.get('_nplusone')
+        if state is None:
+            return response
+        scope = state[0]
+        if scope.violations():
+            if current_app.config['NPLUSONE_MODE'] == 'raise':
+                raise NPlusOneError(scope.report())
+            logger.warning(scope.report())
+        return response
+
+    def _teardown_request(self, exception=None):
+        state = g.pop('_nplusone', None)
+        if state is not None:
+            try:
+                self._scopes.reset(state[1])
+            except ValueError:
+                # Token created in another context (e.g. a streamed response)
+                self._scopes.set(())
+
+# Create global instance
+nplusone_detector = NPlusOneDetector()
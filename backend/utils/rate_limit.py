@@ -0,0 +1,50 @@
+import re
+import time
+from functools import wraps
+from typing import Callable, List, Optional, Tuple
+from flask import current_app, jsonify, request
+from utils.shared_state import shared_state
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+_LIMIT_PATTERN = re.compile(r'^\s*(\d+)\s*(?:per|/)\s*(second|minute|hour|day)s?\s*$', re.IGNORECASE)
+
+def parse_limits(limits: str) -> List[Tuple[int, int]]:
+    """Parse ``"10 per minute;100 per day"`` into ``[(10, 60), (100, 86400)]``"""
+    parsed = []
+    for part in limits.split(';'):
+        if not part.strip():
+            continue
+        match = _LIMIT_PATTERN.match(part)
+        if not match:
+            raise ValueError(f'Invalid rate limit: {part!r}')
+        parsed.append((int(match.group(1)), _PERIODS[match.group(2).lower()]))
+    return parsed
+
+def rate_limit(limits: str, key_func: Optional[Callable[[], str]] = None):
+    """Reject requests over ``limits`` with 429 Too Many Requests
+
+    Requests are counted per client address (or ``key_func()``) in fixed
+    windows kept in the shared state, so a limit holds across all API
+    processes rather than per worker. Disabled with ``RATELIMIT_ENABLED``.
+    """
+    parsed = parse_limits(limits)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('RATELIMIT_ENABLED', True):
+                return view(*args, **kwargs)
+
+            client = key_func() if key_func else (request.remote_addr or 'unknown')
+            now = time.time()
+            for count, period in parsed:
+                window = int(now // period)
+                key = f'ratelimit:{request.endpoint}:{client}:{period}:{window}'
+                if shared_state.incr(key, ttl=period) > count:
+                    response = jsonify({'error': 'Too many requests, please try again later'})
+                    response.status_code = 429
+                    response.headers['Retry-After'] = str(int((window + 1) * period - now) + 1)
+                    return response
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,301 @@
+import json
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+from sqlalchemy import BigInteger, Text, and_, case, cast, create_engine, delete, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.pool import QueuePool
+from models.shared_state import SharedStateEntry
+from utils.db_metrics import db_metrics
+from utils.json_provider import encode_value
+from utils.table_versions import table_versions
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=encode_value, ensure_ascii=False, separators=(',', ':'))
+
+class StateBackend:
+    """Storage for ``SharedState``: JSON values under string keys with optional TTLs
+
+    ``ttl`` is in seconds; expired keys read as absent. Counters created by
+    ``incr`` are plain integer values and keep the TTL of their first
+    increment, which makes them fixed-window counters.
+    """
+
+    name = 'base'
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set ``key`` only if it is absent (or expired); True when it was set"""
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Add ``amount`` to the counter at ``key`` and return the new value"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+class MemoryStateBackend(StateBackend):
+    """Process-local backend for tests and single-process development"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Tuple[str, Optional[float]]] = {}
+
+    @staticmethod
+    def _expiry(ttl):
+        return time.monotonic() + ttl if ttl else None
+
+    def _live(self, key):
+        item = self._data.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return item
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        with self._lock:
+            items = {key: self._live(key) for key in keys}
+        return {key: json.loads(item[0]) for key, item in items.items() if item is not None}
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (_dumps(value), self._expiry(ttl))
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._data[key] = (_dumps(value), self._expiry(ttl))
+            return True
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        with self._lock:
+            item = self._live(key)
+            if item is None:
+                value, expires = amount, self._expiry(ttl)
+            else:
+                value, expires = int(json.loads(item[0])) + amount, item[1]
+            self._data[key] = (_dumps(value), expires)
+            return value
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+class TableStateBackend(StateBackend):
+    """Backend on the ``shared_state`` table (Postgres in production)
+
+    Writes are single-statement upserts on their own small pool, so they
+    commit independently of the request's transaction and never wait for
+    it. Expired rows are deleted every ``PURGE_EVERY`` writes.
+    """
+
+    name = 'table'
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.table = SharedStateEntry.__table__
+        self._insert = postgresql.insert if engine.dialect.name == 'postgresql' else sqlite.insert
+        self._writes = 0
+
+    @staticmethod
+    def _now():
+        return datetime.now(timezone.utc)
+
+    def _expiry(self, ttl):
+        return self._now() + timedelta(seconds=ttl) if ttl else None
+
+    def _expired(self, now):
+        return and_(self.table.c.expires_at.isnot(None), self.table.c.expires_at <= now)
+
+    def _write(self, statement, returning: bool = False):
+        with self.engine.begin() as conn:
+            result = conn.execute(statement)
+            value = result.scalar() if returning else None
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self.purge_expired()
+        return value
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        table = self.table
+        now = self._now()
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(table.c.key, table.c.value).where(
+                    table.c.key.in_(keys),
+                    or_(table.c.expires_at.is_(None), table.c.expires_at > now)
+                )
+            ).all()
+        return {key: json.loads(value) for key, value in rows}
+
+    def _upsert(self, key, value, ttl):
+        statement = self._insert(self.table).values(key=key, value=value, expires_at=self._expiry(ttl))
+        return statement, statement.excluded
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        statement, excluded = self._upsert(key, _dumps(value), ttl)
+        self._write(statement.on_conflict_do_update(
+            index_elements=[self.table.c.key],
+            set_={'value': excluded.value, 'expires_at': excluded.expires_at}
+        ))
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        statement, excluded = self._upsert(key, _dumps(value), ttl)
+        inserted = self._write(statement.on_conflict_do_update(
+            index_elements=[self.table.c.key],
+            set_={'value': excluded.value, 'expires_at': excluded.expires_at},
+            where=self._expired(self._now())
+        ).returning(self.table.c.key), returning=True)
+        return inserted is not None
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        table = self.table
+        expired = self._expired(self._now())
+        statement, excluded = self._upsert(key, str(amount), ttl)
+        value = self._write(statement.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={
+                'value': case((expired, excluded.value), else_=cast(cast(table.c.value, BigInteger) + amount, Text)),
+                'expires_at': case((expired, excluded.expires_at), else_=table.c.expires_at)
+            }
+        ).returning(table.c.value), returning=True)
+        return int(value)
+
+    def delete(self, key: str) -> None:
+        self._write(delete(self.table).where(self.table.c.key == key))
+
+    def purge_expired(self) -> int:
+        """Delete expired rows, returning how many were removed"""
+        with self.engine.begin() as conn:
+            return conn.execute(delete(self.table).where(self._expired(self._now()))).rowcount
+
+class RedisStateBackend(StateBackend):
+    """Backend on a Redis server (``redis://`` or ``rediss://`` URL)"""
+
+    name = 'redis'
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError('SHARED_STATE_URL points at Redis but the redis package is not installed')
+        self.client = redis.Redis.from_url(url)
+
+    @staticmethod
+    def _seconds(ttl):
+        return max(1, math.ceil(ttl)) if ttl else None
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        return {key: json.loads(value) for key, value in zip(keys, self.client.mget(keys)) if value is not None}
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.client.set(key, _dumps(value), ex=self._seconds(ttl))
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        return bool(self.client.set(key, _dumps(value), ex=self._seconds(ttl), nx=True))
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        value = self.client.incrby(key, amount)
+        if ttl and value == amount:
+            # First increment of this window
+            self.client.expire(key, self._seconds(ttl))
+        return value
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+def create_state_engine(url: str):
+    """Small dedicated pool for state reads and writes"""
+    connect_args = {}
+    if url.startswith('postgresql'):
+        connect_args['options'] = '-c statement_timeout=5000'
+    engine = create_engine(
+        url,
+        poolclass=QueuePool,
+        pool_size=2,
+        max_overflow=8,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        connect_args=connect_args
+    )
+    db_metrics.install(engine, 'state')
+    return engine
+
+def create_backend(url: str = '') -> StateBackend:
+    """Backend for ``SHARED_STATE_URL``
+
+    ``memory://`` keeps state in this process, ``redis://host:6379/0`` uses
+    Redis and anything else (including empty) the ``shared_state`` table in
+    that database URL, defaulting to ``DATABASE_URL``.
+    """
+    if url.startswith('memory://'):
+        return MemoryStateBackend()
+    if url.startswith(('redis://', 'rediss://')):
+        return RedisStateBackend(url)
+    from config.database import DATABASE_URL
+    return TableStateBackend(create_state_engine(url or DATABASE_URL))
+
+class SharedState:
+    """Key/value state shared by every API process
+
+    Replaces module globals (batch progress, proxy list), backs rate-limit
+    counters and cache versions, so that the API gives the same answers
+    whichever worker serves a request. Until ``init_app`` runs (scripts,
+    tests) state lives in this process only.
+    """
+
+    def __init__(self):
+        self.backend: StateBackend = MemoryStateBackend()
+
+    def init_app(self, app) -> None:
+        app.config.setdefault('SHARED_STATE_URL', '')
+        self.backend = create_backend(app.config['SHARED_STATE_URL'])
+        if self.backend.name != 'memory':
+            # ETags must agree between workers
+            table_versions.use_backend(self)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.backend.get(key, default)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        return self.backend.get_many(keys)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.backend.set(key, value, ttl)
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        return self.backend.add(key, value, ttl)
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        return self.backend.incr(key, amount, ttl)
+
+    def delete(self, key: str) -> None:
+        self.backend.delete(key)
+
+# Create global instance
+shared_state = SharedState()
@@ -0,0 +1,154 @@
+import json
+import logging
+import uuid
+from typing import Any, Dict, Optional
+from socketio import PubSubManager, RedisManager
+from sqlalchemy import func, select
+from utils.json_provider import encode_value
+from utils.shared_state import SharedState, TableStateBackend
+
+logger = logging.getLogger(__name__)
+
+def encode_message(data: Dict[str, Any]) -> str:
+    """JSON text of a pub/sub message (never pickle: anyone who can publish would run code)"""
+    return json.dumps(data, default=encode_value, ensure_ascii=False, separators=(',', ':'))
+
+def decode_message(payload) -> Optional[Dict[str, Any]]:
+    """The message in ``payload``, or None when it is not a JSON pub/sub message"""
+    if isinstance(payload, dict):
+        message = payload
+    else:
+        try:
+            message = json.loads(payload)
+        except (TypeError, ValueError):
+            logger.warning('Ignoring a pub/sub message that is not JSON')
+            return None
+    if not isinstance(message, dict) or not isinstance(message.get('method'), str):
+        logger.warning('Ignoring a malformed pub/sub message')
+        return None
+    return message
+
+class PostgresManager(PubSubManager):
+    """Socket.IO client manager relaying emits through Postgres LISTEN/NOTIFY
+
+    Lets every API process emit to clients connected to any other process
+    without running Redis. NOTIFY payloads are limited to 8000 bytes, so
+    larger messages are parked in the shared state for a minute and only
+    their key is sent. The listener polls its connection without blocking
+    and yields to the async framework between polls.
+    """
+
+    name = 'postgres'
+
+    POLL_SECONDS = 0.1
+    MAX_NOTIFY_PAYLOAD = 7000
+
+    def __init__(self, engine, state: SharedState, channel: str = 'socketio',
+                 write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.engine = engine
+        self.state = state
+
+    def _publish(self, data: Dict[str, Any]) -> None:
+        payload = encode_message(data)
+        if len(payload.encode('utf-8')) > self.MAX_NOTIFY_PAYLOAD:
+            key = f'socketio:{uuid.uuid4().hex}'
+            self.state.set(key, json.loads(payload), ttl=60)
+            payload = '@' + key
+        with self.engine.begin() as conn:
+            conn.execute(select(func.pg_notify(self.channel, payload)))
+
+    def _decode(self, payload: str) -> Optional[Dict[str, Any]]:
+        if payload.startswith('@'):
+            payload = self.state.get(payload[1:])
+            if payload is None:
+                return None
+        return decode_message(payload)
+
+    def _connect(self):
+        # A connection of its own, detached so it does not hold a pool slot
+        connection = self.engine.raw_connection()
+        connection.detach()
+        connection.dbapi_connection.autocommit = True
+        cursor = connection.cursor()
+        cursor.execute('LISTEN "%s"' % self.channel.replace('"', '""'))
+        cursor.close()
+        return connection
+
+    def _listen(self):
+        connection = None
+        retry_sleep = 1
+        while True:
+            try:
+                if connection is None:
+                    connection = self._connect()
+                    retry_sleep = 1
+                listener = connection.dbapi_connection
+                listener.poll()
+                if not listener.notifies:
+                    self.server.sleep(self.POLL_SECONDS)
+                    continue
+                while listener.notifies:
+                    message = self._decode(listener.notifies.pop(0).payload)
+                    if message is not None:
+                        yield message
+            except Exception as e:
+                logger.error('Cannot receive from postgres (%s)... retrying in %s secs', e, retry_sleep)
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+                    connection = None
+                self.server.sleep(retry_sleep)
+                retry_sleep = min(retry_sleep * 2, 60)
+
+class JsonRedisManager(RedisManager):
+    """``RedisManager`` sending JSON instead of pickles
+
+    The stock manager unpickles whatever arrives on the channel, so anyone
+    able to PUBLISH to Redis could run code in every API process.
+    """
+
+    name = 'redis-json'
+
+    def _publish(self, data: Dict[str, Any]):
+        retry = True
+        while True:
+            try:
+                if not retry:
+                    self._redis_connect()
+                return self.redis.publish(self.channel, encode_message(data))
+            except Exception as e:
+                if retry:
+                    logger.error('Cannot publish to redis (%s)... retrying', e)
+                    retry = False
+                else:
+                    logger.error('Cannot publish to redis (%s)... giving up', e)
+                    break
+
+    def _listen(self):
+        for payload in super()._listen():
+            message = decode_message(payload)
+            if message is not None:
+                yield message
+
+def socketio_queue_options(app, state: SharedState) -> Dict[str, Any]:
+    """``SocketIO()`` keyword arguments for cross-process emits
+
+    ``SOCKETIO_MESSAGE_QUEUE`` (any URL Flask-SocketIO supports) wins;
+    otherwise the shared state backend is reused: Redis directly, the
+    Postgres table backend through LISTEN/NOTIFY. A process-local backend
+    needs no queue. Redis queues always exchange JSON (``JsonRedisManager``).
+    """
+    url = app.config.get('SOCKETIO_MESSAGE_QUEUE')
+    backend = state.backend
+    if not url and backend.name == 'redis':
+        url = app.config['SHARED_STATE_URL']
+    if url and url.startswith(('redis://', 'rediss://')):
+        return {'client_manager': JsonRedisManager(url)}
+    if url:
+        return {'message_queue': url}
+    if isinstance(backend, TableStateBackend) and backend.engine.dialect.name == 'postgresql':
+        return {'client_manager': PostgresManager(backend.engine, state)}
+    return {}
@@ -0,0 +1,143 @@
+import logging
+import re
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, Tuple
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Table written by an INSERT/UPDATE/DELETE statement (optionally quoted/schema-qualified)
+_WRITE_PATTERN = re.compile(
+    r'^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+(?:"?\w+"?\.)?"?(\w+)"?',
+    re.IGNORECASE
+)
+
+class TableVersions:
+    """Per-table version counters, bumped when a transaction that wrote a table commits
+
+    Every INSERT/UPDATE/DELETE seen on an instrumented engine records its
+    table on the connection; the tables' counters are incremented once the
+    DBAPI commit succeeded and the record is dropped on rollback. Readers
+    can then tell that a table is unchanged without querying it (see
+    ``utils.http_cache``), and a reader that sees the new version also sees
+    the committed rows.
+
+    Counters live in this process, and ``epoch`` changes on every start so
+    that versions from a previous run are never mistaken for current ones,
+    unless ``use_backend`` shares them (and the epoch) between processes.
+    """
+
+    # Shared-state key prefix of the per-table counters
+    KEY_PREFIX = 'table_version:'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._fetched_at: Dict[str, float] = {}
+        self._local_bumps: Dict[str, int] = {}
+        self._backend = None
+        self._refresh_seconds = 1.0
+        self.epoch = uuid.uuid4().hex[:8]
+
+    def use_backend(self, backend, refresh_seconds: float = 1.0) -> None:
+        """Keep the counters in ``backend`` (a ``SharedState``) so all processes agree
+
+        Each process re-reads a table's shared version at most once per
+        ``refresh_seconds``; its own writes are visible to it immediately.
+        """
+        backend.add(self.KEY_PREFIX + 'epoch', self.epoch)
+        self.epoch = backend.get(self.KEY_PREFIX + 'epoch', self.epoch)
+        with self._lock:
+            self._backend = backend
+            self._refresh_seconds = refresh_seconds
+            self._fetched_at.clear()
+
+    def install(self, engine) -> None:
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'rollback', self._on_rollback)
+        # ConnectionEvents.commit fires before the DBAPI commit, when other
+        # connections cannot see the rows yet; bump after it returns instead
+        dialect = engine.dialect
+        do_commit = dialect.do_commit
+
+        def do_commit_and_bump(dbapi_connection):
+            do_commit(dbapi_connection)
+            self._on_commit(dbapi_connection)
+
+        dialect.do_commit = do_commit_and_bump
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        match = _WRITE_PATTERN.match(statement)
+        if match:
+            conn.info.setdefault('written_tables', set()).add(match.group(1).lower())
+
+    def _on_commit(self, dbapi_connection):
+        # The pooled connection proxy shares ``info`` with its Connection
+        tables = dbapi_connection.info.pop('written_tables', None)
+        if tables:
+            self.bump(tables)
+
+    def _on_rollback(self, conn):
+        conn.info.pop('written_tables', None)
+
+    def bump(self, tables: Iterable[str]) -> None:
+        """Mark ``tables`` as changed, e.g. after a write outside the engine"""
+        tables = list(tables)
+        with self._lock:
+            for table in tables:
+                self._local_bumps[table] = self._local_bumps.get(table, 0) + 1
+        backend = self._backend
+        if backend is not None:
+            try:
+                shared = {table: backend.incr(self.KEY_PREFIX + table) for table in tables}
+            except Exception as e:
+                # Never fail the commit; other processes catch up within the ETag TTL
+                logger.warning("Failed to share table versions: %s", e)
+            else:
+                now = time.monotonic()
+                with self._lock:
+                    self._versions.update(shared)
+                    self._fetched_at.update(dict.fromkeys(shared, now))
+                return
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def get(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        """Current versions of ``tables``, in the order given"""
+        tables = tuple(tables)
+        if self._backend is not None:
+            self._refresh(tables)
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def local_bumps(self, table: str) -> int:
+        """How often this process bumped ``table``
+
+        Compared with the change in ``get``, it tells whether a table moved
+        only because of this process's own writes.
+        """
+        with self._lock:
+            return self._local_bumps.get(table, 0)
+
+    def _refresh(self, tables: Tuple[str, ...]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            stale = [table for table in tables
+                     if now - self._fetched_at.get(table, float('-inf')) >= self._refresh_seconds]
+        if not stale:
+            return
+        shared = self._backend.get_many(self.KEY_PREFIX + table for table in stale)
+        with self._lock:
+            for table in stale:
+                self._versions[table] = shared.get(self.KEY_PREFIX + table, 0)
+                self._fetched_at[table] = now
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._versions)
+
+# Create global instance
+table_versions = TableVersions()
@@ -0,0 +1,271 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List, Any, Optional
+from flask import current_app, g, request
+from sqlalchemy import event
+from utils.json_provider import FastJSONProvider
+from utils.metrics import Histogram, format_header, format_histogram
+
+# Child spans kept per trace; time is still accounted for beyond this
+MAX_SPANS_PER_TRACE = 100
+# Recent request durations kept per route for percentiles
+ROUTE_WINDOW = 1000
+# Slow traces kept in memory for /api/metrics/traces
+SLOW_TRACES_KEPT = 50
+
+_current_trace: ContextVar = ContextVar('current_trace', default=None)
+
+class Trace:
+    """Timing of one request: a root span plus SQL/serialization/JSON child spans"""
+
+    __slots__ = ('route', 'method', 'path', 'started', 'started_at', 'spans',
+                 'sql_seconds', 'serialize_seconds', 'json_seconds', 'serialize_depth',
+                 'sql_queries', 'rows_serialized')
+
+    def __init__(self, route: str, method: str, path: str):
+        self.route = route
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.started_at = datetime.now(timezone.utc)
+        self.spans: List[Dict[str, Any]] = []
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.json_seconds = 0.0
+        self.serialize_depth = 0
+        self.sql_queries = 0
+        self.rows_serialized = 0
+
+    def add_span(self, name: str, started: float, duration: float, detail: str = None) -> None:
+        if len(self.spans) < MAX_SPANS_PER_TRACE:
+            span = {
+                'name': name,
+                'start_ms': round((started - self.started) * 1000, 3),
+                'duration_ms': round(duration * 1000, 3)
+            }
+            if detail:
+                span['detail'] = detail
+            self.spans.append(span)
+
+    def finish(self, status: int) -> Dict[str, Any]:
+        duration = time.perf_counter() - self.started
+        python_seconds = max(duration - self.sql_seconds - self.serialize_seconds - self.json_seconds, 0.0)
+        return {
+            'route': self.route,
+            'method': self.method,
+            'path': self.path,
+            'status': status,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': round(duration * 1000, 3),
+            'breakdown_ms': {
+                'sql': round(self.sql_seconds * 1000, 3),
+                'serialize': round(self.serialize_seconds * 1000, 3),
+                'json': round(self.json_seconds * 1000, 3),
+                'python': round(python_seconds * 1000, 3)
+            },
+            'sql_queries': self.sql_queries,
+            'rows_serialized': self.rows_serialized,
+            'spans': self.spans
+        }
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+def traced_serialization(method):
+    """Decorator for model ``to_dict`` methods: time serialization in the current trace
+
+    Only the outermost call is timed (a sale's to_dict serializes its
+    bills), and SQL issued by lazy loads inside it is left to the SQL span.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        trace = _current_trace.get()
+        if trace is None:
+            return method(self, *args, **kwargs)
+        if trace.serialize_depth:
+            trace.rows_serialized += 1
+            return method(self, *args, **kwargs)
+
+        trace.serialize_depth += 1
+        sql_before = trace.sql_seconds
+        started = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            trace.serialize_depth -= 1
+            trace.rows_serialized += 1
+            trace.serialize_seconds += time.perf_counter() - started - (trace.sql_seconds - sql_before)
+    return wrapper
+
+class TracingJSONProvider(FastJSONProvider):
+    """JSON provider that records response encoding as a ``json`` span"""
+
+    def encode(self, obj: Any, indent: bool = False) -> bytes:
+        trace = _current_trace.get()
+        if trace is None:
+            return super().encode(obj, indent)
+        started = time.perf_counter()
+        try:
+            return super().encode(obj, indent)
+        finally:
+            duration = time.perf_counter() - started
+            trace.json_seconds += duration
+            trace.add_span('json', started, duration)
+
+class RouteStats:
+    """Latency histogram and a window of recent durations for one route"""
+
+    def __init__(self):
+        self.histogram = Histogram()
+        self.recent = deque(maxlen=ROUTE_WINDOW)
+        self.breakdown = {'sql': 0.0, 'serialize': 0.0, 'json': 0.0, 'python': 0.0}
+        self.errors = 0
+
+    def percentiles(self) -> Dict[str, float]:
+        durations = sorted(self.recent)
+        if not durations:
+            return {}
+        def pick(fraction):
+            return round(durations[min(int(fraction * len(durations)), len(durations) - 1)] * 1000, 3)
+        return {'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99)}
+
+class RequestTracer:
+    """Lightweight in-process request tracing with per-route latency statistics
+
+    Each request gets a Trace with child spans for SQL statements, model
+    serialization (``traced_serialization``) and JSON encoding
+    (``TracingJSONProvider``). Finished traces feed per-route histograms and
+    percentiles; traces slower than ``SLOW_REQUEST_SECONDS`` are kept in
+    memory and, when ``TRACE_LOG_FILE`` is set, appended to a rotating
+    JSON-lines file.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[tuple, RouteStats] = {}
+        self._slow = deque(maxlen=SLOW_TRACES_KEPT)
+        self._file_logger = None
+
+    def install(self, engine) -> None:
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def init_app(self, app) -> None:
+        app.config.setdefault('SLOW_REQUEST_SECONDS', 1.0)
+        app.config.setdefault('TRACE_LOG_FILE', None)
+        app.json = TracingJSONProvider(app)
+        if app.config['TRACE_LOG_FILE']:
+            self._file_logger = logging.getLogger('request_traces')
+            self._file_logger.propagate = False
+            handler = RotatingFileHandler(app.config['TRACE_LOG_FILE'], maxBytes=10 * 1024 * 1024, backupCount=5)
+            self._file_logger.addHandler(handler)
+            self._file_logger.setLevel(logging.INFO)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._teardown_request)
+
+    # SQL spans
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if _current_trace.get() is not None:
+            conn.info.setdefault('trace_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        trace = _current_trace.get()
+        starts = conn.info.get('trace_start')
+        if trace is None or not starts:
+            return
+        started = starts.pop()
+        duration = time.perf_counter() - started
+        trace.sql_seconds += duration
+        trace.sql_queries += 1
+        trace.add_span('sql', started, duration, ' '.join(statement.split())[:120])
+
+    # Request lifecycle
+
+    def _start_request(self):
+        rule = request.url_rule.rule if request.url_rule else 'unmatched'
+        g._trace_token = _current_trace.set(Trace(rule, request.method, request.path))
+
+    def _finish_request(self, response):
+        trace = _current_trace.get()
+        if trace is None:
+            return response
+        result = trace.finish(response.status_code)
+        self.record(result)
+        return response
+
+    def _teardown_request(self, exception=None):
+        token = g.pop('_trace_token', None)
+        if token is not None:
+            try:
+                _current_trace.reset(token)
+            except ValueError:
+                _current_trace.set(None)
+
+    def record(self, result: Dict[str, Any]) -> None:
+        duration = result['duration_ms'] / 1000
+        key = (result['method'], result['route'])
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = RouteStats()
+            stats.recent.append(duration)
+            for part, value in result['breakdown_ms'].items():
+                stats.breakdown[part] += value / 1000
+            if result['status'] >= 500:
+                stats.errors += 1
+        stats.histogram.observe(duration)
+
+        if duration >= current_app.config['SLOW_REQUEST_SECONDS']:
+            with self._lock:
+                self._slow.append(result)
+            if self._file_logger:
+                self._file_logger.info(json.dumps(result))
+
+    # Exposition
+
+    def route_stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = list(self._routes.items())
+        routes = []
+        for (method, route), stats in items:
+            _, total, count = stats.histogram.snapshot()
+            routes.append({
+                'method': method,
+                'route': route,
+                'count': count,
+                'errors': stats.errors,
+                'avg_ms': round(total / count * 1000, 3) if count else 0.0,
+                **stats.percentiles(),
+                'avg_breakdown_ms': {
+                    part: round(value / count * 1000, 3) if count else 0.0
+                    for part, value in stats.breakdown.items()
+                }
+            })
+        routes.sort(key=lambda item: -item.get('p95_ms', 0))
+        return routes
+
+    def slow_traces(self, limit: int = SLOW_TRACES_KEPT) -> List[Dict[str, Any]]:
+        with self._lock:
+            traces = list(self._slow)
+        return traces[::-1][:limit]
+
+    def render(self) -> str:
+        """Per-route latency histograms in the Prometheus text format"""
+        with self._lock:
+            items = sorted(self._routes.items())
+        lines = format_header('http_request_duration_seconds', 'histogram', 'HTTP request latency by route')
+        for (method, route), stats in items:
+            lines += format_histogram('http_request_duration_seconds', stats.histogram, {'method': method, 'route': route})
+        return '\n'.join(lines) + '\n'
+
+# Create global instance
+request_tracer = RequestTracer()